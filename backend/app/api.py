@@ -1,14 +1,16 @@
 from ninja import NinjaAPI
 from app.exception.handlers import global_exception_handlers
+from app.renderers import ORJSONRenderer
 
 # Tạo API instance
-api = NinjaAPI(title="RescueVN API", version="1.0.0")
+api = NinjaAPI(title="RescueVN API", version="1.0.0", renderer=ORJSONRenderer())
 
 from app.routers.auth import router as auth_router
 from app.routers.account import router as account_router
 from app.routers.assign import router as assign_task
 from app.routers.rescue_request import router as rescue_request 
 from app.routers.rescue import router as rescue
+from app.routers.metrics import router as metrics
 
 
 global_exception_handlers(api)
@@ -17,4 +19,5 @@ api.add_router("/auth", auth_router)                # -> /api/auth/...
 api.add_router("/rescue-teams", assign_task)        # -> /api/rescue-teams/...
 api.add_router("/requests", rescue_request)         # -> /api/requests/...
 api.add_router("/rescue_team", rescue)
+api.add_router("/metrics", metrics)                 # -> /api/metrics/...
 api.add_router("", account_router)                  # -> /api/accounts/...
\ No newline at end of file
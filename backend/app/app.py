@@ -6,4 +6,17 @@ class AppConfig(AppConfig):
     default = True
 
     def ready(self):
-        import app.socket.signals
\ No newline at end of file
+        import app.socket.signals
+        import app.services.media_pipeline  # noqa: F401  (đăng ký post_delete cho media blob)
+        import app.services.data_version  # noqa: F401  (tăng phiên bản dữ liệu khi ghi qua ORM)
+
+        # Nạp chỉ mục điểm bản đồ ở thread nền (trong lúc chờ map-points dùng SQL)
+        from app.services.map_point_index import map_point_index
+        map_point_index.start()
+
+        # Còn nhật ký từ lần chạy trước (có thể do sự cố) thì ghi tiếp vào DB
+        import os
+        from django.conf import settings
+        if settings.RESCUE_SURGE_MODE != "off" and os.path.exists(settings.RESCUE_JOURNAL_PATH):
+            from app.services.intake_journal import intake_journal
+            intake_journal.start_drainer()
\ No newline at end of file
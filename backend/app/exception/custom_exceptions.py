@@ -22,4 +22,9 @@ class ResourceNotFound(BaseAppException):
 
 class InvalidCredentials(BaseAppException):
     def __init__(self, message="Email hoặc mật khẩu không đúng"):
-        super().__init__(message, code=401)
\ No newline at end of file
+        super().__init__(message, code=401)
+
+class ConflictError(BaseAppException):
+    """Xung đột trạng thái dữ liệu (409)"""
+    def __init__(self, message="Dữ liệu đã thay đổi, vui lòng thử lại", details=None):
+        super().__init__(message, code=409, details=details)
\ No newline at end of file
@@ -3,6 +3,24 @@ from ninja.errors import ValidationError, HttpError
 from django.http import JsonResponse
 from .custom_exceptions import InvalidToken, PermissionDenied, BaseAppException
 
+def format_validation_errors(raw_errors) -> list:
+    """Chuẩn hóa lỗi validate (Pydantic/Ninja) thành [{field, message}]"""
+    clean_details = []
+    for error in raw_errors:
+        if isinstance(error, dict):
+            loc = error.get('loc', [])
+            field = str(loc[-1]) if loc else 'general'
+            msg = error.get('msg', '').replace('Value error, ', '')
+        else:
+            field = 'general'
+            msg = str(error)
+
+        clean_details.append({
+            "field": field,
+            "message": msg
+        })
+    return clean_details
+
 def global_exception_handlers(api: NinjaAPI):
     @api.exception_handler(BaseAppException)
     def handle_app_exception(request, exc):
@@ -28,21 +46,7 @@ def global_exception_handlers(api: NinjaAPI):
         if isinstance(raw_errors, str):
             raw_errors = [raw_errors]
 
-        clean_details = []
-        for error in raw_errors:
-            if isinstance(error, dict):
-                loc = error.get('loc', [])
-                field = str(loc[-1]) if loc else 'general'
-                msg = error.get('msg', '').replace('Value error, ', '')
-            else:
-
-                field = 'general'
-                msg = str(error)
-            
-            clean_details.append({
-                "field": field,
-                "message": msg
-            })
+        clean_details = format_validation_errors(raw_errors)
 
         return JsonResponse({
             "success": False,
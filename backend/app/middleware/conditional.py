@@ -0,0 +1,104 @@
+import inspect
+from functools import wraps
+from hashlib import sha256
+from typing import Any, Callable, Iterable, Optional, Union
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from pydantic import BaseModel
+
+from app.renderers import ORJSONRenderer, dumps
+from app.services.data_version import DataVersionService
+
+Scopes = Union[Iterable[str], Callable[..., Iterable[str]]]
+
+# Tham số kiểu HttpResponse: Ninja truyền "temporal response", header đặt trên đó được chép
+# sang response Ninja dựng (sau khi validate theo response schema)
+_RESPONSE_ARG = "conditional_response"
+
+
+def _make_etag(name: str, versions: dict, request, per_user: bool, extra: Any = None) -> str:
+    parts = [name, sorted(versions.items()), sorted(request.GET.lists())]
+    if extra is not None:
+        parts.append(extra)
+    if per_user:
+        user = getattr(request, "auth", None)
+        parts.append(str(getattr(user, "id", None) or "anonymous"))
+    return f'W/"{sha256(repr(parts).encode()).hexdigest()[:32]}"'
+
+
+def _matches(etag: str, if_none_match: str) -> bool:
+    # So sánh yếu (RFC 9110): bỏ tiền tố W/ ở cả hai phía
+    tags = parse_etags(if_none_match)
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+
+def _set_validators(response: HttpResponse, etag: str, per_user: bool) -> HttpResponse:
+    response["ETag"] = etag
+    # Client luôn hỏi lại server, nhưng chỉ tốn một lần đọc data_versions khi dữ liệu không đổi
+    response["Cache-Control"] = "private, no-cache" if per_user else "no-cache"
+    if per_user:
+        response["Vary"] = "Authorization"
+    return response
+
+
+def conditional_get(name: str, scopes: Scopes, per_user: bool = False,
+                    etag_extra: Optional[Callable[..., Any]] = None):
+    """
+    ETag / If-None-Match cho endpoint đọc được poll liên tục.
+
+    ETag = tên endpoint + phiên bản các scope dữ liệu (DataVersionService) + query string
+    (+ user nếu per_user, khi mỗi người thấy dữ liệu khác nhau). Tính ETag chỉ tốn một lần
+    đọc bảng data_versions; khớp If-None-Match thì trả 304 ngay, không chạy SQL nặng và
+    không serialize.
+
+    Phiên bản được đọc TRƯỚC khi chạy endpoint: có ghi xen giữa thì ETag cũ hơn dữ liệu,
+    lần poll sau nhận 200 thừa một lần chứ không bao giờ 304 với dữ liệu cũ.
+
+    `scopes` là danh sách scope hoặc hàm (request) -> danh sách scope.
+    `etag_extra`: hàm (request) -> giá trị gộp thêm vào ETag, cho endpoint trả dữ liệu từ
+    bộ nhớ đệm riêng có thể cũ hơn phiên bản scope (vd. phiên bản cây gộp điểm).
+    Đặt dưới @require_role để 304 chỉ trả cho người có quyền xem.
+
+    Endpoint trả HttpResponse (trusted_response) được gắn ETag trực tiếp; trả dữ liệu thường
+    thì vẫn để Ninja validate / render như endpoint không có decorator này.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            temporal = kwargs.pop(_RESPONSE_ARG, None)
+            if not settings.CONDITIONAL_GET_ENABLED:
+                return func(request, *args, **kwargs)
+
+            scope_list = scopes(request) if callable(scopes) else scopes
+            extra = etag_extra(request) if etag_extra else None
+            etag = _make_etag(name, DataVersionService.get(*scope_list), request, per_user, extra)
+
+            if _matches(etag, request.headers.get("If-None-Match", "")):
+                return _set_validators(HttpResponseNotModified(), etag, per_user)
+
+            result = func(request, *args, **kwargs)
+            if isinstance(result, tuple):
+                # (status, body): lỗi / trạng thái riêng, để Ninja xử lý như cũ
+                return result
+            if not isinstance(result, HttpResponse) and temporal is not None:
+                # Dữ liệu thường (API_TRUSTED_ROWS=False...): để Ninja validate theo response
+                # schema và render, chỉ gắn ETag lên temporal response
+                _set_validators(temporal, etag, per_user)
+                return result
+            if not isinstance(result, HttpResponse):
+                if isinstance(result, BaseModel):
+                    result = result.model_dump(by_alias=True)
+                result = HttpResponse(dumps(result), content_type=ORJSONRenderer.media_type)
+            if result.status_code == 200:
+                _set_validators(result, etag, per_user)
+            return result
+
+        signature = inspect.signature(func)
+        if _RESPONSE_ARG not in signature.parameters:
+            parameters = list(signature.parameters.values())
+            parameters.append(inspect.Parameter(_RESPONSE_ARG, inspect.Parameter.KEYWORD_ONLY, annotation=HttpResponse))
+            wrapper.__signature__ = signature.replace(parameters=parameters)
+        return wrapper
+    return decorator
@@ -0,0 +1,76 @@
+from functools import wraps
+from hashlib import sha256
+from django.conf import settings
+from django.core.cache import caches
+from ninja.errors import HttpError
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+_PENDING = "pending"
+_DONE = "done"
+
+
+def _response_status(response) -> int:
+    if isinstance(response, tuple):
+        return response[0]
+    return getattr(response, "status_code", 200)
+
+
+def idempotent(scope: str):
+    """
+    Hỗ trợ header `Idempotency-Key` cho endpoint ghi dữ liệu.
+
+    - Lần đầu: chạy endpoint, lưu lại kết quả (status < 500) trong cache
+      `idempotency` (có giới hạn số key và TTL).
+    - Gửi lại cùng key + cùng body: trả ngay kết quả cũ, không chạm DB.
+    - Cùng key nhưng khác body: 422. Lần đầu chưa xử lý xong: 409.
+
+    Key được tách theo `scope` và user, nên hai user dùng trùng key không ảnh hưởng nhau.
+    Không có header thì endpoint chạy bình thường.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return func(request, *args, **kwargs)
+
+            if len(key) > 255:
+                raise HttpError(400, "Idempotency-Key quá dài (tối đa 255 ký tự)")
+
+            user = getattr(request, "user", None)
+            user_id = getattr(user, "id", None) or "anonymous"
+            cache_key = f"idem:{scope}:{user_id}:{sha256(key.encode()).hexdigest()}"
+            fingerprint = sha256(request.body or b"").hexdigest()
+
+            store = caches["idempotency"]
+            pending = {"state": _PENDING, "fingerprint": fingerprint}
+
+            # add() chỉ thành công với request đầu tiên, các request trùng sau đó đọc lại entry
+            if not store.add(cache_key, pending, timeout=settings.IDEMPOTENCY_LOCK_SECONDS):
+                cached = store.get(cache_key)
+                if cached is not None:
+                    if cached["fingerprint"] != fingerprint:
+                        raise HttpError(422, "Idempotency-Key đã được dùng cho một yêu cầu khác")
+                    if cached["state"] == _PENDING:
+                        raise HttpError(409, "Yêu cầu với Idempotency-Key này đang được xử lý")
+                    return cached["response"]
+                # Entry vừa hết hạn giữa add() và get(): giữ chỗ lại
+                store.set(cache_key, pending, timeout=settings.IDEMPOTENCY_LOCK_SECONDS)
+
+            try:
+                response = func(request, *args, **kwargs)
+            except Exception:
+                store.delete(cache_key)
+                raise
+
+            if _response_status(response) >= 500:
+                store.delete(cache_key)
+            else:
+                store.set(cache_key, {
+                    "state": _DONE,
+                    "fingerprint": fingerprint,
+                    "response": response,
+                }, timeout=settings.IDEMPOTENCY_TTL_SECONDS)
+            return response
+        return wrapper
+    return decorator
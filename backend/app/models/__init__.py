@@ -3,5 +3,5 @@ from .account_model import Account
 from .social_accounts_model import SocialAccount
 from .refresh_token_model import RefreshToken
 from .rescue_team_model import RescueTeam, RescueAssignments
-from .rescue_requests_model import RescueRequest, RescueMedia
+from .rescue_requests_model import RescueRequest, RescueMedia, MediaBlob
 from .condition_type_model import ConditionType
\ No newline at end of file
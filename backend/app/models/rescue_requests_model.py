@@ -25,10 +25,25 @@ class RescueRequest(TimeStampedModel):
         choices=[(v, v) for v in RESCUE_STATUS.values()],
         default=RESCUE_STATUS[RescueStatus.PENDING]        
     )
+    duplicate_count = models.IntegerField(default=0)
+    last_reported_at = models.DateTimeField(null=True, blank=True)
 
     class Meta(TimeStampedModel.Meta, UnmanagedMeta):
         db_table = "rescue_requests"
 
+class MediaBlob(models.Model):
+    """Nội dung file lưu theo SHA-256, dùng chung cho nhiều media (đếm tham chiếu)"""
+    digest = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    thumbnail = models.FileField(max_length=255, null=True, blank=True)
+    preview = models.FileField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta(UnmanagedMeta):
+        db_table = "media_blobs"
+
 class RescueMedia(TimeStampedModel):
     class MediaType(models.TextChoices):
         IMAGE = 'IMAGE', 'Ảnh'
@@ -42,6 +57,10 @@ class RescueMedia(TimeStampedModel):
     )
     file = models.FileField(upload_to='rescue_media/%Y/%m/%d/')
     file_type = models.CharField(max_length=10, choices=MediaType.choices, default=MediaType.IMAGE )
+    # Ảnh thu nhỏ / ảnh xem trước (IMAGE: từ ảnh gốc; VIDEO: từ khung hình poster), tạo nền sau khi upload
+    thumbnail = models.FileField(max_length=255, null=True, blank=True)
+    preview = models.FileField(max_length=255, null=True, blank=True)
+    blob_digest = models.CharField(max_length=64, null=True, blank=True)
     
     class Meta(TimeStampedModel.Meta , UnmanagedMeta):
         db_table = "media"
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Renderer JSON nhanh cho NinjaAPI và chế độ "trusted rows".
+
+- ORJSONRenderer: dùng orjson (tự hỗ trợ UUID, datetime) nếu đã cài, không thì
+  quay về encoder mặc định của Ninja. Kiểu orjson không biết (Decimal, ...) đi qua
+  NinjaJSONEncoder.default nên kết quả giống renderer cũ.
+- trusted_response(): dữ liệu do chính service dựng từ SQL (đã đúng shape của schema)
+  được trả thẳng, bỏ qua bước validate lại từng dòng bằng pydantic. Route vẫn khai báo
+  `response=Schema` để tài liệu OpenAPI không đổi. Tắt bằng API_TRUSTED_ROWS=False.
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Type
+
+from django.conf import settings
+from django.http import HttpResponse
+from ninja import Schema
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson là phụ thuộc tùy chọn
+    orjson = None
+
+_encoder = NinjaJSONEncoder()
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder.default, option=_ORJSON_OPTIONS)
+    return json.dumps(data, cls=NinjaJSONEncoder).encode()
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
+
+
+@lru_cache(maxsize=None)
+def _field_names(schema: Type[Schema]) -> tuple:
+    return tuple(schema.model_fields)
+
+
+def project(rows: Iterable[Dict[str, Any]], schema: Type[Schema]) -> List[Dict[str, Any]]:
+    """Giữ đúng các field của schema (bỏ cột phụ như search_rank, address...)"""
+    fields = _field_names(schema)
+    return [{name: row.get(name) for name in fields} for row in rows]
+
+
+def trusted_response(data: Any, status: int = 200):
+    """
+    Trả dữ liệu đã đúng shape mà không validate lại.
+    API_TRUSTED_ROWS=False: trả nguyên data để Ninja validate như bình thường.
+    """
+    if not settings.API_TRUSTED_ROWS:
+        return data
+    return HttpResponse(dumps(data), status=status, content_type=ORJSONRenderer.media_type)
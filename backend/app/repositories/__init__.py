@@ -1,4 +1,7 @@
 from .auth_repository import IAccountRepo, AccountRepo
 from .role_repository import IRoleRepo, RoleRepo
 from .refresh_repository import IRefreshRepo, RefreshRepo
-from .rescue_team_repository import IRescueTeamRepo, RescueTeamRepo
\ No newline at end of file
+from .rescue_team_repository import IRescueTeamRepo, RescueTeamRepo
+from .request_code_repository import IRequestCodeRepo, RequestCodeRepo
+from .media_blob_repository import IMediaBlobRepo, MediaBlobRepo
+from .data_version_repository import IDataVersionRepo, DataVersionRepo
@@ -0,0 +1,40 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable
+from django.db import connection
+
+
+class IDataVersionRepo(ABC):
+    @abstractmethod
+    def get_many(self, scopes: Iterable[str]) -> Dict[str, int]:
+        pass
+
+    @abstractmethod
+    def bump(self, scopes: Iterable[str]) -> None:
+        pass
+
+
+class DataVersionRepo(IDataVersionRepo):
+    def get_many(self, scopes: Iterable[str]) -> Dict[str, int]:
+        """Phiên bản hiện tại của từng scope (scope chưa có coi như 0)"""
+        scopes = list(scopes)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT scope, version FROM data_versions WHERE scope = ANY(%s)",
+                [scopes],
+            )
+            found = dict(cursor.fetchall())
+        return {scope: found.get(scope, 0) for scope in scopes}
+
+    def bump(self, scopes: Iterable[str]) -> None:
+        """
+        Tăng phiên bản. Gọi SAU khi commit (autocommit) để khóa dòng chỉ giữ
+        trong một câu lệnh, không kéo dài theo transaction ghi dữ liệu.
+        """
+        scopes = sorted(set(scopes))
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO data_versions (scope, version)
+                SELECT unnest(%s::varchar[]), 1
+                ON CONFLICT (scope)
+                DO UPDATE SET version = data_versions.version + 1
+            """, [scopes])
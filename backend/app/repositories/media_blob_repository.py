@@ -0,0 +1,86 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+from django.db import connection
+from app.models import MediaBlob
+
+
+class IMediaBlobRepo(ABC):
+    @abstractmethod
+    def get(self, digest: str) -> Optional[MediaBlob]:
+        pass
+
+    @abstractmethod
+    def lock(self, digest: str) -> None:
+        pass
+
+    @abstractmethod
+    def acquire(self, digest: str, file: str, size: int) -> MediaBlob:
+        pass
+
+    @abstractmethod
+    def release(self, digest: str) -> Optional[MediaBlob]:
+        pass
+
+    @abstractmethod
+    def set_derivatives(self, digest: str, thumbnail: str, preview: str) -> None:
+        pass
+
+
+class MediaBlobRepo(IMediaBlobRepo):
+    def get(self, digest: str) -> Optional[MediaBlob]:
+        return MediaBlob.objects.filter(digest=digest).first()
+
+    def lock(self, digest: str) -> None:
+        """Khóa advisory theo digest tới hết transaction (tạo lại blob vs xóa file)"""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"media_blob:{digest}"])
+
+    def acquire(self, digest: str, file: str, size: int) -> MediaBlob:
+        """
+        Tăng số tham chiếu tới blob, tạo mới nếu chưa có.
+        Nếu hai request cùng tạo một blob, bên thua dùng lại `file` của bên thắng.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO media_blobs (digest, file, size, ref_count, created_at)
+                VALUES (%s, %s, %s, 1, NOW())
+                ON CONFLICT (digest)
+                DO UPDATE SET ref_count = media_blobs.ref_count + 1
+                RETURNING digest, file, size, ref_count, thumbnail, preview
+            """, [digest, file, size])
+            row = cursor.fetchone()
+        return MediaBlob(
+            digest=row[0], file=row[1], size=row[2],
+            ref_count=row[3], thumbnail=row[4], preview=row[5]
+        )
+
+    def release(self, digest: str) -> Optional[MediaBlob]:
+        """
+        Giảm số tham chiếu. Khi về 0 thì xóa dòng blob và trả về blob đó
+        để bên gọi xóa file trên storage; còn tham chiếu thì trả về None.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE media_blobs SET ref_count = ref_count - 1
+                WHERE digest = %s
+                RETURNING ref_count
+            """, [digest])
+            row = cursor.fetchone()
+            if not row or row[0] > 0:
+                return None
+
+            cursor.execute("""
+                DELETE FROM media_blobs
+                WHERE digest = %s AND ref_count <= 0
+                RETURNING digest, file, size, ref_count, thumbnail, preview
+            """, [digest])
+            row = cursor.fetchone()
+        if not row:
+            return None
+        return MediaBlob(
+            digest=row[0], file=row[1], size=row[2],
+            ref_count=row[3], thumbnail=row[4], preview=row[5]
+        )
+
+    def set_derivatives(self, digest: str, thumbnail: str, preview: str) -> None:
+        MediaBlob.objects.filter(digest=digest).update(thumbnail=thumbnail, preview=preview)
@@ -0,0 +1,30 @@
+from abc import ABC, abstractmethod
+from datetime import date
+from django.db import connection
+
+
+class IRequestCodeRepo(ABC):
+    @abstractmethod
+    def allocate(self, province_code: str, day: date, count: int = 1) -> int:
+        pass
+
+
+class RequestCodeRepo(IRequestCodeRepo):
+    def allocate(self, province_code: str, day: date, count: int = 1) -> int:
+        """
+        Cấp phát `count` số thứ tự liên tiếp cho (tỉnh, ngày).
+        Trả về số cuối cùng của dải đã cấp: dải là (last - count + 1 .. last).
+
+        Chỉ một câu UPSERT trên bảng đếm, không quét bảng rescue_requests.
+        Nên gọi ngoài transaction.atomic() để khóa dòng đếm được nhả ngay
+        khi câu lệnh kết thúc (autocommit), không giữ đến lúc INSERT xong.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO rescue_code_sequences (province_code, day, last_value)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (province_code, day)
+                DO UPDATE SET last_value = rescue_code_sequences.last_value + EXCLUDED.last_value
+                RETURNING last_value
+            """, [province_code, day, count])
+            return cursor.fetchone()[0]
@@ -9,6 +9,10 @@ from ..schemas.assignments_schema import (
 from ..services import AssignService
 from app.middleware.auth import JWTBearer
 from app.security.permissions import require_role
+from app.middleware.idempotency import idempotent
+from app.middleware.conditional import conditional_get
+from app.services.data_version import DataVersionService
+from app.renderers import trusted_response
 from ..enum.role_enum import RoleCode
 from typing import List
 
@@ -19,6 +23,7 @@ auth_bearer = JWTBearer()
 #ADMIN: Điều phối đội
 @router.post("/dispatch/assign", auth=auth_bearer, response={200: dict, 400: dict, 404: dict, 500: dict})
 @require_role(RoleCode.ADMIN)
+@idempotent("assign_task")
 def assign_task_endpoint(request, payload: AssignTaskIn):
     account = request.auth 
     try:
@@ -58,6 +63,7 @@ def find_teams_endpoint(request, params: FindNearest = Query(...)):
 
 # Lịch sử/Danh sách nhiệm vụ
 @router.get("/assignments", response=List[AssignmentOut], auth=auth_bearer)
+@conditional_get("assignments", [DataVersionService.REQUESTS, DataVersionService.TEAMS], per_user=True)
 def get_my_assignments(request):
     """
     - Admin: Xem tất cả
@@ -65,12 +71,13 @@ def get_my_assignments(request):
     """
     account = request.auth
     tasks = AssignService.get_assign(user=account)
-    return tasks
+    return trusted_response(tasks)
 
 
 #Đội cứu hộ: Xác nhận xuất phát
 @router.post("/task/start", auth=auth_bearer, response={200: dict, 400: dict, 403: dict})
 @require_role(RoleCode.RESCUER)
+@idempotent("task_start")
 def confirm_start_endpoint(request, payload: ConfirmStartIn):
     account = request.auth
     try:
@@ -94,6 +101,7 @@ def confirm_start_endpoint(request, payload: ConfirmStartIn):
 #Đội cứu hộ: Xác nhận đã đến nơi (Arrived)
 @router.post("/task/arrived", auth=auth_bearer, response={200: dict, 400: dict})
 @require_role(RoleCode.RESCUER)
+@idempotent("task_arrived")
 def confirm_arrived_endpoint(request, payload: ConfirmStartIn):
     account = request.auth
     try:
@@ -113,6 +121,7 @@ def confirm_arrived_endpoint(request, payload: ConfirmStartIn):
 # Đội cứu hộ: Hoàn thành nhiệm vụ (Complete)
 @router.post("/task/complete", auth=auth_bearer, response={200: dict, 400: dict})
 @require_role(RoleCode.RESCUER)
+@idempotent("task_complete")
 def complete_task_endpoint(request, payload: CompleteTaskIn):
     account = request.auth
     try:
@@ -0,0 +1,33 @@
+from ninja import Router
+
+from ..middleware.auth import JWTBearer
+from ..security.permissions import require_role
+from ..enum.role_enum import RoleCode
+from ..services.intake_journal import intake_journal
+from ..services.response_cache import response_cache
+from ..services.map_point_index import map_point_index
+
+router = Router(tags=["Metrics"], auth=JWTBearer())
+
+@router.get("/intake", response=dict)
+@require_role(RoleCode.ADMIN)
+def intake_metrics(request):
+    """Độ sâu nhật ký nhận yêu cầu và tốc độ ghi vào DB"""
+    return intake_journal.metrics()
+
+
+@router.get("/response-cache", response=dict)
+@require_role(RoleCode.ADMIN)
+def response_cache_metrics(request):
+    """Tỉ lệ hit của cache danh sách (theo process) để chọn kích thước cache"""
+    return response_cache.metrics()
+
+
+@router.get("/map-index", response=dict)
+@require_role(RoleCode.ADMIN)
+def map_index_metrics(request, check: bool = False):
+    """Chỉ mục điểm bản đồ trong RAM (process hiện tại); check=true: so với DB ngay"""
+    data = map_point_index.metrics()
+    if check and data["ready"]:
+        data["check"] = map_point_index.check()
+    return data
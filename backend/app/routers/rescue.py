@@ -3,17 +3,20 @@ from typing import List
 
 from ..middleware.auth import JWTBearer
 from ..security.permissions import require_role
+from ..middleware.conditional import conditional_get
 
 from ..schemas.rescue_schema import RescueTeamOut, RescueTeamUpdate
 from ..schemas.exception_schema import ApiResponse
 from ..enum.role_enum import RoleCode
 
 from ..services import RescueService
+from ..services.data_version import DataVersionService
 
 router = Router(tags=["Rescue Team Manager"], auth=JWTBearer())
 
 @router.get("/", response=ApiResponse[List[RescueTeamOut]])
 @require_role(RoleCode.ADMIN)
+@conditional_get("teams", [DataVersionService.TEAMS])
 def list_teams(request):
     data = RescueService.get_teams(request.auth)
     return ApiResponse(
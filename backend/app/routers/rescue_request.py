@@ -1,10 +1,25 @@
 from ninja import Router
-from app.schemas.rescue_schema import RescueRequestSchema, ConditionTypeOutSchema, ConditionTypeSchema, RescueMapPoint, PaginatedRescueResponse, RescueMapPointCluster
+from app.schemas.rescue_schema import RescueRequestSchema, ConditionTypeOutSchema, ConditionTypeSchema, RescueMapPoint, PaginatedRescueResponse, RescueChangesResponse, RescueMapPointCluster, RescueBatchIn, RescueBatchResponse, UploadSessionIn, UploadSessionOut
 from app.services import RescueRequestService, ConditionTypeService
+from app.services.resumable_upload import resumable_upload_service
+from app.services.response_cache import response_cache
+from app.services.data_version import DataVersionService
+from app.services.request_export import RequestExportService
+from app.services.map_tiles import MapTileService
+from app.services.point_cluster import point_clusters
+from app.services.map_point_index import map_point_index
+from app.renderers import trusted_response, project
 from app.security.jwt_provider import JwtProvider
 from app.middleware.auth import JWTBearer
-from typing import List, Optional, Union
+from app.security.permissions import require_role
+from app.middleware.idempotency import idempotent
+from app.middleware.conditional import conditional_get
+from app.enum.role_enum import RoleCode
+from typing import List, Literal, Optional, Union
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from ninja import UploadedFile, File
+import uuid
 
 router = Router(tags=["Rescue Request"])
 
@@ -15,11 +30,19 @@ auth_bearer = JWTBearer()
 
 # User gửi requets cứu hộ
 @router.post("/rescue", auth=auth_bearer)
+@idempotent("create_rescue")
 def create_rescue(request, data: RescueRequestSchema):
     account = request.auth 
-    new_request = rescue_service.create_request(data, account_id=str(account.id))
+    new_request = rescue_service.intake(data, account_id=str(account.id))
     return new_request
 
+# Tổng đài / đối tác gửi nhiều yêu cầu cùng lúc
+@router.post("/rescue/batch", auth=auth_bearer, response=RescueBatchResponse)
+@require_role(RoleCode.ADMIN)
+@idempotent("create_rescue_batch")
+def create_rescue_batch(request, data: RescueBatchIn):
+    return rescue_service.create_requests_bulk(data.items)
+
 @router.post("/rescue/{rescue_id}/media", response={200: dict, 404: dict})
 def upload_rescue_media(request, rescue_id: str, files: List[UploadedFile] = File(...)):
     result = RescueRequestService.upload_media(rescue_id, files)
@@ -32,57 +55,163 @@ def upload_rescue_media(request, rescue_id: str, files: List[UploadedFile] = Fil
     }
 
 
+# Upload có thể tiếp tục khi rớt mạng: tạo phiên -> PUT từng chunk -> complete
+@router.post("/rescue/{rescue_id}/uploads", response={201: UploadSessionOut})
+def create_upload_session(request, rescue_id: str, data: UploadSessionIn):
+    return 201, resumable_upload_service.create_session(
+        rescue_id=rescue_id,
+        filename=data.filename,
+        size=data.size,
+        content_type=data.content_type
+    )
+
+@router.get("/uploads/{upload_id}", response=UploadSessionOut)
+def get_upload_session(request, upload_id: uuid.UUID):
+    return resumable_upload_service.get_status(upload_id)
+
+@router.put("/uploads/{upload_id}", response=UploadSessionOut)
+def put_upload_chunk(request, upload_id: uuid.UUID, offset: int):
+    """Body là dữ liệu nhị phân của chunk (application/octet-stream)"""
+    return resumable_upload_service.put_chunk(upload_id, offset, request)
+
+@router.post("/uploads/{upload_id}/complete", response={200: dict})
+def complete_upload(request, upload_id: uuid.UUID):
+    media = resumable_upload_service.complete(upload_id)
+    return {
+        "success": True,
+        "media_id": str(media.id),
+        "file": media.file.name
+    }
+
+
 @router.get("/my-requests/history", auth=JWTBearer(), response=PaginatedRescueResponse)
-def list_my_requests(request, page: int = 1, size: int = 20, status: str = None, search: str = None):
+@conditional_get("my_requests", lambda request: [DataVersionService.account_scope(request.user.id)], per_user=True)
+def list_my_requests(request, page: int = 1, size: int = 20, status: str = None, search: str = None,
+                     cursor: str = None, with_total: bool = None, include: str = None):
     account_id = request.user.id
 
-    return RescueRequestService.get_my_requests(
-        account_id=account_id,
-        page=page,
-        size=size,
-        status_filter=status,
-        search=search
-    )
+    return trusted_response(response_cache.get_or_compute(
+        "my_requests",
+        [DataVersionService.account_scope(account_id)],
+        {"page": page, "size": size, "status": status, "search": search,
+         "cursor": cursor, "with_total": with_total, "include": include},
+        lambda: RescueRequestService.get_my_requests(
+            account_id=account_id,
+            page=page,
+            size=size,
+            status_filter=status,
+            search=search,
+            cursor=cursor,
+            with_total=with_total,
+            include=include
+        ),
+    ))
 
 
 @router.get("/map-points", response=List[Union[RescueMapPoint, RescueMapPointCluster]])
+# Cây gộp điểm / chỉ mục điểm trong RAM có thể chậm hơn phiên bản "requests", pyramid có thể
+# chưa gộp hết delta (process khác đang gộp): ETag gộp thêm phiên bản của từng nguồn
+@conditional_get("map_points", [DataVersionService.REQUESTS, DataVersionService.MAP_CLUSTERS],
+                 etag_extra=lambda request: (point_clusters.version, map_point_index.version))
 def get_map_points(request, 
                    min_lat: float, max_lat: float, 
                    min_lng: float, max_lng: float,
-                   zoom: int):
-    
+                   zoom: int,
+                   status: Optional[str] = None,
+                   condition: Optional[str] = None):
+    """
+    - status: mã trạng thái cách nhau dấu phẩy, vd. PENDING,ASSIGNED,IN_PROGRESS
+      (bản đồ điều phối: chỉ yêu cầu còn mở, dùng chỉ mục riêng nên nhanh hơn nhiều).
+    - condition: tên tình trạng cách nhau dấu phẩy (có ít nhất một).
+    """
     map_points = RescueRequestService.get_map_points(
         min_lat=min_lat,
         max_lat=max_lat,
         min_lng=min_lng,
         max_lng=max_lng,
-        zoom=zoom
+        zoom=zoom,
+        status=status,
+        condition=condition
     )
 
     if zoom > 14:
-        return [RescueMapPoint(**p) for p in map_points]
+        return trusted_response(project(map_points, RescueMapPoint))
     else:
-        return [RescueMapPointCluster(**p) for p in map_points]
+        return trusted_response(project(map_points, RescueMapPointCluster))
     
 
 
+# Vector tile cho bản đồ web: URL cố định theo ô nên cache được, giống nhau cho mọi client
+@router.get("/tiles/{int:z}/{int:x}/{int:y}.pbf")
+def get_map_tile(request, z: int, x: int, y: int):
+    return HttpResponse(MapTileService.tile(z, x, y), content_type=MapTileService.CONTENT_TYPE)
+
+
 @router.get("", response=PaginatedRescueResponse)
+@conditional_get("requests", [DataVersionService.REQUESTS])
 def list_rescue_requests(request, 
                         page: int = 1, 
                         page_size: int = 20, 
                         status: Optional[str] = None, 
-                        search: Optional[str] = None):
+                        search: Optional[str] = None,
+                        cursor: Optional[str] = None,
+                        with_total: Optional[bool] = None,
+                        include: Optional[str] = None):
     """
     API lấy danh sách cứu hộ dạng bảng.
-    - search: Tìm theo Tên, SĐT, Địa chỉ.
+    - search: Tìm theo Tên, SĐT, Địa chỉ (không phân biệt dấu, xếp theo độ liên quan).
     - status: Lọc theo trạng thái (PENDING, IN_PROGRESS...).
+    - cursor: next_cursor của trang trước (keyset, thay cho page khi cuộn sâu).
+    - with_total: có đếm tổng hay không (mặc định: có với page, không với cursor).
+    - include: nhóm cột tốn kém cần lấy, cách nhau dấu phẩy: media, assignment
+      (mặc định: tất cả; include= rỗng: chỉ thông tin yêu cầu, nhanh nhất).
+    """
+    return trusted_response(response_cache.get_or_compute(
+        "requests",
+        [DataVersionService.REQUESTS],
+        {"page": page, "size": page_size, "status": status, "search": search,
+         "cursor": cursor, "with_total": with_total, "include": include},
+        lambda: RescueRequestService.get_list_requests_raw_sql(
+            page=page, 
+            size=page_size, 
+            status_filter=status, 
+            search=search,
+            cursor=cursor,
+            with_total=with_total,
+            include=include
+        ),
+    ))
+
+
+@router.get("/changes", response=RescueChangesResponse)
+def list_rescue_request_changes(request,
+                                since: Optional[str] = None,
+                                limit: int = 200,
+                                include: Optional[str] = None):
+    """
+    Đồng bộ chênh lệch cho bảng điều phối / ứng dụng offline.
+    - since: next_since của lần gọi trước; bỏ trống để lấy token hiện tại (gọi sau khi tải danh sách).
+    - Trả các yêu cầu đã tạo/đổi (trạng thái, nhiệm vụ, media) và id các yêu cầu đã xóa.
+    - has_more=true: gọi tiếp ngay với next_since.
     """
-    return RescueRequestService.get_list_requests_raw_sql(
-        page=page, 
-        size=page_size, 
-        status_filter=status, 
-        search=search
+    return trusted_response(RescueRequestService.get_changes(since=since, limit=limit, include=include))
+
+
+# Xuất toàn bộ (báo cáo): stream từ server-side cursor, không phân trang
+@router.get("/export", auth=auth_bearer)
+@require_role(RoleCode.ADMIN)
+def export_rescue_requests(request,
+                           format: Literal["csv", "ndjson"] = "csv",
+                           status: Optional[str] = None,
+                           search: Optional[str] = None):
+    content_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    response = StreamingHttpResponse(
+        RequestExportService.astream(format, status_filter=status, search=search),
+        content_type=content_type,
     )
+    filename = f"rescue_requests_{timezone.now():%Y%m%d_%H%M%S}.{format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
 
 @router.post("/condition", response=ConditionTypeOutSchema)
@@ -1,11 +1,12 @@
 from ninja import Schema
 from pydantic import Field,field_validator
 from ..enum.rescue_status import RescueStatus
-from typing import Optional, List
+from typing import Optional, List, Dict
 from typing import Optional
 import uuid
 from datetime import datetime
 import json
+from django.conf import settings
 
 class RescueRequestSchema(Schema):
     code: str
@@ -44,6 +45,43 @@ class RescueRequestSchema(Schema):
             raise ValueError("Longitude phải nằm trong khoảng -180 đến 180")
         return v
 
+class RescueBatchIn(Schema):
+    # Nhận dict thô để validate từng item, một item lỗi không làm hỏng cả lô
+    items: List[dict] = Field(..., description="Danh sách yêu cầu cứu hộ (RescueRequestSchema)")
+
+    @field_validator("items")
+    def must_not_exceed_limit(cls, v):
+        if not v:
+            raise ValueError("Danh sách yêu cầu không được để trống")
+        if len(v) > settings.RESCUE_BATCH_MAX_ITEMS:
+            raise ValueError(f"Tối đa {settings.RESCUE_BATCH_MAX_ITEMS} yêu cầu mỗi lần gửi")
+        return v
+
+class RescueBatchItemResult(Schema):
+    index: int
+    success: bool
+    id: Optional[uuid.UUID] = None
+    code: Optional[str] = None
+    status: Optional[str] = None
+    errors: Optional[List[dict]] = None
+
+class RescueBatchResponse(Schema):
+    total: int
+    created: int
+    failed: int
+    results: List[RescueBatchItemResult]
+
+class UploadSessionIn(Schema):
+    filename: str
+    size: int = Field(..., description="Tổng số byte của file")
+    content_type: Optional[str] = None
+
+class UploadSessionOut(Schema):
+    upload_id: uuid.UUID
+    offset: int
+    size: int
+    expires_at: float
+
 class RescueMapPoint(Schema):
     id: uuid.UUID
     code:str
@@ -61,6 +99,7 @@ class RescueMapPointCluster(Schema):
     latitude: float
     longitude: float
     total: int
+    statuses: Optional[Dict[str, int]] = None  # số yêu cầu theo trạng thái (nguồn pyramid)
 
 class ActiveAssignmentSchema(Schema):
     task_id: uuid.UUID
@@ -88,6 +127,9 @@ class RescueRequestTableRow(Schema):
     conditions: List[str] = []
     description_short: str
     media_urls: List[str]=[]
+    # Cùng thứ tự với media_urls; null: video chưa có ảnh poster
+    thumbnail_urls: List[Optional[str]]=[]
+    preview_urls: List[Optional[str]]=[]
     active_assignment: Optional[ActiveAssignmentSchema] = None
     
     @field_validator('conditions', mode='before')
@@ -103,7 +145,7 @@ class RescueRequestTableRow(Schema):
                 # hoặc raise ValueError tùy logic
                 return [value] 
         return value
-    @field_validator('media_urls', mode='before')
+    @field_validator('media_urls', 'thumbnail_urls', 'preview_urls', mode='before')
     @classmethod
     def parse_media(cls, value):
         # Nếu DB trả về string '[]' hoặc '[{"url":...}]', ta parse nó ra
@@ -151,6 +193,13 @@ class ConditionTypeOutSchema(Schema):
 
 class PaginatedRescueResponse(Schema):
     items: List[RescueRequestTableRow]
-    total: int
+    total: Optional[int] = None
+    total_exact: Optional[bool] = None  # False: total là số ước lượng
     page: int
-    page_size: int
\ No newline at end of file
+    page_size: int
+    next_cursor: Optional[str] = None
+class RescueChangesResponse(Schema):
+    items: List[RescueRequestTableRow]  # yêu cầu đã tạo / thay đổi
+    deleted: List[uuid.UUID]            # id yêu cầu đã xóa
+    next_since: str
+    has_more: bool
@@ -6,6 +6,7 @@ from django.utils import timezone
 from ..models import RescueRequest, RescueTeam, RescueAssignments
 from ..enum.rescue_status import TeamStatus, TaskStatus, RescueStatus, RESCUE_STATUS
 from ..enum.role_enum import RoleCode
+from .data_version import DataVersionService
 import json
 
 
@@ -69,6 +70,7 @@ class AssignService:
 
             request.status= RESCUE_STATUS[RescueStatus.ASSIGNED]
             request.save(update_fields=['status'])
+            DataVersionService.bump_request_scopes(request.account_id)
 
             # --- Socket Notification ---
             payload = {
@@ -240,6 +242,7 @@ class AssignService:
             rescue_req = task.rescue_request
             rescue_req.status = RESCUE_STATUS[RescueStatus.IN_PROGRESS]
             rescue_req.save(update_fields=['status'])
+            DataVersionService.bump_request_scopes(rescue_req.account_id)
             
             payload = {
                 "task_id": task.id, 
@@ -262,6 +265,7 @@ class AssignService:
             
             task.status = TaskStatus.ARRIVED
             task.save(update_fields=['status'])
+            DataVersionService.bump_request_scopes(task.rescue_request.account_id)
             
             payload = {
                 "task_id": task.id, 
@@ -306,6 +310,7 @@ class AssignService:
             rescue_req = task.rescue_request
             rescue_req.status = RESCUE_STATUS[RescueStatus.COMPLETED]
             rescue_req.save()
+            DataVersionService.bump_request_scopes(rescue_req.account_id)
 
             payload = {
                 "task_id": task.id, 
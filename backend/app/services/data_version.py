@@ -0,0 +1,93 @@
+"""
+Phiên bản dữ liệu dùng làm khóa cache.
+
+Mỗi scope (vd. "requests") có một số phiên bản trong bảng data_versions, tăng sau
+khi transaction ghi dữ liệu commit. Cache đặt phiên bản vào key: dữ liệu đổi thì key
+đổi, entry cũ tự hết hạn theo TTL. Vì phiên bản nằm trong DB nên mọi process thấy
+giống nhau, kể cả khi cache là LocMem riêng từng process.
+"""
+import logging
+from typing import Dict, Iterable
+
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..enum.rescue_status import TaskStatus
+from ..models import RescueRequest, RescueAssignments, RescueTeam
+from ..repositories import IDataVersionRepo, DataVersionRepo
+
+logger = logging.getLogger("app")
+
+
+class DataVersionService:
+    REQUESTS = "requests"       # toàn bộ yêu cầu cứu hộ (danh sách admin, đếm tổng)
+    TEAMS = "teams"             # đội cứu hộ (danh sách đội, thông tin đội trong nhiệm vụ)
+    MAP_CLUSTERS = "map_clusters"  # pyramid gộp điểm, tăng trong map_cluster_fold() (sql/013)
+
+    repo: IDataVersionRepo = DataVersionRepo()
+
+    @staticmethod
+    def account_scope(account_id) -> str:
+        """Yêu cầu cứu hộ của một tài khoản (lịch sử của người dân)"""
+        return f"account:{account_id}"
+
+    @classmethod
+    def get(cls, *scopes: str) -> Dict[str, int]:
+        return cls.repo.get_many(scopes)
+
+    @classmethod
+    def bump_request_scopes(cls, *account_ids):
+        """Dữ liệu hiển thị của yêu cầu cứu hộ đổi: tăng scope chung + scope của chủ yêu cầu"""
+        accounts = {cls.account_scope(a) for a in account_ids if a}
+        cls.bump(cls.REQUESTS, *accounts)
+
+    @classmethod
+    def bump_requests(cls, request_ids: Iterable):
+        """Như bump_request_scopes nhưng chỉ biết id yêu cầu (tự tra chủ yêu cầu)"""
+        account_ids = (
+            RescueRequest.objects.filter(id__in=list(request_ids))
+            .exclude(account_id=None)
+            .values_list("account_id", flat=True)
+            .distinct()
+        )
+        cls.bump_request_scopes(*account_ids)
+
+    @classmethod
+    def bump_for_team(cls, team_id):
+        """Đội đổi tên / SĐT / vị trí: các yêu cầu đội đang làm hiển thị thông tin đội"""
+        request_ids = (
+            RescueAssignments.objects.filter(rescue_team_id=team_id, status__in=[
+                TaskStatus.ASSIGNED, TaskStatus.IN_PROGRESS, TaskStatus.ARRIVED,
+            ]).values_list("rescue_request_id", flat=True)
+        )
+        cls.bump_requests(request_ids)
+
+    @classmethod
+    def bump(cls, *scopes: str):
+        """Tăng phiên bản sau khi transaction hiện tại commit (ngoài transaction: tăng ngay)"""
+        transaction.on_commit(lambda: cls._bump_now(scopes))
+
+    @classmethod
+    def _bump_now(cls, scopes):
+        try:
+            cls.repo.bump(scopes)
+        except DatabaseError as e:
+            # Không làm hỏng request đã ghi xong; cache cũ tự hết hạn theo TTL
+            logger.warning("Bump data version %s failed: %s", scopes, e)
+
+
+# Ghi qua ORM (điều phối, hoàn thành nhiệm vụ, trang admin...). INSERT bằng SQL thô
+# tự gọi DataVersionService.bump (xem RescueRequestService._insert_rows).
+@receiver(post_save, sender=RescueRequest)
+@receiver(post_delete, sender=RescueRequest)
+def bump_requests_version(sender, instance, **kwargs):
+    DataVersionService.bump_request_scopes(instance.account_id)
+
+
+# Trạng thái đội đổi qua ORM khi điều phối / hoàn thành; sửa thông tin đội bằng SQL thô
+# tự gọi bump (xem RescueService.update_rescue_team)
+@receiver(post_save, sender=RescueTeam)
+@receiver(post_delete, sender=RescueTeam)
+def bump_teams_version(sender, instance, **kwargs):
+    DataVersionService.bump(DataVersionService.TEAMS)
@@ -0,0 +1,315 @@
+"""
+Nhật ký ghi trước (write-behind) cho yêu cầu cứu hộ khi Postgres quá tải.
+
+Cách hoạt động:
+- append(): ghi yêu cầu vào SQLite (WAL, synchronous=FULL) rồi trả ngay id thật
+  và một mã tạm dạng `SG-TMP-1A2B3C4D`. id được sinh trước nên không đổi khi vào DB,
+  trừ khi lúc drain yêu cầu bị gộp vào một yêu cầu trùng có sẵn: khi đó id được ghi vào
+  rescue_request_aliases (sql/015) và RescueRequestService.resolve_request_id() trả về
+  id của yêu cầu đã gộp (upload media theo id cũ vẫn chạy).
+- Một thread nền (drainer) lấy từng lô theo thứ tự, cấp mã chính thức, INSERT nhiều
+  dòng vào rescue_requests rồi xóa các dòng đã ghi khỏi nhật ký.
+- Nhiều process có thể dùng chung một file nhật ký; chỉ process giữ "lease" trong
+  bảng drainer_lease mới được drain, lease hết hạn thì process khác tiếp quản.
+
+Khôi phục sau sự cố:
+- Dữ liệu đã được xác nhận với người dân luôn nằm trong file SQLite (đã fsync),
+  process chết cũng không mất. Khi khởi động lại với RESCUE_SURGE_MODE khác "off",
+  AppConfig.ready() thấy file nhật ký còn tồn tại sẽ bật drainer để ghi tiếp.
+- Mã chính thức được lưu vào nhật ký (final_code) TRƯỚC khi INSERT, nên nếu chết
+  giữa chừng thì lần chạy lại dùng đúng mã cũ. INSERT dùng ON CONFLICT (id) DO NOTHING
+  nên dòng đã vào DB nhưng chưa kịp xóa khỏi nhật ký sẽ không bị ghi hai lần.
+- Dòng lỗi dữ liệu (không phải lỗi kết nối) được thử lại tối đa
+  RESCUE_JOURNAL_MAX_ATTEMPTS lần rồi giữ lại trong nhật ký (đếm ở metrics "dead")
+  để xử lý tay; không chặn các dòng phía sau.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, connection, transaction
+
+from ..enum.rescue_status import RESCUE_STATUS, RescueStatus
+
+logger = logging.getLogger("app")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS intake_journal (
+        seq              INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id       TEXT NOT NULL UNIQUE,
+        province_code    TEXT NOT NULL,
+        provisional_code TEXT NOT NULL,
+        final_code       TEXT,
+        account_id       TEXT,
+        payload          TEXT NOT NULL,
+        created_at       REAL NOT NULL,
+        attempts         INTEGER NOT NULL DEFAULT 0,
+        last_error       TEXT
+    );
+    CREATE TABLE IF NOT EXISTS drainer_lease (
+        id         INTEGER PRIMARY KEY CHECK (id = 1),
+        owner      TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+"""
+
+
+class IntakeJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._drainer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._drained_total = 0
+        self._drain_events = deque()  # (timestamp, số dòng) trong cửa sổ tính tốc độ
+        self._last_drain_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # --- Ghi ---
+    def append(self, payload: Dict[str, Any], account_id: Optional[str] = None) -> Dict[str, Any]:
+        """Ghi bền một yêu cầu vào nhật ký và trả về id + mã tạm"""
+        payload = dict(payload)
+        province_code = (payload.pop("code", None) or "VN").upper()
+        request_id = uuid.uuid4()
+        provisional_code = f"{province_code}-TMP-{request_id.hex[:8].upper()}"
+
+        self._conn().execute(
+            """
+            INSERT INTO intake_journal
+                (request_id, province_code, provisional_code, account_id, payload, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [str(request_id), province_code, provisional_code,
+             str(account_id) if account_id else None, json.dumps(payload), time.time()],
+        )
+        self.start_drainer()
+
+        return {
+            "id": request_id,
+            "code": provisional_code,
+            "status": RESCUE_STATUS[RescueStatus.PENDING],
+            "merged": False,
+            "queued": True,
+        }
+
+    def depth(self) -> int:
+        """Số yêu cầu còn chờ ghi vào DB (không tính dòng đã bỏ cuộc)"""
+        if not os.path.exists(self.path):
+            return 0
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM intake_journal WHERE attempts < ?",
+            [settings.RESCUE_JOURNAL_MAX_ATTEMPTS],
+        ).fetchone()[0]
+
+    # --- Drain ---
+    def _acquire_lease(self) -> bool:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM drainer_lease WHERE id = 1").fetchone()
+            if row and row[0] != self.owner and row[1] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO drainer_lease (id, owner, expires_at) VALUES (1, ?, ?)",
+                [self.owner, now + settings.RESCUE_JOURNAL_LEASE_SECONDS],
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _assign_final_codes(self, rows: List[tuple]) -> Dict[int, str]:
+        """Cấp mã chính thức cho các dòng chưa có và lưu ngay vào nhật ký"""
+        from .rescue_request_servive import RescueRequestService
+
+        codes = {seq: final_code for seq, _, _, final_code, _, _ in rows if final_code}
+        by_province: Dict[str, List[int]] = {}
+        for seq, _, province_code, final_code, _, _ in rows:
+            if not final_code:
+                by_province.setdefault(province_code, []).append(seq)
+
+        conn = self._conn()
+        for province_code, seqs in by_province.items():
+            new_codes = RescueRequestService._generate_codes(province_code, len(seqs))
+            conn.executemany(
+                "UPDATE intake_journal SET final_code = ? WHERE seq = ?",
+                list(zip(new_codes, seqs)),
+            )
+            codes.update(zip(seqs, new_codes))
+        return codes
+
+    def _insert(self, rows: List[tuple], codes: Dict[int, str]):
+        from .rescue_request_servive import RescueRequestService
+
+        entries = []
+        for seq, request_id, _, _, account_id, payload in rows:
+            payload = json.loads(payload)
+            entries.append((payload, RescueRequestService._build_insert_row(
+                payload, codes[seq], account_id, request_id=uuid.UUID(request_id)
+            )))
+        with transaction.atomic():
+            if not settings.RESCUE_DEDUP_ENABLED:
+                RescueRequestService._insert_rows([row for _, row in entries], ignore_existing=True)
+                return
+
+            # Gộp báo trùng như create_request. Ghi từng dòng để hai lần báo trùng nằm
+            # trong cùng lô cũng được gộp với nhau.
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT id FROM rescue_requests WHERE id = ANY(%s)",
+                               [[row[0] for _, row in entries]])
+                existing = {row[0] for row in cursor.fetchall()}
+
+            for payload, row in entries:
+                if row[0] in existing:
+                    # Đã ghi ở lần chạy trước (dừng giữa chừng trước khi xóa khỏi nhật ký)
+                    continue
+                duplicate_id = RescueRequestService._find_duplicate(payload)
+                if duplicate_id:
+                    # Dừng sau commit mà trước khi xóa khỏi nhật ký thì lần chạy lại gộp thêm
+                    # một lần (ghi chú lặp lại), không tạo yêu cầu mới
+                    RescueRequestService._merge_duplicate(duplicate_id, payload)
+                    RescueRequestService._record_alias(row[0], duplicate_id)
+                else:
+                    RescueRequestService._insert_rows([row], ignore_existing=True)
+
+    def drain_once(self, batch_size: Optional[int] = None) -> int:
+        """Ghi một lô từ nhật ký vào rescue_requests. Trả về số dòng đã ghi."""
+        batch_size = batch_size or settings.RESCUE_JOURNAL_BATCH_SIZE
+        conn = self._conn()
+        rows = conn.execute(
+            """
+            SELECT seq, request_id, province_code, final_code, account_id, payload
+            FROM intake_journal
+            WHERE attempts < ?
+            ORDER BY seq
+            LIMIT ?
+            """,
+            [settings.RESCUE_JOURNAL_MAX_ATTEMPTS, batch_size],
+        ).fetchall()
+        if not rows:
+            return 0
+
+        codes = self._assign_final_codes(rows)
+
+        try:
+            self._insert(rows, codes)
+            done = rows
+        except OperationalError:
+            # DB vẫn quá tải / mất kết nối: giữ nguyên cả lô, thử lại sau
+            raise
+        except DatabaseError:
+            # Có dòng lỗi dữ liệu: ghi từng dòng để không chặn cả lô
+            done = []
+            for row in rows:
+                try:
+                    self._insert([row], codes)
+                    done.append(row)
+                except OperationalError:
+                    raise
+                except DatabaseError as e:
+                    conn.execute(
+                        "UPDATE intake_journal SET attempts = attempts + 1, last_error = ? WHERE seq = ?",
+                        [str(e), row[0]],
+                    )
+
+        conn.executemany("DELETE FROM intake_journal WHERE seq = ?", [(row[0],) for row in done])
+        self._record_drain(len(done))
+        return len(done)
+
+    def _record_drain(self, count: int):
+        now = time.time()
+        with self._stats_lock:
+            self._drained_total += count
+            self._last_drain_at = now
+            self._drain_events.append((now, count))
+            window_start = now - settings.RESCUE_JOURNAL_RATE_WINDOW_SECONDS
+            while self._drain_events and self._drain_events[0][0] < window_start:
+                self._drain_events.popleft()
+
+    def _run(self):
+        backoff = settings.RESCUE_JOURNAL_POLL_SECONDS
+        while True:
+            try:
+                if self._acquire_lease():
+                    drained = self.drain_once()
+                    self._last_error = None
+                    backoff = settings.RESCUE_JOURNAL_POLL_SECONDS
+                    if drained:
+                        continue
+                time.sleep(settings.RESCUE_JOURNAL_POLL_SECONDS)
+            except Exception as e:
+                self._last_error = str(e)
+                logger.warning("Intake journal drain failed: %s", e)
+                # Bỏ kết nối hỏng để lần sau mở kết nối mới
+                connection.close()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def start_drainer(self):
+        if self._drainer and self._drainer.is_alive():
+            return
+        with self._start_lock:
+            if self._drainer and self._drainer.is_alive():
+                return
+            self._drainer = threading.Thread(target=self._run, name="intake-journal-drainer", daemon=True)
+            self._drainer.start()
+
+    # --- Metrics ---
+    def metrics(self) -> Dict[str, Any]:
+        exists = os.path.exists(self.path)
+        depth, dead, oldest = 0, 0, None
+        if exists:
+            conn = self._conn()
+            depth, oldest = conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM intake_journal WHERE attempts < ?",
+                [settings.RESCUE_JOURNAL_MAX_ATTEMPTS],
+            ).fetchone()
+            dead = conn.execute(
+                "SELECT COUNT(*) FROM intake_journal WHERE attempts >= ?",
+                [settings.RESCUE_JOURNAL_MAX_ATTEMPTS],
+            ).fetchone()[0]
+
+        now = time.time()
+        with self._stats_lock:
+            window_start = now - settings.RESCUE_JOURNAL_RATE_WINDOW_SECONDS
+            recent = sum(count for ts, count in self._drain_events if ts >= window_start)
+            drained_total = self._drained_total
+            last_drain_at = self._last_drain_at
+
+        return {
+            "mode": settings.RESCUE_SURGE_MODE,
+            "depth": depth,
+            "dead": dead,
+            "oldest_age_seconds": round(now - oldest, 3) if oldest else None,
+            "drained_total": drained_total,
+            "drain_rate_per_second": round(recent / settings.RESCUE_JOURNAL_RATE_WINDOW_SECONDS, 3),
+            "last_drain_at": last_drain_at,
+            "drainer_running": bool(self._drainer and self._drainer.is_alive()),
+            "last_error": self._last_error,
+        }
+
+
+intake_journal = IntakeJournal(str(settings.RESCUE_JOURNAL_PATH))
@@ -0,0 +1,75 @@
+import json
+import math
+from typing import Any, Dict, List, Tuple
+
+from django.db import connection
+
+
+class MapClusterPyramid:
+    """
+    Gộp điểm cho bản đồ ở zoom thấp từ pyramid lưới tính sẵn (sql/010_map_cluster_pyramid.sql)
+    thay cho ST_ClusterWithin trên toàn bộ điểm trong khung nhìn.
+
+    Zoom z đọc level z + LEVEL_OFFSET (ô tile rộng 256 / 2^LEVEL_OFFSET = 64px).
+    Công thức ô phải khớp hàm SQL map_cluster_cell().
+    """
+
+    LEVEL_OFFSET = 2
+    MAX_ZOOM = 14           # zoom >= 15 trả điểm thật
+    MAX_LAT = 85.05112878   # giới hạn Web Mercator
+
+    @classmethod
+    def cell(cls, lng: float, lat: float, level: int) -> Tuple[int, int]:
+        n = 1 << level
+        lat = min(max(lat, -cls.MAX_LAT), cls.MAX_LAT)
+        cx = math.floor((lng + 180.0) / 360.0 * n)
+        lat_rad = math.radians(lat)
+        cy = math.floor((1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n)
+        return min(max(cx, 0), n - 1), min(max(cy, 0), n - 1)
+
+    @staticmethod
+    def fold(cursor) -> bool:
+        """
+        Gộp delta đang chờ vào ô (sql/013, không chờ khóa). False nếu process khác đang gộp:
+        ô có thể thiếu vài thay đổi gần nhất.
+        """
+        cursor.execute("SELECT map_cluster_fold()")
+        return cursor.fetchone()[0] is not None
+
+    @classmethod
+    def clusters(cls, min_lat: float, max_lat: float,
+                 min_lng: float, max_lng: float, zoom: int) -> List[Dict[str, Any]]:
+        level = min(max(zoom, 0), cls.MAX_ZOOM) + cls.LEVEL_OFFSET
+        # Trục y của tile tăng về phía nam: góc tây bắc cho cx, cy nhỏ nhất
+        min_cx, min_cy = cls.cell(min_lng, max_lat, level)
+        max_cx, max_cy = cls.cell(max_lng, min_lat, level)
+
+        with connection.cursor() as cursor:
+            # Bỏ qua vì process khác đang gộp: ô có thể thiếu vài delta, nhưng lần gộp đó commit
+            # sẽ tăng DataVersionService.MAP_CLUSTERS (nằm trong ETag của map-points)
+            cls.fold(cursor)
+            cursor.execute("""
+                SELECT
+                    sum_lat / total AS latitude,
+                    sum_lng / total AS longitude,
+                    total,
+                    statuses
+                FROM map_cluster_cells
+                WHERE level = %(level)s
+                  AND cx BETWEEN %(min_cx)s AND %(max_cx)s
+                  AND cy BETWEEN %(min_cy)s AND %(max_cy)s
+                  AND total > 0
+                ORDER BY total DESC
+            """, {
+                "level": level,
+                "min_cx": min_cx, "max_cx": max_cx,
+                "min_cy": min_cy, "max_cy": max_cy,
+            })
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        for row in rows:
+            # Cursor thô của Django không tự giải mã jsonb (chỉ JSONField làm việc đó)
+            if isinstance(row["statuses"], str):
+                row["statuses"] = json.loads(row["statuses"])
+        return rows
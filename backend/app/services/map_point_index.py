@@ -0,0 +1,335 @@
+"""
+Chỉ mục không gian trong RAM cho /api/requests/map-points ở zoom >= 15.
+
+Mỗi worker giữ các yêu cầu còn mở (OPEN_STATUSES, như chỉ mục một phần của sql/012) trong
+các ô lưới CELL_DEG độ; truy vấn khung nhìn chỉ duyệt các ô giao với khung, không chạm DB.
+Lịch sử yêu cầu đã đóng không nằm trong RAM: bộ lọc trạng thái không phải tập con của
+OPEN_STATUSES (kể cả không lọc) thì dùng SQL. Đồng bộ theo change_xid của
+rescue_requests và rescue_request_tombstones (sql/009), cùng cách với /requests/changes:
+mốc tiếp theo là xmin của snapshot nên không sót thay đổi commit muộn.
+
+Đồng bộ và so với DB chạy ở thread nền, người đọc không bao giờ chờ DB. Chỉ mục có thể
+chậm hơn phiên bản "requests" hiện tại nên ETag của map-points gộp thêm `version` (phiên
+bản chỉ mục đã theo kịp): đồng bộ xong thì ETag đổi, client không bị 304 với dữ liệu cũ.
+
+Trả None (router gọi SQL như cũ) khi chỉ mục tắt, chưa nạp xong hoặc đồng bộ lỗi quá
+MAP_POINT_INDEX_MAX_STALE_SECONDS. Định kỳ so với DB, lệch thì nạp lại toàn bộ.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from ..enum.rescue_status import RESCUE_STATUS, RescueStatus
+from .data_version import DataVersionService
+
+logger = logging.getLogger("app")
+
+Cell = Tuple[int, int]
+
+
+class MapPointIndex:
+    CELL_DEG = 0.01     # ~1.1 km; khung nhìn zoom 15 cỡ vài ô
+
+    # Như RescueRequestService.OPEN_STATUSES (không import được: service đó dùng chỉ mục này)
+    OPEN_STATUSES = frozenset([
+        RESCUE_STATUS[RescueStatus.PENDING],
+        RESCUE_STATUS[RescueStatus.ASSIGNED],
+        RESCUE_STATUS[RescueStatus.IN_PROGRESS],
+    ])
+
+    # Cùng cột và thứ tự với truy vấn SQL trong RescueRequestService.get_map_points
+    _SELECT = """
+        SELECT
+            r.id,
+            r.code,
+            r.name,
+            r.adults,
+            r.children,
+            r.elderly,
+            r.conditions,
+            r.contact_phone,
+            r.status,
+            r.address,
+            ST_Y(r.location) AS latitude,
+            ST_X(r.location) AS longitude,
+            r.created_at
+        FROM rescue_requests r
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()        # bảo vệ _buckets / _rows / _stats
+        self._sync_lock = threading.Lock()   # một thread nạp / đồng bộ tại một thời điểm
+        self._buckets: Dict[Cell, Dict[Any, Tuple]] = {}
+        self._rows: Dict[Any, Tuple[Cell, Tuple]] = {}
+        self._since: Optional[int] = None
+        self._version: Optional[int] = None  # phiên bản "requests" mà chỉ mục đã theo kịp
+        self._ready = False
+        self._synced_at = 0.0
+        self._checked_at = 0.0
+        self._sync_requested_at = 0.0
+        self._warm_attempted_at = 0.0
+        self._stats = {"queries": 0, "fallbacks": 0, "rebuilds": 0, "last_check": None}
+
+    # --- Truy vấn ---
+    def query(self, min_lat: float, max_lat: float,
+              min_lng: float, max_lng: float,
+              statuses: Optional[List[str]] = None,
+              conditions: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """statuses / conditions: cùng nghĩa với bộ lọc SQL của get_map_points"""
+        if not settings.MAP_POINT_INDEX_ENABLED:
+            return None
+        # Chỉ mục chỉ có yêu cầu còn mở
+        if not statuses or not self.OPEN_STATUSES.issuperset(statuses):
+            return None
+
+        self._maybe_sync()
+        if not self._ready or time.monotonic() - self._synced_at > settings.MAP_POINT_INDEX_MAX_STALE_SECONDS:
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            return None
+
+        min_cx, min_cy = self._cell(min_lng, min_lat)
+        max_cx, max_cy = self._cell(max_lng, max_lat)
+        found = []
+        with self._lock:
+            for cx in range(min_cx, max_cx + 1):
+                for cy in range(min_cy, max_cy + 1):
+                    bucket = self._buckets.get((cx, cy))
+                    if not bucket:
+                        continue
+                    for created_at, row, tags in bucket.values():
+                        if not (min_lng <= row["longitude"] <= max_lng and min_lat <= row["latitude"] <= max_lat):
+                            continue
+                        if statuses and row["status"] not in statuses:
+                            continue
+                        if conditions and tags.isdisjoint(conditions):
+                            continue
+                        found.append((created_at, row))
+            self._stats["queries"] += 1
+
+        found.sort(key=lambda item: item[0], reverse=True)
+        return [row for _, row in found]
+
+    @property
+    def version(self) -> Optional[int]:
+        """Phiên bản "requests" mà chỉ mục đã theo kịp (None: chưa nạp), dùng trong ETag"""
+        return self._version
+
+    @staticmethod
+    def _current_version() -> int:
+        return DataVersionService.get(DataVersionService.REQUESTS)[DataVersionService.REQUESTS]
+
+    def _cell(self, lng: float, lat: float) -> Cell:
+        return math.floor(lng / self.CELL_DEG), math.floor(lat / self.CELL_DEG)
+
+    # --- Nạp / đồng bộ ---
+    def start(self):
+        """Nạp lần đầu ở thread nền (gọi từ AppConfig.ready), trong lúc chờ dùng SQL"""
+        if settings.MAP_POINT_INDEX_ENABLED:
+            self._warm_attempted_at = time.monotonic()
+            threading.Thread(target=self._warm_in_background, name="map-point-index", daemon=True).start()
+
+    def _warm_in_background(self):
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._rebuild()
+        except DatabaseError as e:
+            logger.warning("Map point index warm-up failed: %s", e)
+        finally:
+            self._sync_lock.release()
+            connection.close()
+
+    @staticmethod
+    def _horizon(cursor) -> int:
+        cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")
+        return int(cursor.fetchone()[0])
+
+    @staticmethod
+    def _fetch(cursor) -> List[Dict[str, Any]]:
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _rebuild(self):
+        # Phiên bản đọc trước dữ liệu: phiên bản tăng sau commit nên dữ liệu của nó đã thấy được
+        version = self._current_version()
+        with connection.cursor() as cursor:
+            horizon = self._horizon(cursor)
+            cursor.execute(f"{self._SELECT} WHERE r.location IS NOT NULL AND r.status = ANY(%(open)s)",
+                           {"open": list(self.OPEN_STATUSES)})
+            rows = self._fetch(cursor)
+
+        buckets: Dict[Cell, Dict[Any, Tuple]] = {}
+        index: Dict[Any, Tuple[Cell, Tuple]] = {}
+        for row in rows:
+            cell = self._cell(row["longitude"], row["latitude"])
+            entry = self._entry(row)
+            buckets.setdefault(cell, {})[row["id"]] = entry
+            index[row["id"]] = (cell, entry)
+
+        with self._lock:
+            self._buckets, self._rows = buckets, index
+            self._stats["rebuilds"] += 1
+        self._since = horizon
+        self._version = version
+        self._ready = True
+        self._synced_at = self._checked_at = time.monotonic()
+
+    def _maybe_sync(self):
+        if not self._ready:
+            # Lần nạp trước lỗi (DB chưa sẵn sàng lúc khởi động...): thử lại định kỳ
+            if time.monotonic() - self._warm_attempted_at >= settings.MAP_POINT_INDEX_MAX_STALE_SECONDS:
+                self.start()
+            return
+        now = time.monotonic()
+        # Đang đồng bộ / kiểm tra ở thread nền: trả dữ liệu hiện có, không chờ
+        if (now - max(self._synced_at, self._sync_requested_at) < settings.MAP_POINT_INDEX_SYNC_SECONDS
+                or self._sync_lock.locked()):
+            return
+        self._sync_requested_at = now
+        # Quét cả bảng định kỳ thay cho một lần đồng bộ
+        check = now - self._checked_at >= settings.MAP_POINT_INDEX_CHECK_SECONDS
+        if check:
+            self._checked_at = now
+        threading.Thread(target=self._sync_in_background, args=(check,),
+                         name="map-point-index-sync", daemon=True).start()
+
+    def _sync_in_background(self, check: bool):
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._sync()
+            if check and not self.check()["consistent"]:
+                self._rebuild()
+        except DatabaseError as e:
+            # Giữ dữ liệu cũ; quá MAX_STALE thì query() tự chuyển sang SQL
+            logger.warning("Map point index sync failed: %s", e)
+        finally:
+            self._sync_lock.release()
+            connection.close()
+
+    def _sync(self):
+        params = {"since": str(self._since)}
+        version = self._current_version()
+        with connection.cursor() as cursor:
+            horizon = self._horizon(cursor)
+            # Dòng có xid >= mốc đã thấy lần này sẽ được áp lại lần sau (ghi đè, vô hại)
+            cursor.execute(f"{self._SELECT} WHERE r.change_xid >= %(since)s::xid8", params)
+            changed = self._fetch(cursor)
+            cursor.execute(
+                "SELECT request_id FROM rescue_request_tombstones WHERE change_xid >= %(since)s::xid8",
+                params,
+            )
+            deleted = [row[0] for row in cursor.fetchall()]
+
+        with self._lock:
+            for request_id in deleted:
+                self._remove(request_id)
+            for row in changed:
+                self._remove(row["id"])
+                # Yêu cầu đã đóng (hoàn thành / hủy...) rời khỏi chỉ mục
+                if row["latitude"] is None or row["longitude"] is None or row["status"] not in self.OPEN_STATUSES:
+                    continue
+                cell = self._cell(row["longitude"], row["latitude"])
+                entry = self._entry(row)
+                self._buckets.setdefault(cell, {})[row["id"]] = entry
+                self._rows[row["id"]] = (cell, entry)
+
+        self._since = horizon
+        self._version = version
+        self._synced_at = time.monotonic()
+
+    @staticmethod
+    def _entry(row: Dict[str, Any]) -> Tuple[Any, Dict[str, Any], FrozenSet[str]]:
+        """
+        (created_at, dòng trả ra, tập tình trạng). Cursor thô trả jsonb dạng chuỗi: giải mã
+        một lần lúc nạp thay vì mỗi truy vấn; dòng trả ra giữ nguyên conditions.
+        """
+        conditions = row["conditions"]
+        if isinstance(conditions, str):
+            conditions = json.loads(conditions)
+        return row.pop("created_at"), row, frozenset(conditions or ())
+
+    def _remove(self, request_id):
+        found = self._rows.pop(request_id, None)
+        if found is None:
+            return
+        cell, _ = found
+        bucket = self._buckets.get(cell)
+        if bucket is not None:
+            bucket.pop(request_id, None)
+            if not bucket:
+                del self._buckets[cell]
+
+    # --- Kiểm tra nhất quán ---
+    def check(self) -> Dict[str, Any]:
+        """
+        So chỉ mục với các yêu cầu còn mở trong DB tại mốc đồng bộ hiện tại. Dòng đổi / xóa
+        sau mốc (chưa đồng bộ) không tính là lệch.
+        """
+        params = {"since": str(self._since), "open": list(self.OPEN_STATUSES)}
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, status, ST_X(location), ST_Y(location), change_xid < %(since)s::xid8
+                FROM rescue_requests
+                WHERE location IS NOT NULL AND status = ANY(%(open)s)
+            """, params)
+            db_rows = cursor.fetchall()
+            # Đổi (vd. vừa đóng) hoặc xóa sau mốc: chỉ mục còn giữ là đúng tại mốc
+            cursor.execute("""
+                SELECT id FROM rescue_requests WHERE change_xid >= %(since)s::xid8
+                UNION ALL
+                SELECT request_id FROM rescue_request_tombstones WHERE change_xid >= %(since)s::xid8
+            """, params)
+            pending = {row[0] for row in cursor.fetchall()}
+
+        with self._lock:
+            indexed = {request_id: entry[1] for request_id, (_, entry) in self._rows.items()}
+
+        missing = stale = 0
+        for request_id, status, lng, lat, settled in db_rows:
+            row = indexed.get(request_id)
+            if not settled:
+                continue
+            if row is None:
+                missing += 1
+            elif (row["status"], row["longitude"], row["latitude"]) != (status, lng, lat):
+                stale += 1
+        db_ids = {row[0] for row in db_rows}
+        extra = sum(1 for request_id in indexed if request_id not in db_ids and request_id not in pending)
+
+        result = {
+            "consistent": missing == stale == extra == 0,
+            "indexed": len(indexed),
+            "db": len(db_rows),
+            "missing": missing,
+            "stale": stale,
+            "extra": extra,
+        }
+        self._checked_at = time.monotonic()
+        with self._lock:
+            self._stats["last_check"] = result
+        if not result["consistent"]:
+            logger.warning("Map point index out of sync, rebuilding: %s", result)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            points, cells, stats = len(self._rows), len(self._buckets), dict(self._stats)
+        return {
+            "enabled": settings.MAP_POINT_INDEX_ENABLED,
+            "ready": self._ready,
+            "points": points,
+            "cells": cells,
+            "sync_age_seconds": round(time.monotonic() - self._synced_at, 3) if self._ready else None,
+            **stats,
+        }
+
+
+map_point_index = MapPointIndex()
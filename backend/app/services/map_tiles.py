@@ -0,0 +1,205 @@
+import threading
+import time
+import uuid
+from typing import Iterable, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from ..exception.custom_exceptions import BaseAppException
+from .map_cluster import MapClusterPyramid
+
+
+class MapTileService:
+    """
+    Vector tile (Mapbox Vector Tile) cho bản đồ yêu cầu cứu hộ.
+
+    - zoom >= 15: layer "requests", mỗi yêu cầu một điểm.
+    - zoom < 15: layer "clusters" lấy từ pyramid lưới (sql/010): tile (z, x, y) chứa đúng
+      4x4 ô level z + 2, mỗi ô một điểm tại tâm, kèm total và số lượng theo trạng thái.
+
+    Tile giống nhau cho mọi client nên được cache (alias "tiles") theo từng ô. Key của tile
+    gắn "thế hệ" của ô đó; điểm nào đổi thì mọi tile chứa vị trí cũ / mới (mọi zoom) nhận
+    thế hệ mới (xem sql/011, bảng map_tile_changes; sql/014: cả khi đổi thuộc tính có trong
+    layer "requests"). Thế hệ là chuỗi ngẫu nhiên chứ không
+    phải bộ đếm: key thế hệ bị LRU đẩy ra cũng không thể khớp lại tile cũ.
+    """
+
+    CONTENT_TYPE = "application/vnd.mapbox-vector-tile"
+    MAX_ZOOM = 22
+
+    _EPOCH_KEY = "tile:epoch"
+
+    _lock = threading.Lock()
+    _since: Optional[int] = None    # change_xid đã xử lý tới (theo process)
+    _synced_at = 0.0
+    _pruned_at = 0.0
+
+    @staticmethod
+    def _gen_key(z: int, x: int, y: int) -> str:
+        return f"tile:gen:{z}:{x}:{y}"
+
+    @classmethod
+    def tile(cls, z: int, x: int, y: int) -> bytes:
+        if not 0 <= z <= cls.MAX_ZOOM or not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+            raise BaseAppException("Tọa độ tile không hợp lệ")
+
+        cls._sync()
+
+        store = caches["tiles"]
+        epoch = cls._token(store, cls._EPOCH_KEY)
+        gen = cls._token(store, cls._gen_key(z, x, y))
+        key = f"tile:{epoch}:{z}:{x}:{y}:{gen}"
+
+        data = store.get(key)
+        if data is None:
+            data, complete = cls._render(z, x, y)
+            # Pyramid chưa gộp hết delta (process khác đang gộp): trả nhưng không cache, nếu
+            # không tile thiếu dữ liệu sẽ nằm dưới thế hệ mới tới lần đổi sau
+            if complete:
+                store.set(key, data)
+        return data
+
+    @staticmethod
+    def _token(store, key: str) -> str:
+        token = store.get(key)
+        if token is None:
+            store.add(key, uuid.uuid4().hex, timeout=None)
+            token = store.get(key)
+        return token
+
+    @classmethod
+    def _render(cls, z: int, x: int, y: int) -> Tuple[bytes, bool]:
+        if z > MapClusterPyramid.MAX_ZOOM:
+            sql = """
+                WITH bounds AS (
+                    SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+                ), points AS (
+                    SELECT
+                        ST_AsMVTGeom(ST_Transform(r.location, 3857), b.geom) AS geom,
+                        r.id::text AS id,
+                        r.code,
+                        r.name,
+                        r.contact_phone,
+                        r.status,
+                        r.adults,
+                        r.children,
+                        r.elderly
+                    FROM rescue_requests r, bounds b
+                    WHERE r.location && ST_Transform(b.geom, 4326)
+                )
+                SELECT ST_AsMVT(points, 'requests') FROM points
+            """
+            params = {"z": z, "x": x, "y": y}
+        else:
+            offset = MapClusterPyramid.LEVEL_OFFSET
+            sql = """
+                WITH bounds AS (
+                    SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+                ), clusters AS (
+                    SELECT
+                        ST_AsMVTGeom(
+                            ST_Transform(ST_SetSRID(ST_MakePoint(c.sum_lng / c.total, c.sum_lat / c.total), 4326), 3857),
+                            b.geom
+                        ) AS geom,
+                        c.total,
+                        c.statuses
+                    FROM map_cluster_cells c, bounds b
+                    WHERE c.level = %(level)s
+                      AND c.cx BETWEEN %(min_cx)s AND %(max_cx)s
+                      AND c.cy BETWEEN %(min_cy)s AND %(max_cy)s
+                      AND c.total > 0
+                )
+                SELECT ST_AsMVT(clusters, 'clusters') FROM clusters
+            """
+            params = {
+                "z": z, "x": x, "y": y,
+                "level": z + offset,
+                "min_cx": x << offset, "max_cx": ((x + 1) << offset) - 1,
+                "min_cy": y << offset, "max_cy": ((y + 1) << offset) - 1,
+            }
+
+        complete = True
+        with connection.cursor() as cursor:
+            if z <= MapClusterPyramid.MAX_ZOOM:
+                complete = MapClusterPyramid.fold(cursor)
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        return (bytes(row[0]) if row and row[0] is not None else b""), complete
+
+    @classmethod
+    def _sync(cls):
+        """
+        Đọc map_tile_changes từ lần trước và đổi thế hệ các tile bị ảnh hưởng.
+
+        Mốc tiếp theo là xmin của snapshot (đọc TRƯỚC nhật ký): mọi transaction có xid nhỏ
+        hơn đã kết thúc nên không có thay đổi nào bị sót vì commit muộn. Thay đổi có xid
+        >= mốc đã thấy lần này sẽ được xử lý lại lần sau (đổi thế hệ thừa, vô hại).
+
+        Mỗi process đồng bộ tối đa một lần mỗi MAP_TILE_SYNC_SECONDS; thread khác đang đồng
+        bộ thì trả tile theo thế hệ hiện có, không chờ. Chỉ lần đầu (chưa có mốc) là phải chờ.
+        """
+        if cls._since is not None:
+            if time.monotonic() - cls._synced_at < settings.MAP_TILE_SYNC_SECONDS:
+                return
+            if not cls._lock.acquire(blocking=False):
+                return
+        else:
+            cls._lock.acquire()
+        try:
+            cls._sync_locked()
+        finally:
+            cls._lock.release()
+
+    @classmethod
+    def _sync_locked(cls):
+        now = time.monotonic()
+        if cls._since is not None and now - cls._synced_at < settings.MAP_TILE_SYNC_SECONDS:
+            # Thread khác vừa đồng bộ xong
+            return
+        store = caches["tiles"]
+        retention = settings.MAP_TILE_CHANGE_RETENTION_SECONDS
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")
+            horizon = int(cursor.fetchone()[0])
+
+            # Lần đầu trong process / quá lâu không đồng bộ (nhật ký có thể đã bị dọn):
+            # bỏ toàn bộ cache tile
+            if cls._since is None or now - cls._synced_at > retention:
+                store.set(cls._EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+                changes = []
+            else:
+                cursor.execute("""
+                    SELECT lng, lat FROM map_tile_changes
+                    WHERE change_xid >= %(since)s::xid8
+                    LIMIT %(limit)s
+                """, {"since": str(cls._since), "limit": settings.MAP_TILE_EVICT_MAX + 1})
+                changes = cursor.fetchall()
+
+            if now - cls._pruned_at > retention / 2:
+                cursor.execute(
+                    "DELETE FROM map_tile_changes WHERE changed_at < NOW() - make_interval(secs => %s)",
+                    [retention],
+                )
+                cls._pruned_at = now
+
+        if len(changes) > settings.MAP_TILE_EVICT_MAX:
+            # Thay đổi hàng loạt: đổi epoch rẻ hơn đổi thế hệ từng tile
+            store.set(cls._EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+        elif changes:
+            tiles = cls._affected_tiles(changes)
+            token = uuid.uuid4().hex
+            store.set_many({cls._gen_key(*t): token for t in tiles}, timeout=None)
+
+        cls._since = horizon
+        cls._synced_at = now
+
+    @classmethod
+    def _affected_tiles(cls, points: Iterable[Tuple[float, float]]) -> Set[Tuple[int, int, int]]:
+        tiles = set()
+        for lng, lat in points:
+            for z in range(cls.MAX_ZOOM + 1):
+                tiles.add((z, *MapClusterPyramid.cell(lng, lat, z)))
+        return tiles
@@ -0,0 +1,322 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from ..models import RescueMedia
+from ..repositories import IMediaBlobRepo, MediaBlobRepo
+from ..workers import image_derivatives, video_poster
+from .data_version import DataVersionService
+
+logger = logging.getLogger("app")
+
+# Chữ ký đầu file (magic bytes) -> loại media
+_IMAGE_SIGNATURES = (
+    b"\xff\xd8\xff",            # JPEG
+    b"\x89PNG\r\n\x1a\n",       # PNG
+    b"GIF87a", b"GIF89a",       # GIF
+)
+_VIDEO_SIGNATURES = (
+    b"\x1a\x45\xdf\xa3",        # WebM / MKV
+)
+# Định dạng ISO-BMFF: 4 byte độ dài + 'ftyp' + brand
+_HEIF_BRANDS = (b"heic", b"heix", b"mif1", b"msf1", b"avif")
+
+
+def detect_media_type(header: bytes) -> Optional[str]:
+    """Xác định loại media từ vài chục byte đầu file, không tin content_type của client"""
+    if header.startswith(_IMAGE_SIGNATURES):
+        return RescueMedia.MediaType.IMAGE
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return RescueMedia.MediaType.IMAGE
+    if header.startswith(_VIDEO_SIGNATURES):
+        return RescueMedia.MediaType.VIDEO
+    if header[4:8] == b"ftyp":
+        if header[8:12] in _HEIF_BRANDS:
+            return RescueMedia.MediaType.IMAGE
+        return RescueMedia.MediaType.VIDEO  # mp4, mov, 3gp...
+    return None
+
+
+class MediaPipeline:
+    """
+    Xử lý file media ngoài request/transaction:
+    - store(): ghi file xuống storage theo từng chunk (không mở transaction DB),
+      lưu theo SHA-256 nên nội dung trùng chỉ lưu một lần (media_blobs + đếm tham chiếu).
+    - submit(): đưa việc nhận dạng + kiểm tra file vào thread pool sau khi đã INSERT.
+    - Ảnh hợp lệ được tạo thumbnail / preview ở process pool (resize tốn CPU, tránh GIL);
+      video dùng một khung hình (ffmpeg) làm ảnh gốc cho thumbnail / preview.
+    """
+    HEADER_SIZE = 32
+
+    blob_repo: IMediaBlobRepo = MediaBlobRepo()
+
+    def __init__(self, max_workers: int, image_processes: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="media")
+        self.image_processes = image_processes
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # spawn: process con không kế thừa thread / kết nối DB của process Django
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.image_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._process_pool
+
+    @staticmethod
+    def digest(uploaded_file) -> str:
+        """SHA-256 của file: lấy sẵn từ upload handler, nếu không có thì băm theo chunk"""
+        digest = getattr(uploaded_file, "sha256", None)
+        if digest:
+            return digest
+        sha = hashlib.sha256()
+        uploaded_file.seek(0)
+        for chunk in uploaded_file.chunks():
+            sha.update(chunk)
+        uploaded_file.seek(0)
+        return sha.hexdigest()
+
+    @staticmethod
+    def blob_name(digest: str, filename: str) -> str:
+        ext = os.path.splitext(filename or "")[1].lower()[:10]
+        return f"rescue_media/blobs/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def store(self, uploaded_file) -> Tuple[str, str]:
+        """
+        Ghi file vào storage (local/S3) theo nội dung, trả về (digest, đường dẫn).
+        Nội dung đã có blob thì không ghi lại (tiết kiệm dung lượng, thời gian và egress S3).
+        """
+        digest = self.digest(uploaded_file)
+        blob = self.blob_repo.get(digest)
+        if blob:
+            return digest, blob.file.name
+
+        name = self.blob_name(digest, uploaded_file.name)
+        if default_storage.exists(name):
+            # File còn sót từ lần trước (blob đã bị xóa giữa chừng): chỉ dùng lại khi đúng nội
+            # dung; file cụt do upload lỗi thì ghi đè
+            if self._stored_matches(name, digest, uploaded_file.size):
+                return digest, name
+            default_storage.delete(name)
+        # Storage.save đọc file qua .chunks(), không nạp cả file vào RAM
+        uploaded_file.seek(0)
+        return digest, default_storage.save(name, uploaded_file)
+
+    @staticmethod
+    def _stored_matches(name: str, digest: str, size: int) -> bool:
+        if default_storage.size(name) != size:
+            return False
+        sha = hashlib.sha256()
+        with default_storage.open(name, "rb") as stored:
+            for chunk in iter(lambda: stored.read(1024 * 1024), b""):
+                sha.update(chunk)
+        return sha.hexdigest() == digest
+
+    @staticmethod
+    def guess_type(content_type: Optional[str]) -> str:
+        """Đoán nhanh từ content_type để có bản ghi ngay, worker sẽ kiểm tra lại"""
+        if content_type and "video" in content_type:
+            return RescueMedia.MediaType.VIDEO
+        return RescueMedia.MediaType.IMAGE
+
+    def ingest(self, request_id, files: Iterable) -> List[RescueMedia]:
+        """
+        Lưu danh sách file cho một yêu cầu cứu hộ:
+        ghi storage trước (ngoài transaction), bulk INSERT bản ghi, rồi giao việc kiểm tra cho pool.
+        """
+        stored = []
+        for f in files:
+            digest, name = self.store(f)
+            stored.append((f, digest, name))
+
+        saved_media = []
+        orphans = []
+        with transaction.atomic():
+            for f, digest, name in stored:
+                # Khóa tới khi commit: release() của blob cùng nội dung không xóa file xen giữa
+                self.blob_repo.lock(digest)
+                if not default_storage.exists(name):
+                    # release() vừa xóa file ta định dùng lại (blob hết tham chiếu): ghi lại
+                    f.seek(0)
+                    name = default_storage.save(name, f)
+                blob = self.blob_repo.acquire(digest, name, f.size)
+                if blob.file.name != name:
+                    # Request khác vừa tạo cùng blob: bỏ bản vừa ghi, dùng bản của blob
+                    orphans.append(name)
+                saved_media.append(RescueMedia(
+                    rescue_request_id=request_id,
+                    file=blob.file.name,
+                    file_type=self.guess_type(getattr(f, "content_type", None)),
+                    thumbnail=blob.thumbnail.name or None,
+                    preview=blob.preview.name or None,
+                    blob_digest=digest,
+                ))
+
+            RescueMedia.objects.bulk_create(saved_media)
+            DataVersionService.bump_requests([request_id])
+            media_ids = [media.id for media in saved_media]
+            transaction.on_commit(lambda: self.submit(media_ids))
+            transaction.on_commit(lambda: [default_storage.delete(name) for name in orphans])
+
+        return saved_media
+
+    def submit(self, media_ids: Iterable):
+        for media_id in media_ids:
+            self.executor.submit(self._run, self.validate, media_id)
+
+    @staticmethod
+    def _run(task, *args):
+        try:
+            task(*args)
+        except Exception as e:
+            logger.warning("Media task %s failed: %s", getattr(task, "__name__", task), e)
+        finally:
+            # Thread trong pool giữ kết nối riêng, đóng lại sau mỗi việc
+            connection.close()
+
+    def validate(self, media_id):
+        """Nhận dạng loại file thật, xóa file không hợp lệ / quá lớn"""
+        media = RescueMedia.objects.filter(id=media_id).first()
+        if not media:
+            return
+
+        name = media.file.name
+        size = default_storage.size(name)
+        with default_storage.open(name, "rb") as fh:
+            header = fh.read(self.HEADER_SIZE)
+
+        media_type = detect_media_type(header)
+        if media_type is None or size > settings.RESCUE_MEDIA_MAX_BYTES:
+            logger.info("Reject media %s (type=%s, size=%s)", media_id, media_type, size)
+            # File blob được xóa qua post_delete khi không còn media nào tham chiếu
+            media.delete()
+            DataVersionService.bump_requests([media.rescue_request_id])
+            if not media.blob_digest:
+                default_storage.delete(name)
+            return
+
+        if media_type != media.file_type:
+            RescueMedia.objects.filter(id=media_id).update(file_type=media_type)
+
+        if not media.thumbnail:
+            self.build_derivatives(media, media_type)
+
+    @staticmethod
+    def derivative_name(media: RescueMedia, kind: str) -> str:
+        if media.blob_digest:
+            # Ảnh thu nhỏ đi theo blob: nội dung trùng thì dùng chung
+            return f"rescue_media/blobs/derivatives/{media.blob_digest}_{kind}.jpg"
+        folder = os.path.dirname(media.file.name)
+        return f"{folder}/derivatives/{media.id}_{kind}.jpg"
+
+    def build_derivatives(self, media: RescueMedia, media_type: str = RescueMedia.MediaType.IMAGE):
+        """Tạo thumbnail + preview (bỏ EXIF) rồi lưu đường dẫn vào bản ghi media / blob"""
+        if not image_derivatives.is_available():
+            return
+        is_video = media_type == RescueMedia.MediaType.VIDEO
+        if is_video and not video_poster.is_available(settings.MEDIA_FFMPEG_BINARY):
+            return
+
+        if media.blob_digest:
+            blob = self.blob_repo.get(media.blob_digest)
+            if blob and blob.thumbnail:
+                # Media khác cùng nội dung đã tạo xong
+                RescueMedia.objects.filter(id=media.id).update(
+                    thumbnail=blob.thumbnail.name, preview=blob.preview.name
+                )
+                DataVersionService.bump_requests([media.rescue_request_id])
+                return
+
+        if is_video:
+            data = self._poster_frame(media.file.name)
+            if data is None:
+                logger.info("No poster frame for video media %s", media.id)
+                return
+        else:
+            with default_storage.open(media.file.name, "rb") as fh:
+                data = fh.read()
+
+        sizes = {
+            "thumbnail": (settings.MEDIA_THUMBNAIL_SIZE, settings.MEDIA_THUMBNAIL_QUALITY),
+            "preview": (settings.MEDIA_PREVIEW_SIZE, settings.MEDIA_PREVIEW_QUALITY),
+        }
+        derived = self.process_pool.submit(image_derivatives.build_derivatives, data, sizes).result()
+
+        saved = {
+            kind: default_storage.save(self.derivative_name(media, kind), ContentFile(content))
+            for kind, content in derived.items()
+        }
+        if media.blob_digest:
+            self.blob_repo.set_derivatives(media.blob_digest, saved["thumbnail"], saved["preview"])
+            pending = RescueMedia.objects.filter(blob_digest=media.blob_digest, thumbnail__isnull=True)
+            request_ids = set(pending.values_list("rescue_request_id", flat=True))
+            pending.update(**saved)
+            DataVersionService.bump_requests(request_ids)
+        else:
+            RescueMedia.objects.filter(id=media.id).update(**saved)
+            DataVersionService.bump_requests([media.rescue_request_id])
+
+    @staticmethod
+    def _poster_frame(name: str) -> Optional[bytes]:
+        """Khung hình poster của video (PNG). ffmpeg cần file local: storage khác (S3) thì chép tạm"""
+        try:
+            return video_poster.extract_frame(default_storage.path(name), settings.MEDIA_POSTER_AT_SECONDS,
+                                              settings.MEDIA_FFMPEG_BINARY)
+        except NotImplementedError:
+            pass
+
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(name)[1])
+        try:
+            with os.fdopen(fd, "wb") as tmp, default_storage.open(name, "rb") as src:
+                shutil.copyfileobj(src, tmp, 1024 * 1024)
+            return video_poster.extract_frame(tmp_path, settings.MEDIA_POSTER_AT_SECONDS,
+                                              settings.MEDIA_FFMPEG_BINARY)
+        finally:
+            os.remove(tmp_path)
+
+    def release(self, digest: str):
+        """Bớt một tham chiếu tới blob; hết tham chiếu thì xóa file gốc và ảnh thu nhỏ"""
+        blob = self.blob_repo.release(digest)
+        if not blob:
+            return
+        names = [blob.file.name, blob.thumbnail.name, blob.preview.name]
+        transaction.on_commit(lambda: self._delete_blob_files(digest, names))
+
+    def _delete_blob_files(self, digest: str, names: List[str]):
+        """
+        Xóa file của blob đã hết tham chiếu, dưới cùng khóa với ingest(): nếu trong lúc đó
+        upload khác đã tạo lại blob cùng nội dung (dùng lại file này) thì giữ file.
+        """
+        with transaction.atomic():
+            self.blob_repo.lock(digest)
+            if self.blob_repo.get(digest):
+                return
+            for name in names:
+                if name:
+                    default_storage.delete(name)
+
+
+@receiver(post_delete, sender=RescueMedia)
+def release_media_blob(sender, instance, **kwargs):
+    if instance.blob_digest:
+        media_pipeline.release(instance.blob_digest)
+
+
+media_pipeline = MediaPipeline(
+    max_workers=settings.MEDIA_WORKER_THREADS,
+    image_processes=settings.MEDIA_IMAGE_PROCESSES,
+)
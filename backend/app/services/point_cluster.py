@@ -0,0 +1,208 @@
+"""
+Gộp điểm bản đồ kiểu supercluster trong RAM (NumPy), thay cho ST_ClusterWithin ở zoom thấp
+(RESCUE_MAP_CLUSTER_SOURCE=supercluster).
+
+- Dựng một lần toàn bộ cây phân cấp zoom 14 -> 0 trên mảng tọa độ Web Mercator: mỗi zoom
+  gộp các cụm của zoom kế trên theo ô lưới bán kính _calculate_grid_size(zoom) (vector hóa,
+  tâm có trọng số theo số điểm), nên cụm zoom thấp luôn là hợp của cụm zoom cao.
+- Mỗi zoom có một cây KD tĩnh (kiểu kdbush) để trả lời truy vấn khung nhìn.
+- Dựng lại ở thread nền khi phiên bản dữ liệu "requests" đổi, cách lần dựng trước ít nhất
+  POINT_CLUSTER_MIN_REBUILD_SECONDS; trong lúc dựng vẫn trả cây cũ. Cây có thể cũ hơn
+  phiên bản hiện tại nên ETag của map-points gộp thêm `version` của cây.
+
+Không có numpy hoặc chưa dựng xong: query() trả None, get_map_points dùng SQL.
+So sánh với PostGIS: python -m app.testing.bench_map_clusters
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .data_version import DataVersionService
+
+try:
+    import numpy as np
+except ImportError:  # numpy là phụ thuộc tùy chọn
+    np = None
+
+logger = logging.getLogger("app")
+
+EARTH_RADIUS = 6378137.0
+MAX_LAT = 85.05112878
+
+
+def to_mercator(lng, lat):
+    x = np.radians(lng) * EARTH_RADIUS
+    y = np.log(np.tan(np.pi / 4 + np.radians(np.clip(lat, -MAX_LAT, MAX_LAT)) / 2)) * EARTH_RADIUS
+    return x, y
+
+
+def to_lnglat(x, y):
+    lng = np.degrees(x / EARTH_RADIUS)
+    lat = np.degrees(2 * np.arctan(np.exp(y / EARTH_RADIUS)) - np.pi / 2)
+    return lng, lat
+
+
+class KDTree:
+    """
+    Cây KD tĩnh trên mảng phẳng (kiểu kdbush): sắp xếp lại tọa độ theo trung vị xen kẽ trục
+    x / y, không tạo node. Đoạn <= NODE_SIZE điểm được lọc bằng một phép so sánh vector.
+    """
+
+    NODE_SIZE = 64
+
+    def __init__(self, x, y):
+        self.ids = np.arange(len(x))
+        self.x = np.array(x, dtype=np.float64)
+        self.y = np.array(y, dtype=np.float64)
+
+        stack = [(0, len(self.ids) - 1, 0)]
+        while stack:
+            left, right, axis = stack.pop()
+            if right - left <= self.NODE_SIZE:
+                continue
+            middle = (left + right) >> 1
+            coords = self.x if axis == 0 else self.y
+            order = np.argpartition(coords[left:right + 1], middle - left) + left
+            self.ids[left:right + 1] = self.ids[order]
+            self.x[left:right + 1] = self.x[order]
+            self.y[left:right + 1] = self.y[order]
+            stack.append((left, middle - 1, 1 - axis))
+            stack.append((middle + 1, right, 1 - axis))
+
+    def range(self, min_x: float, min_y: float, max_x: float, max_y: float):
+        """Chỉ số (theo thứ tự ban đầu) các điểm nằm trong hình chữ nhật"""
+        found = []
+        stack = [(0, len(self.ids) - 1, 0)]
+        while stack:
+            left, right, axis = stack.pop()
+            if right - left <= self.NODE_SIZE:
+                x, y = self.x[left:right + 1], self.y[left:right + 1]
+                mask = (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)
+                found.append(self.ids[left:right + 1][mask])
+                continue
+
+            middle = (left + right) >> 1
+            mx, my = self.x[middle], self.y[middle]
+            if min_x <= mx <= max_x and min_y <= my <= max_y:
+                found.append(self.ids[middle:middle + 1])
+
+            value, low, high = (mx, min_x, max_x) if axis == 0 else (my, min_y, max_y)
+            if low <= value:
+                stack.append((left, middle - 1, 1 - axis))
+            if high >= value:
+                stack.append((middle + 1, right, 1 - axis))
+
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+class ClusterHierarchy:
+    MAX_ZOOM = 14   # zoom >= 15 trả điểm thật
+
+    def __init__(self, levels: List[tuple]):
+        # levels[zoom] = (x, y, count, tree)
+        self.levels = levels
+
+    @classmethod
+    def build(cls, lng, lat, radius_for_zoom: Callable[[int], float]) -> "ClusterHierarchy":
+        x, y = to_mercator(np.asarray(lng, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+        count = np.ones(len(x), dtype=np.float64)
+
+        levels = [None] * (cls.MAX_ZOOM + 1)
+        for zoom in range(cls.MAX_ZOOM, -1, -1):
+            radius = radius_for_zoom(zoom)
+            gx = np.floor(x / radius).astype(np.int64)
+            gy = np.floor(y / radius).astype(np.int64)
+            # Ô lưới -> một khóa int64 (mỗi trục < 2^31 ô ở mọi zoom)
+            keys = (gx << 32) + (gy & 0xFFFFFFFF)
+            _, group = np.unique(keys, return_inverse=True)
+
+            total = np.bincount(group, weights=count)
+            x = np.bincount(group, weights=x * count) / total
+            y = np.bincount(group, weights=y * count) / total
+            count = total
+            levels[zoom] = (x, y, count, KDTree(x, y))
+
+        return cls(levels)
+
+    def query(self, min_lat: float, max_lat: float,
+              min_lng: float, max_lng: float, zoom: int) -> List[Dict[str, Any]]:
+        x, y, count, tree = self.levels[min(max(zoom, 0), self.MAX_ZOOM)]
+        min_x, min_y = to_mercator(min_lng, min_lat)
+        max_x, max_y = to_mercator(max_lng, max_lat)
+
+        ids = tree.range(float(min_x), float(min_y), float(max_x), float(max_y))
+        ids = ids[np.argsort(-count[ids], kind="stable")]   # như ORDER BY total DESC
+        lng, lat = to_lnglat(x[ids], y[ids])
+        return [
+            {"latitude": la, "longitude": lo, "total": total}
+            for la, lo, total in zip(lat.tolist(), lng.tolist(), count[ids].astype(np.int64).tolist())
+        ]
+
+
+class PointClusterService:
+    def __init__(self):
+        self._hierarchy: Optional[ClusterHierarchy] = None
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._built_at = 0.0
+        self._building = threading.Lock()
+
+    @property
+    def version(self) -> Optional[int]:
+        """Phiên bản "requests" của cây đang dùng (None: chưa dựng)"""
+        return self._version
+
+    def query(self, min_lat: float, max_lat: float,
+              min_lng: float, max_lng: float, zoom: int) -> Optional[List[Dict[str, Any]]]:
+        if np is None:
+            return None
+        self._maybe_rebuild()
+        hierarchy = self._hierarchy
+        if hierarchy is None:
+            return None
+        return hierarchy.query(min_lat, max_lat, min_lng, max_lng, zoom)
+
+    def _maybe_rebuild(self):
+        now = time.monotonic()
+        if now - self._checked_at < settings.POINT_CLUSTER_REFRESH_SECONDS:
+            return
+        self._checked_at = now
+
+        version = DataVersionService.get(DataVersionService.REQUESTS)[DataVersionService.REQUESTS]
+        if version == self._version or self._building.locked():
+            return
+        if self._hierarchy is not None and now - self._built_at < settings.POINT_CLUSTER_MIN_REBUILD_SECONDS:
+            return
+        threading.Thread(target=self._rebuild, args=(version,), name="point-cluster-build", daemon=True).start()
+
+    def _rebuild(self, version: int):
+        # Tránh import vòng: RescueRequestService dùng point_clusters
+        from .rescue_request_servive import RescueRequestService
+
+        if not self._building.acquire(blocking=False):
+            return
+        try:
+            # Phiên bản đọc trước dữ liệu: có ghi xen giữa thì lần kiểm tra sau dựng lại
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT ST_X(location), ST_Y(location) FROM rescue_requests WHERE location IS NOT NULL")
+                coords = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 2)
+
+            start = time.perf_counter()
+            self._hierarchy = ClusterHierarchy.build(coords[:, 0], coords[:, 1],
+                                                     RescueRequestService._calculate_grid_size)
+            self._version = version
+            logger.info("Point clusters rebuilt: %d points in %.2fs", len(coords), time.perf_counter() - start)
+        except DatabaseError as e:
+            logger.warning("Point cluster rebuild failed: %s", e)
+        finally:
+            # Tính cả lần lỗi: không thử lại liên tục khi DB đang quá tải
+            self._built_at = time.monotonic()
+            self._building.release()
+            connection.close()
+
+
+point_clusters = PointClusterService()
@@ -0,0 +1,63 @@
+import json
+from hashlib import sha256
+from typing import Any, Dict, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .data_version import DataVersionService
+
+
+class RequestCountService:
+    """
+    Đếm tổng cho danh sách yêu cầu cứu hộ (total của trang đầu / dashboard):
+    - Bộ lọc thường gặp (trạng thái, tài khoản): COUNT(*) chính xác, cache theo
+      phiên bản dữ liệu "requests" -> hết hiệu lực ngay khi có yêu cầu mới / đổi trạng thái.
+    - Tìm kiếm tự do (ILIKE): dùng ước lượng của planner (EXPLAIN), chỉ đếm thật khi
+      ước lượng nhỏ hơn RESCUE_COUNT_EXACT_BELOW.
+    Trả về (total, exact).
+    """
+
+    @staticmethod
+    def _used_params(where_clause: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in params.items() if f"%({k})s" in where_clause}
+
+    @classmethod
+    def _cache_key(cls, where_clause: str, params: Dict[str, Any], version: int) -> str:
+        raw = json.dumps(
+            [where_clause, cls._used_params(where_clause, params)],
+            sort_keys=True, default=str,
+        )
+        return f"rq_count:{version}:{sha256(raw.encode()).hexdigest()}"
+
+    @staticmethod
+    def _exact(where_clause: str, params: Dict[str, Any]) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM rescue_requests r WHERE {where_clause}", params)
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def _estimate(where_clause: str, params: Dict[str, Any]) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM rescue_requests r WHERE {where_clause}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @classmethod
+    def count(cls, where_clause: str, params: Dict[str, Any], free_text: bool = False) -> Tuple[int, bool]:
+        if free_text and settings.RESCUE_COUNT_ESTIMATE_SEARCH:
+            estimated = cls._estimate(where_clause, params)
+            if estimated >= settings.RESCUE_COUNT_EXACT_BELOW:
+                return estimated, False
+            return cls._exact(where_clause, params), True
+
+        version = DataVersionService.get(DataVersionService.REQUESTS)[DataVersionService.REQUESTS]
+        key = cls._cache_key(where_clause, params, version)
+        total = cache.get(key)
+        if total is None:
+            total = cls._exact(where_clause, params)
+            cache.set(key, total, timeout=settings.RESCUE_COUNT_CACHE_SECONDS)
+        return total, True
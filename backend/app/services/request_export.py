@@ -0,0 +1,109 @@
+import csv
+import json
+from typing import Any, AsyncIterator, Iterator, List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from ..enum.rescue_status import RescueStatus
+
+
+class _Echo:
+    """File giả cho csv.writer: write() trả lại chuỗi thay vì ghi"""
+    def write(self, value):
+        return value
+
+
+class RequestExportService:
+    """
+    Xuất toàn bộ yêu cầu cứu hộ (CSV / NDJSON) cho báo cáo.
+
+    Dùng server-side cursor (connection.chunked_cursor -> named cursor của psycopg):
+    Postgres giữ kết quả, mỗi lần chỉ kéo RESCUE_EXPORT_FETCH_SIZE dòng về; từng lô
+    được định dạng và đẩy ra StreamingHttpResponse ngay. Bộ nhớ không tăng theo số dòng.
+
+    App chạy ASGI (daphne): Django gom hết iterator đồng bộ vào RAM trước khi gửi, nên
+    router dùng astream() — mỗi lô được kéo ở thread đồng bộ chung (thread_sensitive),
+    cùng thread với connection và server-side cursor.
+    """
+    COLUMNS = [
+        "code", "name", "contact_phone", "address", "status",
+        "adults", "children", "elderly", "conditions", "description",
+        "latitude", "longitude", "duplicate_count", "created_at",
+    ]
+
+    @classmethod
+    def iter_batches(cls, status_filter: RescueStatus = None, search: str = None) -> Iterator[List[tuple]]:
+        from .rescue_request_servive import RescueRequestService
+
+        # Cùng bộ lọc với danh sách (trạng thái, tìm kiếm không dấu)
+        params, conditions = RescueRequestService._build_common_params(1, 1, status_filter, search)
+        where_clause = " AND ".join(conditions) or "1=1"
+
+        sql = f"""
+            SELECT
+                r.code, r.name, r.contact_phone, r.address, r.status,
+                r.adults, r.children, r.elderly, r.conditions, r.description,
+                ST_Y(r.location) AS latitude,
+                ST_X(r.location) AS longitude,
+                r.duplicate_count, r.created_at
+            FROM rescue_requests r
+            WHERE {where_clause}
+            ORDER BY r.created_at DESC, r.id DESC
+        """
+
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(settings.RESCUE_EXPORT_FETCH_SIZE)
+                if not rows:
+                    break
+                yield rows
+
+    @staticmethod
+    def _cell(value: Any) -> Any:
+        if isinstance(value, (list, dict)):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    @classmethod
+    def stream_csv(cls, batches: Iterator[List[tuple]]) -> Iterator[str]:
+        writer = csv.writer(_Echo())
+        # BOM để Excel đọc đúng tiếng Việt (UTF-8)
+        yield "\ufeff" + writer.writerow(cls.COLUMNS)
+        for rows in batches:
+            yield "".join(writer.writerow([cls._cell(v) for v in row]) for row in rows)
+
+    @classmethod
+    def stream_ndjson(cls, batches: Iterator[List[tuple]]) -> Iterator[str]:
+        for rows in batches:
+            yield "".join(
+                json.dumps(dict(zip(cls.COLUMNS, row)), ensure_ascii=False, default=str) + "\n"
+                for row in rows
+            )
+
+    @classmethod
+    def _format(cls, fmt: str, batches: Iterator[List[tuple]]) -> Iterator[str]:
+        if fmt == "ndjson":
+            return cls.stream_ndjson(batches)
+        return cls.stream_csv(batches)
+
+    @classmethod
+    def stream(cls, fmt: str, **filters) -> Iterator[str]:
+        return cls._format(fmt, cls.iter_batches(**filters))
+
+    @classmethod
+    async def astream(cls, fmt: str, **filters) -> AsyncIterator[str]:
+        batches = cls.iter_batches(**filters)
+        chunks = cls._format(fmt, batches)
+        next_chunk = sync_to_async(lambda: next(chunks, None), thread_sensitive=True)
+        try:
+            while True:
+                chunk = await next_chunk()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Client ngắt giữa chừng: đóng cursor ở đúng thread đã mở nó
+            await sync_to_async(batches.close, thread_sensitive=True)()
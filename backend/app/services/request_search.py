@@ -0,0 +1,30 @@
+from typing import Any, Dict, Optional, Tuple
+
+
+class RequestSearch:
+    """
+    Tìm kiếm tự do trên yêu cầu cứu hộ (tên, SĐT, địa chỉ) qua cột search_text
+    (sql/007): đã bỏ dấu + chữ thường, có chỉ mục trigram GIN.
+
+    - Lọc: search_text LIKE '%từ khóa%' -> dùng được chỉ mục (từ khóa >= 3 ký tự).
+    - Xếp hạng: word_similarity(từ khóa, search_text), từ khóa khớp trọn từ đứng trước.
+    Từ khóa được chuẩn hóa bằng cùng hàm với lúc ghi (rescue_search_normalize),
+    nên "Nguyen", "nguyễn", "NGUYỄN" cho cùng kết quả.
+    """
+    CONDITION = "r.search_text LIKE '%%' || rescue_search_normalize(%(search)s) || '%%'"
+    RANK_SQL = "word_similarity(rescue_search_normalize(%(search_term)s), r.search_text)"
+
+    @staticmethod
+    def _escape_like(term: str) -> str:
+        return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    @classmethod
+    def build(cls, search: Optional[str]) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Trả về (điều kiện WHERE, params) cho từ khóa; không có từ khóa thì (None, {})"""
+        term = (search or "").strip()
+        if not term:
+            return None, {}
+        return cls.CONDITION, {
+            "search": cls._escape_like(term),
+            "search_term": term,
+        }
@@ -1,12 +1,29 @@
 from ..schemas.rescue_schema import RescueRequestSchema
 from ..models import RescueRequest, ConditionType, RescueMedia, Account
-from ..enum.rescue_status import RESCUE_STATUS, RescueStatus
+from ..enum.rescue_status import RESCUE_STATUS, RescueStatus, TaskStatus
+from ..repositories import IRequestCodeRepo, RequestCodeRepo
 from typing import Optional, List, Dict, Any
-from django.db import transaction, connection
+from django.db import transaction, connection, DatabaseError, OperationalError
+from django.conf import settings
 from django.db.models import Q
 from django.utils import timezone
 from ninja import UploadedFile
+from pydantic import ValidationError as PydanticValidationError
+from ..exception.handlers import format_validation_errors
+from ..exception.custom_exceptions import BaseAppException
+from .intake_journal import intake_journal
+from .media_pipeline import media_pipeline
+from .data_version import DataVersionService
+from .request_count import RequestCountService
+from .request_search import RequestSearch
+from .map_cluster import MapClusterPyramid
+from .map_point_index import map_point_index
+from .point_cluster import point_clusters
+import base64
 import json
+import uuid
+from datetime import datetime, timedelta
+
 def dictfetchall(cursor):
     """
     Return all rows from a cursor as a dict
@@ -18,102 +35,357 @@ def dictfetchall(cursor):
     ]
 
 class RescueRequestService():
+    code_repo: IRequestCodeRepo = RequestCodeRepo()
+
+    # Thứ tự cột dùng chung cho INSERT một dòng và INSERT nhiều dòng
+    _INSERT_COLUMNS = """
+        id, code, name,
+        contact_phone, address,
+        adults, children, elderly, description,
+        conditions, location, account_id
+    """
+    _INSERT_ROW_SQL = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s)"
+
     @staticmethod
-    def create_request(data: RescueRequestSchema, account_id: Optional[str] = None ):
+    def _build_insert_row(payload: Dict[str, Any], code: str, account_id: Optional[str] = None,
+                          request_id: Optional[uuid.UUID] = None) -> list:
+        """Chuyển payload (đã validate) thành danh sách tham số theo _INSERT_COLUMNS"""
+        return [
+            request_id or uuid.uuid4(),
+            code,
+            payload.get("name"),
+            payload.get("contact_phone"),
+            payload.get("address"),
+            payload.get("adults"),
+            payload.get("children"),
+            payload.get("elderly"),
+            payload.get("description"),
+            json.dumps(payload.get("conditions")),
+            payload.get("longitude"),
+            payload.get("latitude"),
+            account_id,
+        ]
 
-        payload = data.model_dump()
+    @classmethod
+    def _insert_rows(cls, rows: List[list], ignore_existing: bool = False) -> List[Optional[Dict[str, Any]]]:
+        """
+        INSERT nhiều dòng bằng một câu lệnh duy nhất (multi-row VALUES).
+        Trả về [{id, code, status}] theo đúng thứ tự của `rows`.
 
-        lat = payload.pop("latitude")
-        lng = payload.pop("longitude")
+        ignore_existing=True: bỏ qua dòng trùng id (ON CONFLICT DO NOTHING),
+        phần tử tương ứng trong kết quả là None. Dùng khi ghi lại dữ liệu có thể đã ghi rồi.
+        """
+        if not rows:
+            return []
 
-        province_code = payload.pop('code', 'VN')
+        values_sql = ", ".join([cls._INSERT_ROW_SQL] * len(rows))
+        params = [value for row in rows for value in row]
+        on_conflict = "ON CONFLICT (id) DO NOTHING" if ignore_existing else ""
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO rescue_requests ({cls._INSERT_COLUMNS})
+                VALUES {values_sql}
+                {on_conflict}
+                RETURNING id, code, status
+            """, params)
+            inserted = {row[0]: row for row in cursor.fetchall()}
+
+        if inserted:
+            # account_id là cột cuối của _INSERT_COLUMNS
+            DataVersionService.bump_request_scopes(*{row[-1] for row in rows if row[0] in inserted})
+
+        result = []
+        for row in rows:
+            if row[0] not in inserted:
+                result.append(None)
+                continue
+            request_id, code, status = inserted[row[0]]
+            result.append({"id": request_id, "code": code, "status": status})
+        return result
+
+    @classmethod
+    def intake(cls, data: RescueRequestSchema, account_id: Optional[str] = None):
+        """
+        Cửa nhận yêu cầu từ người dân, có chế độ chống quá tải (RESCUE_SURGE_MODE):
+        - off:  ghi thẳng vào DB như create_request.
+        - on:   luôn ghi vào nhật ký cục bộ, trả mã tạm ngay.
+        - auto: ghi DB với statement_timeout; DB quá tải / mất kết nối, hoặc nhật ký
+                còn tồn đọng (giữ thứ tự), thì chuyển sang nhật ký.
+        """
+        mode = settings.RESCUE_SURGE_MODE
+
+        if mode == "on" or (mode == "auto" and intake_journal.depth() > 0):
+            return intake_journal.append(data.model_dump(), account_id)
+
+        if mode == "off":
+            return {**cls.create_request(data, account_id), "queued": False}
+
+        try:
+            created = cls.create_request(
+                data, account_id,
+                statement_timeout_ms=settings.RESCUE_SURGE_DB_TIMEOUT_MS
+            )
+        except OperationalError:
+            return intake_journal.append(data.model_dump(), account_id)
+        return {**created, "queued": False}
+
+    @staticmethod
+    def _set_local_statement_timeout(statement_timeout_ms: Optional[int]):
+        """statement_timeout chỉ cho transaction hiện tại (SET LOCAL), None: không đổi"""
+        if statement_timeout_ms:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT set_config('statement_timeout', %s, true)", [str(statement_timeout_ms)])
+
+    @staticmethod
+    def create_request(data: RescueRequestSchema, account_id: Optional[str] = None,
+                       statement_timeout_ms: Optional[int] = None):
+
+        payload = data.model_dump()
 
-        if account_id:
-            payload["account_id"] = account_id
+        province_code = payload.pop('code', 'VN')
 
+        # Cấp mã trong transaction riêng (ngắn) để không giữ khóa bộ đếm trong lúc INSERT;
+        # vẫn chịu statement_timeout vì UPSERT bộ đếm là câu dễ bị chặn nhất khi DB quá tải
         with transaction.atomic():
+            RescueRequestService._set_local_statement_timeout(statement_timeout_ms)
             new_code = RescueRequestService._generate_code(province_code)
-            payload['code'] = new_code
-            conditions = payload.get("conditions")
 
-            with connection.cursor() as cursor:
-                cursor.execute(""" 
-                    INSERT INTO rescue_requests (
-                                id, code, name,
-                                contact_phone, address, 
-                                adults, children, elderly, description, 
-                                conditions, location, account_id)
-                    VALUES( 
-                        gen_random_uuid(), %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                        ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s
-                    )
-                    RETURNING id, code , status
-                    """,
-                    [
-                        new_code,
-                        payload.get("name"),
-                        payload.get("contact_phone"),
-                        payload.get("address"),
-                        payload.get("adults"),
-                        payload.get("children"),
-                        payload.get("elderly"),
-                        payload.get("description"),
-                        json.dumps(conditions),  
-                        lng,
-                        lat,
-                        payload.get("account_id"),
-                    ]
-                )
-                request_id, code, status = cursor.fetchone()
-        return {
-            "id": request_id,
-            "code": code,
-            "status": status
-        }
-            
+        row = RescueRequestService._build_insert_row(payload, new_code, account_id)
+
+        with transaction.atomic():
+            RescueRequestService._set_local_statement_timeout(statement_timeout_ms)
+
+            if settings.RESCUE_DEDUP_ENABLED:
+                duplicate_id = RescueRequestService._find_duplicate(payload)
+                if duplicate_id:
+                    # Mã vừa cấp bị bỏ qua (chấp nhận khoảng trống trong dãy số)
+                    merged = RescueRequestService._merge_duplicate(duplicate_id, payload)
+                    return {**merged, "merged": True}
+
+            created = RescueRequestService._insert_rows([row])[0]
+
+        return {**created, "merged": False}
+
             # --- Logic mở rộng ---
             # Ví dụ: Gửi thông báo socket realtime cho admin
             # notify_admin_new_request(instance)
             # return instance_request
-        
-    def upload_media(request_id: str, files: List[UploadedFile]):
-        try:
-            req = RescueRequest.objects.get(id=request_id)
 
-        except RescueRequest.DoesNotExist:
-            return None
-        saved_media = []
-        with transaction.atomic():
-            for f in files:
-                # Detect loại file
-                m_type = RescueMedia.MediaType.IMAGE
-                if f.content_type and 'video' in f.content_type:
-                    m_type = RescueMedia.MediaType.VIDEO
-                
-                # Tạo record
-                media = RescueMedia.objects.create(
-                    rescue_request=req,
-                    file=f,
-                    file_type=m_type
+    # Chỉ gộp vào các yêu cầu còn đang xử lý
+    OPEN_STATUSES = [
+        RESCUE_STATUS[RescueStatus.PENDING],
+        RESCUE_STATUS[RescueStatus.ASSIGNED],
+        RESCUE_STATUS[RescueStatus.IN_PROGRESS],
+    ]
+
+    @classmethod
+    def _find_duplicate(cls, payload: Dict[str, Any]) -> Optional[uuid.UUID]:
+        """
+        Tìm yêu cầu đang mở trùng với payload: cùng SĐT hoặc cùng tên,
+        nằm trong RESCUE_DEDUP_RADIUS_METERS và gửi trong RESCUE_DEDUP_WINDOW_MINUTES.
+        Phải gọi trong transaction: khóa advisory theo SĐT và theo tên (đúng hai vế của
+        điều kiện trùng) để hai lần gửi trùng đồng thời không cùng tạo dòng mới, và khóa
+        dòng tìm được để gộp.
+        """
+        since = timezone.now() - timedelta(minutes=settings.RESCUE_DEDUP_WINDOW_MINUTES)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT hashtext(%s), hashtext(%s)", [
+                f"phone:{payload.get('contact_phone') or ''}",
+                f"name:{(payload.get('name') or '').lower()}",
+            ])
+            # Luôn khóa theo thứ tự khóa tăng dần để hai transaction không chờ vòng nhau
+            for lock_key in sorted(set(cursor.fetchone())):
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [lock_key])
+
+            # Lọc theo index (SĐT / tên + created_at) trước, ST_DWithin chỉ chạy trên vài ứng viên
+            cursor.execute("""
+                SELECT r.id
+                FROM rescue_requests r
+                WHERE r.created_at >= %(since)s
+                AND r.status = ANY(%(open_statuses)s)
+                AND (r.contact_phone = %(phone)s OR lower(r.name) = lower(%(name)s))
+                AND ST_DWithin(
+                    r.location::geography,
+                    ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography,
+                    %(radius)s
                 )
-                saved_media.append(media)
-        return saved_media
+                ORDER BY r.created_at DESC
+                LIMIT 1
+                FOR UPDATE
+            """, {
+                "since": since,
+                "open_statuses": cls.OPEN_STATUSES,
+                "phone": payload.get("contact_phone"),
+                "name": payload.get("name"),
+                "lng": payload.get("longitude"),
+                "lat": payload.get("latitude"),
+                "radius": settings.RESCUE_DEDUP_RADIUS_METERS,
+            })
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _merge_duplicate(request_id: uuid.UUID, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Gộp lần báo trùng vào yêu cầu cũ thay vì tạo dòng mới:
+        số người lấy giá trị lớn nhất, hợp các tình trạng, ghi chú thêm SĐT/mô tả mới.
+        """
+        note = payload.get("description") or ""
+        note = f"[Báo trùng - {payload.get('name')} {payload.get('contact_phone')}] {note}".strip()
+
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE rescue_requests SET
+                    adults = GREATEST(adults, %(adults)s),
+                    children = GREATEST(children, %(children)s),
+                    elderly = GREATEST(elderly, %(elderly)s),
+                    conditions = (
+                        SELECT COALESCE(jsonb_agg(DISTINCT c), '[]'::jsonb)
+                        FROM jsonb_array_elements_text(
+                            COALESCE(conditions::jsonb, '[]'::jsonb) || %(conditions)s::jsonb
+                        ) AS c
+                    ),
+                    description = CONCAT_WS(E'\\n', NULLIF(description, ''), %(note)s),
+                    duplicate_count = duplicate_count + 1,
+                    last_reported_at = NOW()
+                WHERE id = %(id)s
+                RETURNING id, code, status, account_id
+            """, {
+                "id": request_id,
+                "adults": payload.get("adults") or 0,
+                "children": payload.get("children") or 0,
+                "elderly": payload.get("elderly") or 0,
+                "conditions": json.dumps(payload.get("conditions") or []),
+                "note": note,
+            })
+            request_id, code, status, owner_id = cursor.fetchone()
+        DataVersionService.bump_request_scopes(owner_id)
+        return {"id": request_id, "code": code, "status": status}
+
+    @staticmethod
+    def _record_alias(alias_id: uuid.UUID, request_id: uuid.UUID):
+        """id đã trả cho người dân (nhật ký) nhưng yêu cầu được gộp vào request_id lúc drain"""
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO rescue_request_aliases (alias_id, request_id)
+                VALUES (%s, %s)
+                ON CONFLICT (alias_id) DO NOTHING
+            """, [alias_id, request_id])
+
+    @staticmethod
+    def resolve_request_id(request_id) -> Optional[uuid.UUID]:
+        """id yêu cầu thật, đi qua rescue_request_aliases nếu id đã bị gộp; None nếu không có"""
+        try:
+            request_id = uuid.UUID(str(request_id))
+        except ValueError:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT id FROM rescue_requests WHERE id = %(id)s
+                UNION ALL
+                SELECT request_id FROM rescue_request_aliases WHERE alias_id = %(id)s
+                LIMIT 1
+            """, {"id": request_id})
+            row = cursor.fetchone()
+        return row[0] if row else None
 
     @classmethod
-    def _execute_search_query(cls, conditions: List[str], params: Dict[str, Any], page: int, size: int):
+    def create_requests_bulk(cls, items: List[Dict[str, Any]], account_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        Hàm private dùng chung để chạy câu SQL phức tạp.
+        Nhận nhiều yêu cầu cứu hộ cùng lúc (tổng đài, đối tác).
+        - Validate từng item riêng, item lỗi không làm hỏng cả lô.
+        - Cấp mã theo dải cho từng tỉnh (một lần gọi bộ đếm / tỉnh).
+        - Ghi bằng INSERT nhiều dòng, mỗi lô tối đa RESCUE_BATCH_CHUNK_SIZE dòng.
         """
-        where_clause = " AND ".join(conditions)
+        results: List[Dict[str, Any]] = [None] * len(items)
+        valid_by_province: Dict[str, List[tuple]] = {}
 
-        # SQL Query dùng chung
-        sql = f"""
-            SELECT 
-                r.id, r.code ,r.name, r.contact_phone, r.address, r.status, r.created_at, 
-                ST_Y(r.location) AS latitude,
-                ST_X(r.location) AS longitude,
-                r.conditions, r.adults, r.children, r.elderly,
-                
+        for index, item in enumerate(items):
+            try:
+                data = RescueRequestSchema.model_validate(item)
+            except PydanticValidationError as e:
+                results[index] = {
+                    "index": index,
+                    "success": False,
+                    "errors": format_validation_errors(e.errors()),
+                }
+                continue
+
+            payload = data.model_dump()
+            province_code = (payload.pop("code", None) or "VN").upper()
+            valid_by_province.setdefault(province_code, []).append((index, payload))
+
+        pending_rows: List[tuple] = []
+        for province_code, entries in valid_by_province.items():
+            codes = cls._generate_codes(province_code, len(entries))
+            for (index, payload), code in zip(entries, codes):
+                pending_rows.append((index, cls._build_insert_row(payload, code, account_id)))
+
+        chunk_size = settings.RESCUE_BATCH_CHUNK_SIZE
+        for start in range(0, len(pending_rows), chunk_size):
+            chunk = pending_rows[start:start + chunk_size]
+            try:
+                with transaction.atomic():
+                    created = cls._insert_rows([row for _, row in chunk])
+            except DatabaseError as e:
+                for index, row in chunk:
+                    results[index] = {
+                        "index": index,
+                        "success": False,
+                        "code": row[1],
+                        "errors": [{"field": "general", "message": str(e)}],
+                    }
+                continue
+
+            for (index, _), row_result in zip(chunk, created):
+                results[index] = {"index": index, "success": True, **row_result}
+
+        created_count = sum(1 for r in results if r["success"])
+        return {
+            "total": len(items),
+            "created": created_count,
+            "failed": len(items) - created_count,
+            "results": results,
+        }
+        
+    @classmethod
+    def upload_media(cls, request_id: str, files: List[UploadedFile]):
+        """
+        Lưu file media cho yêu cầu cứu hộ:
+        1. Ghi file xuống storage theo chunk, KHÔNG giữ transaction DB trong lúc truyền.
+        2. INSERT các bản ghi media bằng một câu bulk_create.
+        3. Việc nhận dạng / kiểm tra file chạy ở thread pool sau khi ghi xong.
+        """
+        request_id = cls.resolve_request_id(request_id)
+        if request_id is None:
+            return None
+
+        return media_pipeline.ingest(request_id, files)
+
+    @staticmethod
+    def _encode_cursor(created_at, request_id, rank: Optional[float] = None) -> str:
+        raw = f"{created_at.isoformat()}|{request_id}"
+        if rank is not None:
+            raw += f"|{rank!r}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str, ranked: bool = False):
+        """Trả về (created_at, id, rank); rank chỉ có với cursor của kết quả tìm kiếm"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            parts = raw.split("|")
+            if len(parts) != (3 if ranked else 2):
+                raise ValueError(raw)
+            rank = float(parts[2]) if ranked else None
+            return datetime.fromisoformat(parts[0]), uuid.UUID(parts[1]), rank
+        except (ValueError, UnicodeDecodeError):
+            raise BaseAppException("Cursor không hợp lệ")
+
+    # Cột tính từ chính dòng rescue_requests
+    _LIST_ROW_COLUMNS = """
                 LEFT(COALESCE(r.description, ''), 100) as description_short,
                 
                 -- Summary số người
@@ -127,17 +399,43 @@ class RescueRequestService():
                             NULLIF(CONCAT(r.elderly, ' già'), '0 già')
                         ), ')'
                     )
-                END as people_summary,
+                END as people_summary
+    """
+
+    # Nhóm cột tùy chọn của danh sách (tham số include=), mặc định lấy tất cả
+    INCLUDE_MEDIA = "media"
+    INCLUDE_ASSIGNMENT = "assignment"
+    INCLUDE_ALL = frozenset({INCLUDE_MEDIA, INCLUDE_ASSIGNMENT})
 
-                -- Media URLs
+    # Media / nhiệm vụ tính bằng subquery cho từng dòng (RESCUE_LIST_STRATEGY="correlated")
+    _LIST_MEDIA_CORRELATED = """
+                -- Media URLs (file gốc), ảnh thu nhỏ và ảnh xem trước cho bảng / bản đồ.
+                -- Ảnh chưa tạo xong dùng tạm ảnh gốc; video chưa có poster trả null
                 COALESCE(
                     (
-                        SELECT json_agg(m.file)
+                        SELECT json_agg(m.file ORDER BY m.created_at, m.id)
                         FROM media m
                         WHERE m.rescue_request_id = r.id
                     ), '[]'::json
                 ) as media_urls,
-                
+                COALESCE(
+                    (
+                        SELECT json_agg(COALESCE(m.thumbnail, CASE WHEN m.file_type = 'IMAGE' THEN m.file END)
+                                        ORDER BY m.created_at, m.id)
+                        FROM media m
+                        WHERE m.rescue_request_id = r.id
+                    ), '[]'::json
+                ) as thumbnail_urls,
+                COALESCE(
+                    (
+                        SELECT json_agg(COALESCE(m.preview, CASE WHEN m.file_type = 'IMAGE' THEN m.file END)
+                                        ORDER BY m.created_at, m.id)
+                        FROM media m
+                        WHERE m.rescue_request_id = r.id
+                    ), '[]'::json
+                ) as preview_urls
+    """
+    _LIST_ASSIGNMENT_CORRELATED = """
                 -- Active Assignment
                 (
                     SELECT json_build_object(
@@ -156,29 +454,353 @@ class RescueRequestService():
                     ORDER BY a.created_at DESC
                     LIMIT 1
                 ) as active_assignment
+    """
 
-            FROM rescue_requests r
-            WHERE {where_clause}
-            ORDER BY r.created_at DESC
-            LIMIT %(limit)s OFFSET %(offset)s
+    # Cùng các cột nhưng đọc từ read model rescue_request_view (sql/008), do trigger cập nhật khi ghi
+    _LIST_ROW_COLUMNS_READ_MODEL = """
+                COALESCE(v.description_short, '') AS description_short,
+                COALESCE(v.people_summary, '0') AS people_summary
+    """
+    _LIST_MEDIA_READ_MODEL = """
+                COALESCE(v.media_urls, '[]'::jsonb) AS media_urls,
+                COALESCE(v.thumbnail_urls, '[]'::jsonb) AS thumbnail_urls,
+                COALESCE(v.preview_urls, '[]'::jsonb) AS preview_urls
+    """
+    _LIST_ASSIGNMENT_READ_MODEL = """
+                v.active_assignment
+    """
+
+    @classmethod
+    def _parse_include(cls, include: Optional[str]) -> frozenset:
+        """include=None: đủ cột; include="" : chỉ cột của yêu cầu; include="media,assignment"..."""
+        if include is None:
+            return cls.INCLUDE_ALL
+        groups = frozenset(part.strip() for part in include.split(",") if part.strip())
+        unknown = groups - cls.INCLUDE_ALL
+        if unknown:
+            raise BaseAppException(f"include không hợp lệ: {', '.join(sorted(unknown))}")
+        return groups
+
+    @classmethod
+    def _list_source(cls, strategy: str, include: frozenset):
+        """(cột dẫn xuất, FROM) theo RESCUE_LIST_STRATEGY, chỉ gồm các nhóm cột được yêu cầu"""
+        if strategy == "read_model" and include:
+            columns = [cls._LIST_ROW_COLUMNS_READ_MODEL]
+            if cls.INCLUDE_MEDIA in include:
+                columns.append(cls._LIST_MEDIA_READ_MODEL)
+            if cls.INCLUDE_ASSIGNMENT in include:
+                columns.append(cls._LIST_ASSIGNMENT_READ_MODEL)
+            return (
+                ",".join(columns),
+                "rescue_requests r LEFT JOIN rescue_request_view v ON v.request_id = r.id",
+            )
+
+        columns = [cls._LIST_ROW_COLUMNS]
+        if strategy == "correlated":
+            if cls.INCLUDE_MEDIA in include:
+                columns.append(cls._LIST_MEDIA_CORRELATED)
+            if cls.INCLUDE_ASSIGNMENT in include:
+                columns.append(cls._LIST_ASSIGNMENT_CORRELATED)
+        # hydrate: media + nhiệm vụ được nạp sau cho cả trang (_hydrate_page)
+        # read_model không cần nhóm nào: cột của chính dòng, bỏ luôn JOIN
+        return ",".join(columns), "rescue_requests r"
+
+    # Trạng thái nhiệm vụ được hiển thị trong cột active_assignment
+    _ACTIVE_TASK_STATUSES = [
+        TaskStatus.ASSIGNED.value,
+        TaskStatus.IN_PROGRESS.value,
+        TaskStatus.ARRIVED.value,
+        TaskStatus.COMPLETED.value,
+    ]
+
+    @classmethod
+    def _hydrate_page(cls, rows: List[Dict[str, Any]], include: frozenset = INCLUDE_ALL):
+        """
+        Nạp media và nhiệm vụ mới nhất cho cả trang bằng 2 câu lệnh (id = ANY(...))
+        rồi ghép vào từng dòng, thay cho subquery chạy lại ở mỗi dòng.
         """
+        if not rows or not include:
+            return
 
-        count_sql = f"SELECT COUNT(*) FROM rescue_requests r WHERE {where_clause}"
+        by_id = {row["id"]: row for row in rows}
+        ids = list(by_id)
 
         with connection.cursor() as cursor:
-            # 1. Đếm tổng
-            cursor.execute(count_sql, params=params)
-            total_items = cursor.fetchone()[0]
+            if cls.INCLUDE_MEDIA in include:
+                cls._hydrate_media(cursor, by_id, ids)
+            if cls.INCLUDE_ASSIGNMENT in include:
+                cls._hydrate_assignments(cursor, by_id, ids)
+
+    @staticmethod
+    def _hydrate_media(cursor, by_id: Dict[Any, Dict[str, Any]], ids: list):
+        cursor.execute("""
+            SELECT
+                m.rescue_request_id,
+                m.file,
+                COALESCE(m.thumbnail, CASE WHEN m.file_type = 'IMAGE' THEN m.file END),
+                COALESCE(m.preview, CASE WHEN m.file_type = 'IMAGE' THEN m.file END)
+            FROM media m
+            WHERE m.rescue_request_id = ANY(%s)
+            ORDER BY m.rescue_request_id, m.created_at, m.id
+        """, [ids])
+        for row in by_id.values():
+            row["media_urls"] = []
+            row["thumbnail_urls"] = []
+            row["preview_urls"] = []
+        for request_id, file, thumbnail, preview in cursor.fetchall():
+            by_id[request_id]["media_urls"].append(file)
+            by_id[request_id]["thumbnail_urls"].append(thumbnail)
+            by_id[request_id]["preview_urls"].append(preview)
+
+    @classmethod
+    def _hydrate_assignments(cls, cursor, by_id: Dict[Any, Dict[str, Any]], ids: list):
+        cursor.execute("""
+            SELECT DISTINCT ON (a.rescue_request_id)
+                a.rescue_request_id,
+                a.id AS task_id,
+                a.status,
+                a.updated_at,
+                t.name AS team_name,
+                t.contact_phone AS team_phone,
+                ST_Y(t.location) AS team_lat,
+                ST_X(t.location) AS team_lng
+            FROM rescue_assignments a
+            JOIN rescue_teams t ON a.rescue_team_id = t.id
+            WHERE a.rescue_request_id = ANY(%s)
+            AND a.status = ANY(%s)
+            ORDER BY a.rescue_request_id, a.created_at DESC
+        """, [ids, cls._ACTIVE_TASK_STATUSES])
+        for assignment in dictfetchall(cursor):
+            by_id[assignment.pop("rescue_request_id")]["active_assignment"] = assignment
+
+    @staticmethod
+    def _parse_json_list(value):
+        """Cột JSON lưu dạng text: '[...]' -> list (giống validator của RescueRequestTableRow)"""
+        if not isinstance(value, str):
+            return value
+        if not value.strip():
+            return []
+        try:
+            return json.loads(value)
+        except ValueError:
+            return [value]
 
+    @classmethod
+    def _finalize_rows(cls, rows: List[Dict[str, Any]]):
+        """Đưa từng dòng về đúng shape RescueRequestTableRow để router trả thẳng (trusted_response)"""
+        for row in rows:
+            row.pop("search_rank", None)
+            row.pop("change_xid", None)
+            # Nhóm cột không được include: trả giá trị rỗng như mặc định của schema
+            row.setdefault("media_urls", [])
+            row.setdefault("thumbnail_urls", [])
+            row.setdefault("preview_urls", [])
+            row.setdefault("active_assignment", None)
+            for key in ("conditions", "media_urls", "thumbnail_urls", "preview_urls"):
+                row[key] = cls._parse_json_list(row[key])
+            # Cursor thô trả json / jsonb (read model, json_build_object) dạng chuỗi
+            if isinstance(row["active_assignment"], str):
+                row["active_assignment"] = json.loads(row["active_assignment"])
+
+    @classmethod
+    def _list_select_sql(cls, strategy: str, include_groups: frozenset, extra_columns: str) -> str:
+        """SELECT ... FROM ... dùng chung cho danh sách và đồng bộ thay đổi (shape RescueRequestTableRow)"""
+        derived_sql, from_sql = cls._list_source(strategy, include_groups)
+        return f"""
+            SELECT 
+                r.id, r.code ,r.name, r.contact_phone, r.address, r.status, r.created_at, 
+                ST_Y(r.location) AS latitude,
+                ST_X(r.location) AS longitude,
+                r.conditions, r.adults, r.children, r.elderly,
+                {derived_sql},
+
+                {extra_columns}
+
+            FROM {from_sql}
+        """
+
+    @classmethod
+    def _execute_search_query(cls, conditions: List[str], params: Dict[str, Any], page: int, size: int,
+                              cursor: Optional[str] = None, with_total: Optional[bool] = None,
+                              include: Optional[str] = None):
+        """
+        Hàm private dùng chung để chạy câu SQL phức tạp.
+
+        Phân trang:
+        - cursor=None: OFFSET theo page như cũ.
+        - cursor: keyset trên (created_at, id), bỏ qua OFFSET -> trang N tốn như trang 1.
+        Có từ khóa tìm kiếm thì xếp theo độ liên quan trước (RequestSearch), keyset
+        trên (rank, created_at, id).
+        Luôn trả next_cursor nếu còn dữ liệu. Tổng chỉ tính khi with_total
+        (mặc định: có khi dùng page, không khi dùng cursor), qua RequestCountService:
+        total_exact=False nghĩa là số ước lượng (tìm kiếm tự do).
+
+        include: nhóm cột tốn kém cần lấy ("media", "assignment"); nhóm không có trong
+        include không được đưa vào SQL (không subquery / JOIN / câu nạp thêm).
+        """
+        include_groups = cls._parse_include(include)
+        if with_total is None:
+            with_total = cursor is None
+
+        count_where_clause = " AND ".join(conditions)
+
+        ranked = bool(params.get('search_term'))
+        rank_sql = RequestSearch.RANK_SQL if ranked else "NULL::real"
+        order_by = "r.created_at DESC, r.id DESC"
+        keyset = "(r.created_at, r.id) < (%(cursor_created_at)s, %(cursor_id)s)"
+        if ranked:
+            order_by = f"search_rank DESC, {order_by}"
+            keyset = f"({rank_sql}, r.created_at, r.id) < (%(cursor_rank)s::real, %(cursor_created_at)s, %(cursor_id)s)"
+
+        page_conditions = list(conditions)
+        if cursor:
+            (params['cursor_created_at'], params['cursor_id'],
+             params['cursor_rank']) = cls._decode_cursor(cursor, ranked=ranked)
+            params['offset'] = 0
+            page_conditions.append(keyset)
+
+        # Lấy dư 1 dòng để biết còn trang sau hay không
+        params['limit_plus_one'] = size + 1
+        where_clause = " AND ".join(page_conditions)
+
+        strategy = settings.RESCUE_LIST_STRATEGY
+        select_sql = cls._list_select_sql(strategy, include_groups, f"{rank_sql} AS search_rank")
+
+        sql = f"""
+            {select_sql}
+            WHERE {where_clause}
+            ORDER BY {order_by}
+            LIMIT %(limit_plus_one)s OFFSET %(offset)s
+        """
+
+        # 1. Đếm tổng (tùy chọn, có cache / ước lượng)
+        total_items, total_exact = None, None
+        if with_total:
+            total_items, total_exact = RequestCountService.count(
+                count_where_clause, params, free_text=bool(params.get('search'))
+            )
+
+        with connection.cursor() as db_cursor:
             # 2. Lấy dữ liệu
-            cursor.execute(sql, params=params)
-            results = dictfetchall(cursor)
+            db_cursor.execute(sql, params=params)
+            results = dictfetchall(db_cursor)
+
+        next_cursor = None
+        if len(results) > size:
+            results = results[:size]
+            last = results[-1]
+            next_cursor = cls._encode_cursor(last["created_at"], last["id"], last["search_rank"])
+
+        if strategy == "hydrate":
+            cls._hydrate_page(results, include_groups)
+        cls._finalize_rows(results)
 
         return {
             "items": results,
             "total": total_items,
+            "total_exact": total_exact,
             "page": page,
-            "page_size": size
+            "page_size": size,
+            "next_cursor": next_cursor
+        }
+
+    # Token "since" = vị trí (change_xid, id) trong luồng thay đổi, xem sql/009
+    _ZERO_ID = uuid.UUID(int=0)
+
+    @staticmethod
+    def _encode_since(xid: int, request_id: uuid.UUID) -> str:
+        return base64.urlsafe_b64encode(f"{xid}|{request_id}".encode()).decode()
+
+    @staticmethod
+    def _decode_since(since: str):
+        try:
+            xid, request_id = base64.urlsafe_b64decode(since.encode()).decode().split("|")
+            return int(xid), uuid.UUID(request_id)
+        except (ValueError, UnicodeDecodeError):
+            raise BaseAppException("Tham số since không hợp lệ")
+
+    @classmethod
+    def get_changes(cls, since: Optional[str] = None, limit: int = 200, include: Optional[str] = None):
+        """
+        Đồng bộ chênh lệch: các yêu cầu đã đổi (tạo mới, đổi trạng thái, nhiệm vụ, media)
+        và id các yêu cầu đã xóa kể từ token `since`.
+
+        - since=None: không trả dữ liệu, chỉ trả token "hiện tại". Client lấy token TRƯỚC rồi
+          mới tải danh sách: thay đổi xen giữa hai lần gọi sẽ được trả lại (trùng, vô hại) thay
+          vì bị sót.
+        - Chỉ trả các thay đổi có change_xid < horizon (xmin của snapshot lúc gọi): mọi
+          transaction trước horizon đã kết thúc nên không có thay đổi nào bị sót vì commit muộn.
+        - has_more=True: gọi tiếp ngay với next_since.
+        """
+        include_groups = cls._parse_include(include)
+        limit = max(1, min(limit, settings.RESCUE_CHANGES_MAX_LIMIT))
+
+        with connection.cursor() as db_cursor:
+            db_cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")
+            horizon = int(db_cursor.fetchone()[0])
+
+        caught_up = {"items": [], "deleted": [], "next_since": cls._encode_since(horizon, cls._ZERO_ID),
+                     "has_more": False}
+        if since is None:
+            return caught_up
+
+        since_xid, since_id = cls._decode_since(since)
+        params = {
+            "since_xid": str(since_xid),
+            "since_id": since_id,
+            "horizon": str(horizon),
+            "limit_plus_one": limit + 1,
+        }
+        window = """
+            (%(since_xid)s::xid8, %(since_id)s) < ({xid}, {id})
+            AND {xid} < %(horizon)s::xid8
+        """
+
+        strategy = settings.RESCUE_LIST_STRATEGY
+        select_sql = cls._list_select_sql(strategy, include_groups, "r.change_xid::text AS change_xid")
+        changed_where = window.format(xid="r.change_xid", id="r.id")
+        deleted_where = window.format(xid="change_xid", id="request_id")
+
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(f"""
+                {select_sql}
+                WHERE {changed_where}
+                ORDER BY r.change_xid, r.id
+                LIMIT %(limit_plus_one)s
+            """, params)
+            changed = dictfetchall(db_cursor)
+
+            db_cursor.execute(f"""
+                SELECT request_id, change_xid::text
+                FROM rescue_request_tombstones
+                WHERE {deleted_where}
+                ORDER BY change_xid, request_id
+                LIMIT %(limit_plus_one)s
+            """, params)
+            deleted = db_cursor.fetchall()
+
+        # Gộp hai luồng theo vị trí (xid, id), lấy `limit` thay đổi đầu tiên
+        events = sorted(
+            [(int(row["change_xid"]), row["id"], row) for row in changed]
+            + [(int(xid), request_id, None) for request_id, xid in deleted],
+            key=lambda event: (event[0], event[1]),
+        )
+        if len(events) <= limit and len(changed) <= limit and len(deleted) <= limit:
+            next_since, has_more = caught_up["next_since"], False
+        else:
+            events = events[:limit]
+            next_since, has_more = cls._encode_since(events[-1][0], events[-1][1]), True
+
+        items = [row for _, _, row in events if row is not None]
+        if strategy == "hydrate":
+            cls._hydrate_page(items, include_groups)
+        cls._finalize_rows(items)
+
+        return {
+            "items": items,
+            "deleted": [request_id for _, request_id, row in events if row is None],
+            "next_since": next_since,
+            "has_more": has_more,
         }
 
     @classmethod
@@ -190,7 +812,6 @@ class RescueRequestService():
             'limit': size,
             'offset': (page - 1) * size,
             'status': vn_status_value,
-            'search': f"%{search}%" if search else None
         }
         
         conditions = []
@@ -198,17 +819,17 @@ class RescueRequestService():
         if status_filter:
             conditions.append("r.status = %(status)s")
             
-        if search:
-            conditions.append("""
-                (r.name ILIKE %(search)s or 
-                r.contact_phone ILIKE %(search)s or
-                r.address ILIKE %(search)s)
-            """)
+        # Tìm theo tên / SĐT / địa chỉ, không phân biệt dấu (chỉ mục trigram)
+        search_condition, search_params = RequestSearch.build(search)
+        if search_condition:
+            conditions.append(search_condition)
+            params.update(search_params)
             
         return params, conditions
 
     @classmethod
-    def get_my_requests(cls, account_id: str, page: int, size: int, status_filter: RescueStatus = None, search: str = None):
+    def get_my_requests(cls, account_id: str, page: int, size: int, status_filter: RescueStatus = None, search: str = None,
+                        cursor: Optional[str] = None, with_total: Optional[bool] = None, include: Optional[str] = None):
         # 1. Lấy params chung
         params, conditions = cls._build_common_params(page, size, status_filter, search)
         
@@ -217,10 +838,13 @@ class RescueRequestService():
         conditions.insert(0, "r.account_id = %(account_id)s")
 
         # 3. Thực thi
-        return cls._execute_search_query(conditions, params, page, size)
+        return cls._execute_search_query(conditions, params, page, size, cursor=cursor, with_total=with_total,
+                                         include=include)
 
     @classmethod
-    def get_list_requests_raw_sql(cls, page: int, size: int, status_filter: RescueStatus = None, search: str = None):
+    def get_list_requests_raw_sql(cls, page: int, size: int, status_filter: RescueStatus = None, search: str = None,
+                                  cursor: Optional[str] = None, with_total: Optional[bool] = None,
+                                  include: Optional[str] = None):
         # 1. Lấy params chung
         params, conditions = cls._build_common_params(page, size, status_filter, search)
         
@@ -228,7 +852,8 @@ class RescueRequestService():
             conditions.append("1=1")
 
         # 3. Thực thi
-        return cls._execute_search_query(conditions, params, page, size)
+        return cls._execute_search_query(conditions, params, page, size, cursor=cursor, with_total=with_total,
+                                         include=include)
     
     @staticmethod
     def _calculate_grid_size(zoom: int, cluster_radius_px: int = 60) -> float:
@@ -259,12 +884,29 @@ class RescueRequestService():
 
         return grid_meters
 
+    @staticmethod
+    def _parse_map_filters(status: Optional[str], condition: Optional[str]):
+        """
+        status: mã trạng thái cách nhau dấu phẩy (PENDING,IN_PROGRESS) -> nhãn lưu trong DB.
+        condition: tên tình trạng cách nhau dấu phẩy, khớp khi yêu cầu có ít nhất một.
+        """
+        statuses = []
+        for code in (part.strip().upper() for part in (status or "").split(",")):
+            if not code:
+                continue
+            if code not in RescueStatus.__members__:
+                raise BaseAppException(f"Trạng thái không hợp lệ: {code}")
+            statuses.append(RESCUE_STATUS[RescueStatus[code]])
+        conditions = [part.strip() for part in (condition or "").split(",") if part.strip()]
+        return statuses or None, conditions or None
+
     @classmethod
     def get_map_points(cls, min_lat: float, max_lat: float,
                     min_lng: float, max_lng: float,
-                    zoom: int):
+                    zoom: int, status: Optional[str] = None, condition: Optional[str] = None):
 
         radius = cls._calculate_grid_size(zoom)
+        statuses, conditions = cls._parse_map_filters(status, condition)
 
         base_params = {
             "min_lat": min_lat,
@@ -272,11 +914,31 @@ class RescueRequestService():
             "min_lng": min_lng,
             "max_lng": max_lng,
             "radius": radius,
+            "statuses": statuses,
+            "conditions": conditions,
         }
 
-        # ZOOM CAO → TRẢ ĐIỂM THẬT
+        # Lọc trạng thái: status = ANY(...) với các trạng thái đang mở dùng được chỉ mục
+        # GIST một phần (sql/012), chỉ quét các yêu cầu còn hoạt động
+        filter_sql = ""
+        if statuses:
+            filter_sql += " AND r.status = ANY(%(statuses)s)"
+        if conditions:
+            filter_sql += " AND r.conditions ?| %(conditions)s"
+
+        # ZOOM THẤP → CLUSTER từ cây phân cấp trong RAM (NumPy); chưa dựng xong thì đi tiếp.
+        # Pyramid / cây phân cấp gộp mọi yêu cầu: có bộ lọc thì gộp trực tiếp bằng SQL
+        if radius != 0 and not filter_sql and settings.RESCUE_MAP_CLUSTER_SOURCE == "supercluster":
+            clusters = point_clusters.query(min_lat, max_lat, min_lng, max_lng, zoom)
+            if clusters is not None:
+                return clusters
+
+        # ZOOM CAO → TRẢ ĐIỂM THẬT (từ chỉ mục trong RAM nếu sẵn sàng, không thì SQL)
         if radius == 0:
-            sql = """
+            points = map_point_index.query(min_lat, max_lat, min_lng, max_lng, statuses, conditions)
+            if points is not None:
+                return points
+            sql = f"""
                 SELECT
                     r.id,
                     r.code,
@@ -297,14 +959,18 @@ class RescueRequestService():
                         %(max_lng)s, %(max_lat)s
                     ),
                     4326
-                )
+                ){filter_sql}
                 ORDER BY r.created_at DESC
             """
             params = base_params
 
-        # ZOOM THẤP → CLUSTER
+        # ZOOM THẤP → CLUSTER từ pyramid lưới tính sẵn (chi phí theo số ô, không theo số điểm)
+        elif not filter_sql and settings.RESCUE_MAP_CLUSTER_SOURCE in ("pyramid", "supercluster"):
+            return MapClusterPyramid.clusters(min_lat, max_lat, min_lng, max_lng, zoom)
+
+        # ZOOM THẤP → CLUSTER trực tiếp (cách cũ, hoặc khi có bộ lọc)
         else:
-            sql = """WITH clustered AS (
+            sql = f"""WITH clustered AS (
                     SELECT unnest(
                         ST_ClusterWithin(
                             ST_Transform(r.location, 3857),
@@ -318,7 +984,7 @@ class RescueRequestService():
                             %(max_lng)s, %(max_lat)s
                         ),
                         4326
-                    )
+                    ){filter_sql}
                 )
                 SELECT
                     ST_Y(ST_Transform(ST_Centroid(cluster_geom), 4326)) AS latitude,
@@ -333,28 +999,28 @@ class RescueRequestService():
             cursor.execute(sql, params)
             return dictfetchall(cursor)
 
-    @staticmethod
-    def _generate_code(province_code: str) -> str:
+    @classmethod
+    def _generate_codes(cls, province_code: str, count: int = 1) -> List[str]:
+        """
+        Cấp `count` mã liên tiếp cho cùng một tỉnh trong ngày.
+        Số thứ tự lấy từ bộ đếm (tỉnh, ngày), tối thiểu 4 chữ số và
+        tự động dài thêm khi vượt quá 9999 yêu cầu/ngày.
+        """
+        p_code = province_code.upper()
+        today = timezone.now().date()
+
+        last_seq = cls.code_repo.allocate(p_code, today, count)
+
+        prefix = f"{p_code}-{today.strftime('%Y%m%d')}-"
+        return [f"{prefix}{seq:04d}" for seq in range(last_seq - count + 1, last_seq + 1)]
+
+    @classmethod
+    def _generate_code(cls, province_code: str) -> str:
         """
         Input: 'SG' (Sài Gòn)
         Output: 'SG-20251221-0001'
         """
-        p_code = province_code.upper()
-        today_str = timezone.now().strftime('%Y%m%d')
-        
-        prefix = f"{p_code}-{today_str}-"
-        
-        with transaction.atomic():
-            last_request = RescueRequest.objects.filter(
-                code__startswith=prefix
-            ).select_for_update().order_by('-code').first()
-            
-            if last_request:
-                last_seq_str = last_request.code.split('-')[-1]
-                new_seq = int(last_seq_str) + 1
-            else:
-                new_seq = 1
-            return f"{prefix}{new_seq:04d}"
+        return cls._generate_codes(province_code, 1)[0]
 
 
 class ConditionTypeService:
@@ -4,6 +4,7 @@ from django.db import transaction, connection
 from app.schemas.rescue_schema import RescueTeamUpdate, RescueTeamOut
 from app.exception.custom_exceptions import ResourceNotFound, PermissionDenied
 from app.enum.role_enum import RoleCode
+from app.services.data_version import DataVersionService
 
 
 class RescueService:
@@ -91,6 +92,11 @@ class RescueService:
 
             if not updated_team:
                 return None
+
+            DataVersionService.bump(DataVersionService.TEAMS)
+            # Tên / SĐT / vị trí đội hiển thị trong danh sách yêu cầu đội đang làm
+            if lat is not None or {"name", "contact_phone"} & data.keys():
+                DataVersionService.bump_for_team(team_id)
             
             columns = [col[0] for col in cursor.description]
 
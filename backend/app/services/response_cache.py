@@ -0,0 +1,90 @@
+import json
+import threading
+from hashlib import sha256
+from typing import Any, Callable, Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .data_version import DataVersionService
+
+
+class ResponseCache:
+    """
+    Cache kết quả của các endpoint đọc được gọi lặp lại với cùng tham số
+    (danh sách admin, lịch sử của người dân).
+
+    Key = tên endpoint + phiên bản các scope dữ liệu (DataVersionService) + tham số đã chuẩn hóa.
+    Mọi thao tác ghi tăng phiên bản sau khi commit nên entry cũ không bao giờ được trả lại;
+    entry cũ nằm đó tới khi hết TTL / bị LRU đẩy ra.
+
+    Đếm hit / miss theo từng endpoint trong process (xem /api/metrics/response-cache)
+    để chọn RESPONSE_CACHE_MAX_ENTRIES.
+    """
+
+    def __init__(self, alias: str):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _normalize(params: Dict[str, Any]) -> Dict[str, Any]:
+        normalized = {}
+        for key, value in params.items():
+            if isinstance(value, str):
+                value = value.strip()
+            # Chỉ bỏ None: "" có nghĩa riêng với một số tham số (vd include="" = không kèm gì)
+            if value is None:
+                continue
+            normalized[key] = value
+        return normalized
+
+    def _key(self, name: str, versions: Dict[str, int], params: Dict[str, Any]) -> str:
+        raw = json.dumps([versions, self._normalize(params)], sort_keys=True, default=str)
+        return f"resp:{name}:{sha256(raw.encode()).hexdigest()}"
+
+    def _record(self, name: str, hit: bool):
+        with self._lock:
+            stats = self._stats.setdefault(name, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def get_or_compute(self, name: str, scopes: Iterable[str], params: Dict[str, Any],
+                       compute: Callable[[], Any]) -> Any:
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return compute()
+
+        store = caches[self.alias]
+        key = self._key(name, DataVersionService.get(*scopes), params)
+        cached = store.get(key)
+        if cached is not None:
+            self._record(name, hit=True)
+            return cached
+
+        self._record(name, hit=False)
+        value = compute()
+        store.set(key, value, timeout=settings.RESPONSE_CACHE_TTL_SECONDS)
+        return value
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._stats.items()}
+
+        total_hits = total_misses = 0
+        for stats in endpoints.values():
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+            total_hits += stats["hits"]
+            total_misses += stats["misses"]
+
+        total = total_hits + total_misses
+        return {
+            "enabled": settings.RESPONSE_CACHE_ENABLED,
+            "max_entries": settings.RESPONSE_CACHE_MAX_ENTRIES,
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_ratio": round(total_hits / total, 4) if total else None,
+            "endpoints": endpoints,
+        }
+
+
+response_cache = ResponseCache("responses")
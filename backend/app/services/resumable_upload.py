@@ -0,0 +1,218 @@
+"""
+Upload media có thể tiếp tục (resumable) cho mạng di động chập chờn.
+
+Luồng:
+1. POST   /requests/rescue/{rescue_id}/uploads      -> tạo phiên, trả upload_id
+2. PUT    /requests/uploads/{upload_id}?offset=N    -> gửi chunk bắt đầu từ byte N
+3. GET    /requests/uploads/{upload_id}             -> hỏi offset hiện tại (sau khi rớt mạng)
+4. POST   /requests/uploads/{upload_id}/complete    -> ghép xong, tạo RescueMedia
+
+Phần đã nhận nằm trên đĩa local (RESCUE_UPLOAD_TMP_DIR): `<id>.part` + `<id>.json`
+(kèm `<id>.json.tmp` / `<id>.lock` trong lúc ghi). Phiên không có hoạt động quá
+RESCUE_UPLOAD_SESSION_TTL_SECONDS bị dọn (gc), cả file tạm / khóa sót lại khi process chết.
+"""
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+from ..exception.custom_exceptions import ConflictError, ResourceNotFound, BaseAppException
+from .media_pipeline import media_pipeline
+from .rescue_request_servive import RescueRequestService
+
+
+class ResumableUploadService:
+    COPY_CHUNK_SIZE = 64 * 1024
+    LOCK_STALE_SECONDS = 60
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self._last_gc = 0.0
+
+    # --- Đường dẫn / metadata ---
+    def _path(self, upload_id: str, ext: str) -> str:
+        # upload_id luôn là UUID hợp lệ -> không thể thoát khỏi thư mục tạm
+        return os.path.join(self.base_dir, f"{uuid.UUID(str(upload_id))}.{ext}")
+
+    def _load(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            with open(self._path(upload_id, "json"), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (ValueError, FileNotFoundError):
+            raise ResourceNotFound("Phiên upload không tồn tại hoặc đã hết hạn")
+
+    def _save(self, meta: Dict[str, Any]):
+        meta["updated_at"] = time.time()
+        tmp = self._path(meta["upload_id"], "json.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, self._path(meta["upload_id"], "json"))
+
+    def _offset(self, upload_id: str) -> int:
+        try:
+            return os.path.getsize(self._path(upload_id, "part"))
+        except FileNotFoundError:
+            raise ResourceNotFound("Phiên upload không tồn tại hoặc đã hết hạn")
+
+    def _status(self, meta: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "upload_id": meta["upload_id"],
+            "offset": self._offset(meta["upload_id"]),
+            "size": meta["size"],
+            "expires_at": meta["updated_at"] + settings.RESCUE_UPLOAD_SESSION_TTL_SECONDS,
+        }
+
+    @contextmanager
+    def _session_lock(self, upload_id: str):
+        """Khóa bằng file tạo với O_EXCL: dùng được giữa nhiều process, cả trên Windows"""
+        lock_path = self._path(upload_id, "lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(lock_path) > self.LOCK_STALE_SECONDS
+            except FileNotFoundError:
+                stale = True
+            if not stale:
+                raise ConflictError("Phiên upload đang nhận chunk khác, vui lòng thử lại")
+            os.replace(lock_path, lock_path + ".stale")
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+
+    # --- API ---
+    def create_session(self, rescue_id: str, filename: str, size: int, content_type: str = None) -> Dict[str, Any]:
+        if size <= 0 or size > settings.RESCUE_MEDIA_MAX_BYTES:
+            raise BaseAppException("Kích thước file không hợp lệ")
+        # id tạm của yêu cầu đã bị gộp khi drain nhật ký -> id yêu cầu thật
+        rescue_id = RescueRequestService.resolve_request_id(rescue_id)
+        if rescue_id is None:
+            raise ResourceNotFound("Không tìm thấy yêu cầu cứu hộ")
+
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.gc_if_due()
+
+        upload_id = str(uuid.uuid4())
+        open(self._path(upload_id, "part"), "wb").close()
+        meta = {
+            "upload_id": upload_id,
+            "rescue_id": str(rescue_id),
+            "filename": os.path.basename(filename) or "upload",
+            "content_type": content_type,
+            "size": size,
+            "created_at": time.time(),
+        }
+        self._save(meta)
+        return self._status(meta)
+
+    def get_status(self, upload_id: str) -> Dict[str, Any]:
+        return self._status(self._load(upload_id))
+
+    def put_chunk(self, upload_id: str, offset: int, stream) -> Dict[str, Any]:
+        """
+        Ghi tiếp dữ liệu từ `stream` vào cuối phần đã nhận.
+        `offset` phải đúng bằng số byte đã có, nếu không trả 409 kèm offset hiện tại
+        để client gửi lại từ đúng vị trí.
+        """
+        meta = self._load(upload_id)
+        with self._session_lock(upload_id):
+            current = self._offset(upload_id)
+            if offset != current:
+                raise ConflictError("Offset không khớp", details={"offset": current})
+
+            remaining = min(meta["size"] - current, settings.RESCUE_UPLOAD_MAX_CHUNK_BYTES)
+            with open(self._path(upload_id, "part"), "ab") as fh:
+                while remaining > 0:
+                    data = stream.read(min(self.COPY_CHUNK_SIZE, remaining))
+                    if not data:
+                        break
+                    fh.write(data)
+                    remaining -= len(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+
+            self._save(meta)
+        return self._status(meta)
+
+    def complete(self, upload_id: str):
+        """Kiểm tra đủ byte rồi chuyển file vào storage + tạo RescueMedia"""
+        meta = self._load(upload_id)
+        with self._session_lock(upload_id):
+            offset = self._offset(upload_id)
+            if offset != meta["size"]:
+                raise ConflictError("Upload chưa đủ dữ liệu", details={"offset": offset})
+
+            part_path = self._path(upload_id, "part")
+            with open(part_path, "rb") as fh:
+                uploaded = UploadedFile(
+                    file=fh,
+                    name=meta["filename"],
+                    content_type=meta["content_type"],
+                    size=meta["size"],
+                )
+                media = media_pipeline.ingest(meta["rescue_id"], [uploaded])[0]
+
+            self._remove(upload_id)
+        return media
+
+    # --- Dọn dẹp ---
+    _SESSION_EXTS = ("part", "json", "json.tmp", "lock")
+
+    def _remove(self, upload_id: str):
+        for ext in self._SESSION_EXTS:
+            try:
+                os.remove(self._path(upload_id, ext))
+            except FileNotFoundError:
+                pass
+
+    def gc(self) -> int:
+        """Xóa các phiên quá hạn, trả về số phiên đã xóa"""
+        if not os.path.isdir(self.base_dir):
+            return 0
+
+        deadline = time.time() - settings.RESCUE_UPLOAD_SESSION_TTL_SECONDS
+        removed = 0
+        for entry in os.scandir(self.base_dir):
+            try:
+                if entry.name.endswith(".stale"):
+                    os.remove(entry.path)
+                    continue
+                upload_id, _, ext = entry.name.partition(".")
+                if ext not in self._SESSION_EXTS or entry.stat().st_mtime >= deadline:
+                    continue
+                if ext in ("json.tmp", "lock"):
+                    # Sót lại khi process chết giữa _save() / giữa lúc giữ khóa
+                    os.remove(entry.path)
+                    continue
+            except FileNotFoundError:
+                # Request khác vừa xóa / đổi tên
+                continue
+            # .json được cập nhật mỗi chunk; .part mồ côi (mất .json) cũng bị dọn
+            if ext == "part" and os.path.exists(os.path.join(self.base_dir, f"{upload_id}.json")):
+                continue
+            try:
+                self._remove(upload_id)
+            except ValueError:
+                continue
+            removed += 1
+        return removed
+
+    def gc_if_due(self):
+        now = time.time()
+        if now - self._last_gc >= settings.RESCUE_UPLOAD_GC_INTERVAL_SECONDS:
+            self._last_gc = now
+            self.gc()
+
+
+resumable_upload_service = ResumableUploadService(str(settings.RESCUE_UPLOAD_TMP_DIR))
@@ -181,6 +181,62 @@ CHANNEL_LAYERS = {
 }
 
 
+# Cache: mặc định dùng RAM của từng process (LocMemCache là LRU có giới hạn số key).
+# Khi chạy nhiều worker nên trỏ sang Redis/Memcached để các worker dùng chung.
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+# Thời gian giữ chỗ cho request đầu tiên đang xử lý (tránh khóa vĩnh viễn nếu worker chết)
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '60'))
+
+# Cache kết quả danh sách yêu cầu cứu hộ (key gắn phiên bản dữ liệu, xem services/response_cache.py)
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True') == 'True'
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '300'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '2000'))
+
+# ETag / 304 cho endpoint đọc được poll liên tục (xem middleware/conditional.py)
+CONDITIONAL_GET_ENABLED = os.getenv('CONDITIONAL_GET_ENABLED', 'True') == 'True'
+
+# Cache vector tile /api/requests/tiles (hủy theo từng tile khi điểm bên trong đổi, xem services/map_tiles.py)
+MAP_TILE_CACHE_MAX_ENTRIES = int(os.getenv('MAP_TILE_CACHE_MAX_ENTRIES', '20000'))
+MAP_TILE_CACHE_TTL_SECONDS = int(os.getenv('MAP_TILE_CACHE_TTL_SECONDS', '3600'))
+# Đọc map_tile_changes tối đa một lần mỗi khoảng này (giây) mỗi process; tile có thể cũ tối đa chừng đó
+MAP_TILE_SYNC_SECONDS = float(os.getenv('MAP_TILE_SYNC_SECONDS', '1'))
+# Thời gian giữ nhật ký map_tile_changes; process không đồng bộ lâu hơn thì bỏ toàn bộ cache tile
+MAP_TILE_CHANGE_RETENTION_SECONDS = int(os.getenv('MAP_TILE_CHANGE_RETENTION_SECONDS', '3600'))
+# Quá số thay đổi này trong một lần đồng bộ thì bỏ toàn bộ cache thay vì hủy từng tile
+MAP_TILE_EVICT_MAX = int(os.getenv('MAP_TILE_EVICT_MAX', '500'))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "idempotency": {
+        "BACKEND": os.getenv('IDEMPOTENCY_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": os.getenv('IDEMPOTENCY_CACHE_LOCATION', 'idempotency'),
+        "TIMEOUT": IDEMPOTENCY_TTL_SECONDS,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv('IDEMPOTENCY_MAX_KEYS', '50000')),
+        },
+    },
+    "responses": {
+        "BACKEND": os.getenv('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        "TIMEOUT": RESPONSE_CACHE_TTL_SECONDS,
+        "OPTIONS": {
+            "MAX_ENTRIES": RESPONSE_CACHE_MAX_ENTRIES,
+        },
+    },
+    "tiles": {
+        "BACKEND": os.getenv('MAP_TILE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": os.getenv('MAP_TILE_CACHE_LOCATION', 'tiles'),
+        "TIMEOUT": MAP_TILE_CACHE_TTL_SECONDS,
+        "OPTIONS": {
+            "MAX_ENTRIES": MAP_TILE_CACHE_MAX_ENTRIES,
+        },
+    },
+}
+
+
 # Cho phép tất cả các nguồn (Dùng cho Development cho nhanh)
 CORS_ALLOW_ALL_ORIGINS = True 
 # Hoặc nếu muốn bảo mật hơn thì chỉ cho phép Nuxt:
@@ -190,6 +246,66 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Cho phép gửi cookie/token (Quan trọng cho đăng nhập)
 CORS_ALLOW_CREDENTIALS = True
 
+# Nhận yêu cầu cứu hộ theo lô (tổng đài, đối tác)
+RESCUE_BATCH_MAX_ITEMS = int(os.getenv('RESCUE_BATCH_MAX_ITEMS', '10000'))
+# Số dòng mỗi câu INSERT nhiều dòng (Postgres giới hạn 65535 tham số / câu)
+RESCUE_BATCH_CHUNK_SIZE = int(os.getenv('RESCUE_BATCH_CHUNK_SIZE', '1000'))
+
+# Gộp yêu cầu trùng khi nhận: cùng SĐT hoặc cùng tên, trong bán kính N mét và M phút
+RESCUE_DEDUP_ENABLED = os.getenv('RESCUE_DEDUP_ENABLED', 'True') == 'True'
+RESCUE_DEDUP_RADIUS_METERS = float(os.getenv('RESCUE_DEDUP_RADIUS_METERS', '200'))
+RESCUE_DEDUP_WINDOW_MINUTES = int(os.getenv('RESCUE_DEDUP_WINDOW_MINUTES', '60'))
+
+# Chế độ chống quá tải khi nhận yêu cầu: off | auto | on
+# (xem app/services/intake_journal.py về cách khôi phục sau sự cố)
+RESCUE_SURGE_MODE = os.getenv('RESCUE_SURGE_MODE', 'auto')
+# auto: câu lệnh INSERT chạy quá thời gian này thì chuyển sang ghi nhật ký
+RESCUE_SURGE_DB_TIMEOUT_MS = int(os.getenv('RESCUE_SURGE_DB_TIMEOUT_MS', '3000'))
+RESCUE_JOURNAL_PATH = os.getenv('RESCUE_JOURNAL_PATH', os.path.join(BASE_DIR, 'var', 'intake_journal.sqlite3'))
+RESCUE_JOURNAL_BATCH_SIZE = int(os.getenv('RESCUE_JOURNAL_BATCH_SIZE', '500'))
+RESCUE_JOURNAL_POLL_SECONDS = float(os.getenv('RESCUE_JOURNAL_POLL_SECONDS', '1'))
+RESCUE_JOURNAL_LEASE_SECONDS = int(os.getenv('RESCUE_JOURNAL_LEASE_SECONDS', '30'))
+RESCUE_JOURNAL_MAX_ATTEMPTS = int(os.getenv('RESCUE_JOURNAL_MAX_ATTEMPTS', '5'))
+RESCUE_JOURNAL_RATE_WINDOW_SECONDS = int(os.getenv('RESCUE_JOURNAL_RATE_WINDOW_SECONDS', '60'))
+
+# Đếm tổng cho danh sách yêu cầu: cache theo phiên bản dữ liệu (bảng data_versions)
+RESCUE_COUNT_CACHE_SECONDS = int(os.getenv('RESCUE_COUNT_CACHE_SECONDS', '300'))
+# Tìm kiếm tự do: trả số ước lượng của planner, chỉ đếm thật khi ước lượng nhỏ hơn ngưỡng
+RESCUE_COUNT_ESTIMATE_SEARCH = os.getenv('RESCUE_COUNT_ESTIMATE_SEARCH', 'True') == 'True'
+RESCUE_COUNT_EXACT_BELOW = int(os.getenv('RESCUE_COUNT_EXACT_BELOW', '1000'))
+
+# Cách lấy các cột dẫn xuất (media, nhiệm vụ, tóm tắt số người) của bảng danh sách:
+# read_model (bảng rescue_request_view, sql/008) | correlated (subquery từng dòng, không cần sql/008)
+# | hydrate (lấy trang id trước, nạp media + nhiệm vụ cho cả trang bằng 2 câu lệnh).
+# So sánh trên dữ liệu thật: python -m app.testing.bench_list_strategies
+RESCUE_LIST_STRATEGY = os.getenv('RESCUE_LIST_STRATEGY', 'read_model')
+
+# Đồng bộ chênh lệch /requests/changes: số thay đổi tối đa mỗi lần gọi
+RESCUE_CHANGES_MAX_LIMIT = int(os.getenv('RESCUE_CHANGES_MAX_LIMIT', '1000'))
+
+# Gộp điểm bản đồ ở zoom < 15: pyramid (lưới tính sẵn, sql/010) | live (ST_ClusterWithin mỗi lần gọi)
+# | supercluster (cây phân cấp trong RAM, cần numpy; chưa dựng xong thì dùng pyramid)
+RESCUE_MAP_CLUSTER_SOURCE = os.getenv('RESCUE_MAP_CLUSTER_SOURCE', 'pyramid')
+# supercluster: kiểm tra phiên bản dữ liệu mỗi N giây, đổi thì dựng lại ở thread nền
+POINT_CLUSTER_REFRESH_SECONDS = float(os.getenv('POINT_CLUSTER_REFRESH_SECONDS', '5'))
+# Khoảng nghỉ tối thiểu giữa hai lần dựng lại: ghi liên tục không bắt dựng lại cả cây sau mỗi thay đổi
+POINT_CLUSTER_MIN_REBUILD_SECONDS = float(os.getenv('POINT_CLUSTER_MIN_REBUILD_SECONDS', '30'))
+
+# Chỉ mục điểm trong RAM cho map-points zoom >= 15 (services/map_point_index.py)
+MAP_POINT_INDEX_ENABLED = os.getenv('MAP_POINT_INDEX_ENABLED', 'True') == 'True'
+# Đồng bộ thay đổi từ DB tối đa mỗi N giây (độ trễ tối đa của bản đồ)
+MAP_POINT_INDEX_SYNC_SECONDS = float(os.getenv('MAP_POINT_INDEX_SYNC_SECONDS', '1'))
+# Đồng bộ lỗi lâu hơn N giây thì quay về SQL
+MAP_POINT_INDEX_MAX_STALE_SECONDS = float(os.getenv('MAP_POINT_INDEX_MAX_STALE_SECONDS', '30'))
+# So chỉ mục với DB mỗi N giây, lệch thì nạp lại
+MAP_POINT_INDEX_CHECK_SECONDS = float(os.getenv('MAP_POINT_INDEX_CHECK_SECONDS', '600'))
+
+# Xuất CSV / NDJSON: số dòng mỗi lần kéo từ server-side cursor
+RESCUE_EXPORT_FETCH_SIZE = int(os.getenv('RESCUE_EXPORT_FETCH_SIZE', '2000'))
+
+# Endpoint đọc dựng dữ liệu từ raw SQL trả thẳng JSON (orjson), không validate lại từng dòng
+API_TRUSTED_ROWS = os.getenv('API_TRUSTED_ROWS', 'True') == 'True'
+
 # Google-auth
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 
@@ -219,6 +335,33 @@ else:
         "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
     }
 
+# File upload lớn hơn ngưỡng này được Django ghi ra file tạm thay vì giữ trong RAM
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', str(2 * 1024 * 1024)))
+# Băm SHA-256 trong lúc nhận upload để lưu media theo nội dung (không trùng lặp)
+FILE_UPLOAD_HANDLERS = [
+    'app.middleware.upload_handlers.HashingMemoryFileUploadHandler',
+    'app.middleware.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+# Giới hạn kích thước mỗi file media (ảnh / video) sau khi upload
+RESCUE_MEDIA_MAX_BYTES = int(os.getenv('RESCUE_MEDIA_MAX_BYTES', str(500 * 1024 * 1024)))
+# Số thread xử lý media nền (nhận dạng, kiểm tra file)
+MEDIA_WORKER_THREADS = int(os.getenv('MEDIA_WORKER_THREADS', '4'))
+# Ảnh thu nhỏ (cần Pillow): số process resize, cạnh dài tối đa (px) và chất lượng JPEG
+MEDIA_IMAGE_PROCESSES = int(os.getenv('MEDIA_IMAGE_PROCESSES', '2'))
+MEDIA_THUMBNAIL_SIZE = int(os.getenv('MEDIA_THUMBNAIL_SIZE', '320'))
+MEDIA_THUMBNAIL_QUALITY = int(os.getenv('MEDIA_THUMBNAIL_QUALITY', '75'))
+MEDIA_PREVIEW_SIZE = int(os.getenv('MEDIA_PREVIEW_SIZE', '1280'))
+MEDIA_PREVIEW_QUALITY = int(os.getenv('MEDIA_PREVIEW_QUALITY', '82'))
+# Ảnh thu nhỏ cho video: khung hình tại giây thứ N (cần ffmpeg trong PATH, không có thì bỏ qua)
+MEDIA_FFMPEG_BINARY = os.getenv('MEDIA_FFMPEG_BINARY', 'ffmpeg')
+MEDIA_POSTER_AT_SECONDS = float(os.getenv('MEDIA_POSTER_AT_SECONDS', '1'))
+
+# Upload resumable: phần đã nhận lưu tạm trên đĩa local tới khi complete
+RESCUE_UPLOAD_TMP_DIR = os.getenv('RESCUE_UPLOAD_TMP_DIR', os.path.join(BASE_DIR, 'var', 'uploads'))
+RESCUE_UPLOAD_MAX_CHUNK_BYTES = int(os.getenv('RESCUE_UPLOAD_MAX_CHUNK_BYTES', str(8 * 1024 * 1024)))
+RESCUE_UPLOAD_SESSION_TTL_SECONDS = int(os.getenv('RESCUE_UPLOAD_SESSION_TTL_SECONDS', str(24 * 3600)))
+RESCUE_UPLOAD_GC_INTERVAL_SECONDS = int(os.getenv('RESCUE_UPLOAD_GC_INTERVAL_SECONDS', '600'))
+
 if os.name == 'nt':
     # Đường dẫn đến thư mục osgeo (như bạn đã tìm thấy)
     OSGEO_PATH = r"C:\Users\VanPhuc\AppData\Local\Programs\Python\Python39\Lib\site-packages\osgeo"
@@ -0,0 +1,95 @@
+"""
+Benchmark cấp mã yêu cầu cứu hộ khi nhiều worker cùng nhận yêu cầu của MỘT tỉnh.
+
+Chạy từ thư mục backend (cần DB thật, nên dùng DB test):
+    python -m app.testing.bench_code_allocator --mode allocator --workers 1 2 4 8 16 32
+    python -m app.testing.bench_code_allocator --mode intake --per-worker 200
+
+- allocator: chỉ gọi RescueRequestService._generate_code
+- intake:    gọi trọn RescueRequestService.create_request (có INSERT)
+
+Mỗi worker là một thread với kết nối DB riêng. Kết quả in ra số yêu cầu/giây
+theo số worker để thấy thông lượng tăng theo số worker.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from app.schemas.rescue_schema import RescueRequestSchema  # noqa: E402
+from app.services import RescueRequestService  # noqa: E402
+
+
+def _fake_request(province_code: str) -> RescueRequestSchema:
+    return RescueRequestSchema(
+        code=province_code,
+        name="Bench Test",
+        contact_phone=f"09{random.randint(10000000, 99999999)}",
+        adults=1,
+        address="Benchmark",
+        latitude=random.uniform(10.75, 10.85),
+        longitude=random.uniform(106.60, 106.75),
+        conditions=[],
+        description="(Benchmark)",
+    )
+
+
+def _worker(mode: str, province_code: str, count: int, barrier: threading.Barrier, errors: list):
+    try:
+        barrier.wait()
+        for _ in range(count):
+            if mode == "allocator":
+                RescueRequestService._generate_code(province_code)
+            else:
+                RescueRequestService.create_request(_fake_request(province_code))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        connection.close()
+
+
+def run(mode: str, workers: int, per_worker: int, province_code: str) -> float:
+    barrier = threading.Barrier(workers + 1)
+    errors = []
+    threads = [
+        threading.Thread(target=_worker, args=(mode, province_code, per_worker, barrier, errors))
+        for _ in range(workers)
+    ]
+    for t in threads:
+        t.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+    return (workers * per_worker) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["allocator", "intake"], default="allocator")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--per-worker", type=int, default=500)
+    parser.add_argument("--province", default="BENCH")
+    args = parser.parse_args()
+
+    print(f"mode={args.mode} province={args.province} per_worker={args.per_worker}")
+    print(f"{'workers':>8} {'req/s':>12}")
+    for n in args.workers:
+        rate = run(args.mode, n, args.per_worker, args.province)
+        print(f"{n:>8} {rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
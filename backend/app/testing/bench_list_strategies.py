@@ -0,0 +1,65 @@
+"""
+Benchmark các cách dựng trang danh sách yêu cầu cứu hộ (RESCUE_LIST_STRATEGY):
+    correlated: subquery media / nhiệm vụ cho từng dòng
+    read_model: JOIN bảng rescue_request_view (sql/008)
+    hydrate:    lấy trang trước, nạp media + nhiệm vụ cho cả trang bằng 2 câu lệnh
+
+Chạy từ thư mục backend, trên bản sao dữ liệu thật để kết quả phản ánh
+phân bố media / nhiệm vụ của mình:
+    python -m app.testing.bench_list_strategies
+    python -m app.testing.bench_list_strategies --sizes 20 100 500 --repeat 20 --search nguyen
+    python -m app.testing.bench_list_strategies --include ""      # danh sách rút gọn (include=)
+
+In thời gian trung vị và p95 (ms) cho mỗi (cỡ trang, chiến lược). Chạy một lượt làm nóng
+trước khi đo để cache của Postgres không thiên vị chiến lược chạy đầu.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+django.setup()
+
+from django.test.utils import override_settings  # noqa: E402
+from app.services import RescueRequestService  # noqa: E402
+
+STRATEGIES = ["correlated", "read_model", "hydrate"]
+
+
+def measure(strategy: str, size: int, repeat: int, search: str = None, status: str = None,
+            include: str = None):
+    timings = []
+    with override_settings(RESCUE_LIST_STRATEGY=strategy):
+        RescueRequestService.get_list_requests_raw_sql(1, size, status, search, with_total=False, include=include)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            RescueRequestService.get_list_requests_raw_sql(1, size, status, search, with_total=False,
+                                                           include=include)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings), p95
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100, 200, 500])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--search", default=None)
+    parser.add_argument("--status", default=None, help="PENDING, ASSIGNED, IN_PROGRESS...")
+    parser.add_argument("--include", default=None, help='"media,assignment" (mặc định), "media", ""...')
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'strategy':>12} {'median ms':>10} {'p95 ms':>10}")
+    for size in args.sizes:
+        for strategy in args.strategies:
+            median, p95 = measure(strategy, size, args.repeat, args.search, args.status, args.include)
+            print(f"{size:>6} {strategy:>12} {median:>10.1f} {p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark gộp điểm bản đồ ở zoom thấp: cây phân cấp NumPy (services/point_cluster.py)
+vs ST_ClusterWithin của PostGIS (RESCUE_MAP_CLUSTER_SOURCE=live).
+
+Chạy từ thư mục backend (cần numpy; --postgis cần DB có PostGIS, nên dùng DB test):
+    python -m app.testing.bench_map_clusters
+    python -m app.testing.bench_map_clusters --sizes 10000 100000 1000000 --postgis
+    python -m app.testing.bench_map_clusters --zooms 6 10 14 --repeat 50
+
+- Điểm ngẫu nhiên trong khung Việt Nam (như bench_request_search). Với --postgis, điểm sinh
+  trong bảng tạm (TEMP TABLE, có GIST) rồi nạp sang NumPy, hai bên gộp cùng một tập điểm;
+  bảng rescue_requests không bị đụng tới.
+- Mỗi zoom đo --repeat khung nhìn 1280x800px ngẫu nhiên, in thời gian dựng cây (s) và
+  trung vị (ms) mỗi truy vấn, kèm số cụm trung bình để đối chiếu.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from app.services import RescueRequestService  # noqa: E402
+from app.services.point_cluster import ClusterHierarchy, np  # noqa: E402
+
+MIN_LNG, MAX_LNG = 102.0, 109.0
+MIN_LAT, MAX_LAT = 9.0, 22.0
+SCREEN_W, SCREEN_H = 1280, 800
+
+_POSTGIS_SQL = """
+    WITH clustered AS (
+        SELECT unnest(ST_ClusterWithin(ST_Transform(location, 3857), %(radius)s)) AS cluster_geom
+        FROM bench_cluster_points
+        WHERE location && ST_MakeEnvelope(%(min_lng)s, %(min_lat)s, %(max_lng)s, %(max_lat)s, 4326)
+    )
+    SELECT
+        ST_Y(ST_Transform(ST_Centroid(cluster_geom), 4326)) AS latitude,
+        ST_X(ST_Transform(ST_Centroid(cluster_geom), 4326)) AS longitude,
+        ST_NumGeometries(cluster_geom) AS total
+    FROM clustered
+    ORDER BY total DESC
+"""
+
+
+def make_points(size: int, postgis: bool, rng):
+    if not postgis:
+        return rng.uniform(MIN_LNG, MAX_LNG, size), rng.uniform(MIN_LAT, MAX_LAT, size)
+
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS bench_cluster_points")
+        cursor.execute("""
+            CREATE TEMP TABLE bench_cluster_points AS
+            SELECT ST_SetSRID(ST_MakePoint(%(min_lng)s + random() * %(w)s, %(min_lat)s + random() * %(h)s), 4326)
+                   AS location
+            FROM generate_series(1, %(size)s)
+        """, {"min_lng": MIN_LNG, "min_lat": MIN_LAT,
+              "w": MAX_LNG - MIN_LNG, "h": MAX_LAT - MIN_LAT, "size": size})
+        cursor.execute("CREATE INDEX ON bench_cluster_points USING GIST (location)")
+        cursor.execute("ANALYZE bench_cluster_points")
+        cursor.execute("SELECT ST_X(location), ST_Y(location) FROM bench_cluster_points")
+        coords = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 2)
+    return coords[:, 0], coords[:, 1]
+
+
+def viewports(zoom: int, count: int, rng):
+    # Độ rộng khung nhìn (độ) ở zoom này, chiều cao xấp xỉ theo tỉ lệ màn hình
+    width = SCREEN_W * 360.0 / (256 * 2 ** zoom)
+    height = width * SCREEN_H / SCREEN_W
+    for lng, lat in zip(rng.uniform(MIN_LNG, MAX_LNG, count), rng.uniform(MIN_LAT, MAX_LAT, count)):
+        yield {
+            "min_lng": lng - width / 2, "max_lng": lng + width / 2,
+            "min_lat": lat - height / 2, "max_lat": lat + height / 2,
+        }
+
+
+def measure(run, boxes):
+    timings, clusters = [], []
+    for box in boxes:
+        start = time.perf_counter()
+        result = run(box)
+        timings.append((time.perf_counter() - start) * 1000)
+        clusters.append(len(result))
+    return statistics.median(timings), statistics.mean(clusters)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--zooms", type=int, nargs="+", default=[5, 8, 11, 14])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--postgis", action="store_true", help="đo cả ST_ClusterWithin trên bảng tạm")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if np is None:
+        raise SystemExit("Cần cài numpy: pip install numpy")
+
+    rng = np.random.default_rng(args.seed)
+    radius_for_zoom = RescueRequestService._calculate_grid_size
+
+    print(f"{'points':>9} {'zoom':>5} {'build s':>8} {'numpy ms':>9} {'clusters':>9}"
+          + (f" {'postgis ms':>11} {'clusters':>9}" if args.postgis else ""))
+    for size in args.sizes:
+        lng, lat = make_points(size, args.postgis, rng)
+        start = time.perf_counter()
+        hierarchy = ClusterHierarchy.build(lng, lat, radius_for_zoom)
+        build = time.perf_counter() - start
+
+        for zoom in args.zooms:
+            boxes = list(viewports(zoom, args.repeat, rng))
+            numpy_ms, numpy_clusters = measure(
+                lambda box: hierarchy.query(box["min_lat"], box["max_lat"], box["min_lng"], box["max_lng"], zoom),
+                boxes,
+            )
+            line = f"{size:>9} {zoom:>5} {build:>8.2f} {numpy_ms:>9.2f} {numpy_clusters:>9.0f}"
+
+            if args.postgis:
+                def run_postgis(box):
+                    with connection.cursor() as cursor:
+                        cursor.execute(_POSTGIS_SQL, {**box, "radius": radius_for_zoom(zoom)})
+                        return cursor.fetchall()
+                postgis_ms, postgis_clusters = measure(run_postgis, boxes)
+                line += f" {postgis_ms:>11.1f} {postgis_clusters:>9.0f}"
+            print(line)
+
+    if args.postgis:
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS bench_cluster_points")
+
+
+if __name__ == "__main__":
+    main()
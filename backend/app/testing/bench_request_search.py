@@ -0,0 +1,118 @@
+"""
+Benchmark tìm kiếm yêu cầu cứu hộ: ILIKE cũ vs search_text + trigram (sql/007).
+
+Chạy từ thư mục backend (cần DB thật đã chạy sql/007, nên dùng DB test):
+    python -m app.testing.bench_request_search --seed 1000000
+    python -m app.testing.bench_request_search --terms nguyen "Nguyễn Văn" 0912 "ha noi"
+    python -m app.testing.bench_request_search --cleanup
+
+- --seed N:  sinh N yêu cầu giả (mã BENCHS-...) bằng generate_series rồi ANALYZE.
+- Mỗi từ khóa chạy --repeat lần, in thời gian trung vị (ms) và số dòng khớp của:
+    ilike:  điều kiện ILIKE cũ trên name / contact_phone / address
+    trgm:   điều kiện mới (RequestSearch) trên search_text
+    list:   trọn RescueRequestService.get_list_requests_raw_sql (trang đầu, có xếp hạng)
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from app.services import RescueRequestService  # noqa: E402
+from app.services.request_search import RequestSearch  # noqa: E402
+
+BENCH_PREFIX = "BENCHS-"
+
+_SEED_SQL = """
+    INSERT INTO rescue_requests (
+        id, code, name, contact_phone, address,
+        adults, children, elderly, description, conditions,
+        location, status, created_at, updated_at
+    )
+    SELECT
+        gen_random_uuid(),
+        %(prefix)s || g,
+        (ARRAY['Nguyễn','Trần','Lê','Phạm','Hoàng','Huỳnh','Phan','Vũ','Võ','Đặng'])[1 + g %% 10]
+            || ' ' || (ARRAY['Văn','Thị','Hữu','Minh','Ngọc','Đức'])[1 + (g / 10) %% 6]
+            || ' ' || (ARRAY['An','Bình','Cường','Dũng','Hà','Hương','Lan','Phúc','Sơn','Tuấn','Yến'])[1 + (g / 60) %% 11],
+        '09' || lpad((g::bigint * 7919 %% 100000000)::text, 8, '0'),
+        'Số ' || (g %% 500) || ' đường '
+            || (ARRAY['Lê Lợi','Trần Hưng Đạo','Nguyễn Huệ','Hùng Vương','Quang Trung'])[1 + g %% 5]
+            || ', ' || (ARRAY['Hà Nội','Huế','Đà Nẵng','Quảng Nam','Cần Thơ','TP Hồ Chí Minh'])[1 + (g / 5) %% 6],
+        1, 0, 0, '(Benchmark)', '[]'::jsonb,
+        ST_SetSRID(ST_MakePoint(102 + random() * 7, 9 + random() * 13), 4326),
+        'Chờ xử lý',
+        NOW() - (g || ' seconds')::interval,
+        NOW()
+    FROM generate_series(1, %(count)s) AS g
+"""
+
+
+def seed(count: int):
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute(_SEED_SQL, {"prefix": BENCH_PREFIX, "count": count})
+        cursor.execute("ANALYZE rescue_requests")
+    print(f"seeded {count} rows in {time.perf_counter() - start:.1f}s")
+
+
+def cleanup():
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM rescue_requests WHERE code LIKE %s", [BENCH_PREFIX + "%"])
+        print(f"deleted {cursor.rowcount} rows")
+
+
+def _time(fn, repeat: int):
+    timings, rows = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), rows
+
+
+def _count(condition: str, params: dict) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM rescue_requests r WHERE {condition}", params)
+        return cursor.fetchone()[0]
+
+
+def run(terms, repeat: int):
+    ilike = "(r.name ILIKE %(search)s OR r.contact_phone ILIKE %(search)s OR r.address ILIKE %(search)s)"
+
+    print(f"{'term':>16} {'ilike ms':>10} {'rows':>8} {'trgm ms':>10} {'rows':>8} {'list ms':>10}")
+    for term in terms:
+        ilike_ms, ilike_rows = _time(lambda: _count(ilike, {"search": f"%{term}%"}), repeat)
+        condition, params = RequestSearch.build(term)
+        trgm_ms, trgm_rows = _time(lambda: _count(condition, params), repeat)
+        list_ms, _ = _time(
+            lambda: RescueRequestService.get_list_requests_raw_sql(1, 20, search=term, with_total=False),
+            repeat,
+        )
+        print(f"{term:>16} {ilike_ms:>10.1f} {ilike_rows:>8} {trgm_ms:>10.1f} {trgm_rows:>8} {list_ms:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cleanup", action="store_true")
+    parser.add_argument("--terms", nargs="+",
+                        default=["nguyen", "Nguyễn Văn", "tuan", "0912", "tran hung dao", "da nang"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        return
+    if args.seed:
+        seed(args.seed)
+    run(args.terms, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark CPU cho bước trả JSON của các endpoint đọc (không cần DB):
+    validate: schema pydantic validate lại từng dòng + encoder JSON mặc định của Ninja
+    orjson:   vẫn validate nhưng render bằng ORJSONRenderer
+    trusted:  trusted_response (không validate, orjson)
+
+Chạy từ thư mục backend:
+    python -m app.testing.bench_serialization
+    python -m app.testing.bench_serialization --rows 20 200 2000 --repeat 50
+
+Dữ liệu giả có shape giống kết quả của RescueRequestService / AssignService.
+In thời gian CPU (process_time) trung bình mỗi request, đơn vị ms.
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Union
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+django.setup()
+
+from ninja.responses import NinjaJSONEncoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from app.renderers import dumps, trusted_response  # noqa: E402
+from app.schemas.rescue_schema import (  # noqa: E402
+    PaginatedRescueResponse, RescueMapPoint, RescueMapPointCluster,
+)
+
+
+def _table_page(rows: int) -> dict:
+    now = datetime.now(timezone.utc)
+    items = [{
+        "id": uuid.uuid4(), "code": f"HN-20250101-{i:04d}", "name": "Nguyễn Văn An",
+        "contact_phone": "0912345678", "address": "Số 1 Lê Lợi, Huế", "status": "Chờ xử lý",
+        "created_at": now, "latitude": 16.46, "longitude": 107.59,
+        "conditions": '["Ngập nước", "Có người già"]',
+        "adults": 2, "children": 1, "elderly": 1,
+        "description_short": "Nước lên nhanh", "people_summary": "4 (2 lớn, 1 nhỏ, 1 già)",
+        "media_urls": ["rescue_media/a.jpg", "rescue_media/b.jpg"],
+        "thumbnail_urls": ["rescue_media/a_t.jpg", "rescue_media/b_t.jpg"],
+        "active_assignment": {
+            "task_id": str(uuid.uuid4()), "status": "Đang di chuyển",
+            "updated_at": now.isoformat(), "team_name": "Đội 1", "team_phone": "0900000000",
+            "team_lat": 16.47, "team_lng": 107.6,
+        },
+    } for i in range(rows)]
+    return {"items": items, "total": 10000, "total_exact": True, "page": 1,
+            "page_size": rows, "next_cursor": None}
+
+
+def _map_points(rows: int) -> list:
+    return [{
+        "id": uuid.uuid4(), "code": f"HN-{i}", "name": "Trần Thị B", "adults": 1, "children": 0,
+        "elderly": 0, "conditions": '["Ngập nước"]', "contact_phone": "0912345678",
+        "latitude": 16.4, "longitude": 107.5, "status": "Chờ xử lý",
+    } for i in range(rows)]
+
+
+def _cpu_ms(fn, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) * 1000 / repeat
+
+
+def run(name: str, data, adapter: TypeAdapter, repeat: int):
+    def validate_json():
+        json.dumps(adapter.dump_python(adapter.validate_python(data)), cls=NinjaJSONEncoder)
+
+    def validate_orjson():
+        dumps(adapter.dump_python(adapter.validate_python(data)))
+
+    def trusted():
+        trusted_response(data)
+
+    results = [_cpu_ms(fn, repeat) for fn in (validate_json, validate_orjson, trusted)]
+    print(f"{name:>18} " + " ".join(f"{ms:>10.2f}" for ms in results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[20, 100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    table = TypeAdapter(PaginatedRescueResponse)
+    points = TypeAdapter(List[Union[RescueMapPoint, RescueMapPointCluster]])
+
+    print(f"{'endpoint/rows':>18} {'validate':>10} {'orjson':>10} {'trusted':>10}")
+    for rows in args.rows:
+        run(f"requests/{rows}", _table_page(rows), table, args.repeat)
+        run(f"map-points/{rows}", _map_points(rows), points, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Tạo ảnh thu nhỏ (thumbnail / preview) cho media.
+
+Module này chạy trong process con (ProcessPoolExecutor) nên KHÔNG import Django,
+chỉ nhận bytes và trả về bytes.
+"""
+from io import BytesIO
+from typing import Dict, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow là phụ thuộc tùy chọn
+    Image = None
+
+
+def is_available() -> bool:
+    return Image is not None
+
+
+def build_derivatives(data: bytes, sizes: Dict[str, Tuple[int, int]]) -> Dict[str, bytes]:
+    """
+    Resize + nén lại ảnh gốc thành các kích thước trong `sizes`
+    ({"thumbnail": (320, 75), "preview": (1280, 82)} = cạnh dài tối đa, chất lượng JPEG).
+    Ảnh được xoay theo EXIF rồi lưu lại KHÔNG kèm EXIF (bỏ GPS, thông tin máy...).
+    """
+    with Image.open(BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        result = {}
+        for name, (max_side, quality) in sizes.items():
+            derived = img.copy()
+            derived.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            out = BytesIO()
+            derived.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+            result[name] = out.getvalue()
+        return result
@@ -0,0 +1,33 @@
+"""
+Lấy một khung hình (poster) từ video để làm ảnh thu nhỏ.
+
+Gọi ffmpeg ở process riêng (subprocess) nên không giữ GIL; như image_derivatives,
+module này KHÔNG import Django, chỉ nhận đường dẫn file local và trả về bytes PNG.
+"""
+import shutil
+import subprocess
+from typing import Optional
+
+
+def is_available(binary: str = "ffmpeg") -> bool:
+    return shutil.which(binary) is not None
+
+
+def extract_frame(path: str, at_seconds: float, binary: str = "ffmpeg", timeout: float = 30) -> Optional[bytes]:
+    """
+    Khung hình tại giây `at_seconds` (video ngắn hơn thì lấy khung đầu) dạng PNG.
+    None nếu ffmpeg không đọc được file.
+    """
+    for seek in (at_seconds, 0):
+        try:
+            result = subprocess.run(
+                [binary, "-v", "error", "-ss", str(seek), "-i", path,
+                 "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "-"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                timeout=timeout, check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode == 0 and result.stdout:
+            return result.stdout
+    return None
@@ -0,0 +1,21 @@
+-- Bộ đếm số thứ tự mã yêu cầu cứu hộ theo (tỉnh, ngày).
+-- Thay cho việc quét bảng rescue_requests bằng LIKE 'SG-YYYYMMDD-%' + SELECT ... FOR UPDATE.
+
+CREATE TABLE IF NOT EXISTS rescue_code_sequences (
+    province_code VARCHAR(10) NOT NULL,
+    day           DATE        NOT NULL,
+    last_value    BIGINT      NOT NULL DEFAULT 0,
+    PRIMARY KEY (province_code, day)
+);
+
+-- Khởi tạo bộ đếm từ các mã đã cấp (chỉ quét bảng một lần khi chạy script)
+INSERT INTO rescue_code_sequences (province_code, day, last_value)
+SELECT
+    split_part(code, '-', 1),
+    to_date(split_part(code, '-', 2), 'YYYYMMDD'),
+    MAX(split_part(code, '-', 3)::BIGINT)
+FROM rescue_requests
+WHERE code ~ '^[A-Z0-9]+-[0-9]{8}-[0-9]+$'
+GROUP BY 1, 2
+ON CONFLICT (province_code, day)
+DO UPDATE SET last_value = GREATEST(rescue_code_sequences.last_value, EXCLUDED.last_value);
@@ -0,0 +1,13 @@
+-- Gộp yêu cầu trùng khi nhận (cùng SĐT hoặc tên, gần nhau, trong vài phút).
+
+ALTER TABLE rescue_requests
+    ADD COLUMN IF NOT EXISTS duplicate_count  INTEGER     NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS last_reported_at TIMESTAMPTZ NULL;
+
+-- Tra cứu ứng viên trùng theo SĐT / tên trong cửa sổ thời gian:
+-- chi phí phụ thuộc số yêu cầu của cùng người gửi, không phụ thuộc kích thước bảng.
+CREATE INDEX IF NOT EXISTS idx_rescue_requests_phone_created
+    ON rescue_requests (contact_phone, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_rescue_requests_lower_name_created
+    ON rescue_requests (lower(name), created_at DESC);
@@ -0,0 +1,9 @@
+-- Ảnh thu nhỏ cho media: danh sách / bản đồ dùng thumbnail thay vì ảnh gốc.
+
+ALTER TABLE media
+    ADD COLUMN IF NOT EXISTS thumbnail VARCHAR(255) NULL,
+    ADD COLUMN IF NOT EXISTS preview   VARCHAR(255) NULL;
+
+-- Các subquery lấy media theo từng yêu cầu cứu hộ
+CREATE INDEX IF NOT EXISTS idx_media_rescue_request
+    ON media (rescue_request_id);
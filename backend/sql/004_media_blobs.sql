@@ -0,0 +1,18 @@
+-- Lưu media theo nội dung (SHA-256): mỗi nội dung chỉ lưu một lần, media trỏ tới blob.
+
+CREATE TABLE IF NOT EXISTS media_blobs (
+    digest     CHAR(64)     PRIMARY KEY,
+    file       VARCHAR(255) NOT NULL,
+    size       BIGINT       NOT NULL,
+    ref_count  INTEGER      NOT NULL DEFAULT 0,
+    thumbnail  VARCHAR(255) NULL,
+    preview    VARCHAR(255) NULL,
+    created_at TIMESTAMPTZ  NOT NULL DEFAULT NOW()
+);
+
+-- Media cũ (trước khi có blob) giữ blob_digest = NULL và dùng file riêng như trước
+ALTER TABLE media
+    ADD COLUMN IF NOT EXISTS blob_digest CHAR(64) NULL REFERENCES media_blobs (digest);
+
+CREATE INDEX IF NOT EXISTS idx_media_blob_digest
+    ON media (blob_digest);
@@ -0,0 +1,7 @@
+-- Phân trang keyset trên (created_at, id) cho danh sách yêu cầu cứu hộ.
+
+CREATE INDEX IF NOT EXISTS idx_rescue_requests_created_id
+    ON rescue_requests (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_rescue_requests_account_created_id
+    ON rescue_requests (account_id, created_at DESC, id DESC);
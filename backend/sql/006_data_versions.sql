@@ -0,0 +1,12 @@
+-- Số phiên bản dữ liệu theo phạm vi (scope), tăng sau mỗi lần ghi đã commit.
+-- Cache ở tầng ứng dụng (đếm tổng, response...) gắn phiên bản vào key,
+-- nên mọi process đều thấy cache cũ hết hiệu lực mà không cần xóa chủ động.
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope   VARCHAR(100) PRIMARY KEY,
+    version BIGINT       NOT NULL DEFAULT 0
+);
+
+INSERT INTO data_versions (scope, version)
+VALUES ('requests', 0)
+ON CONFLICT (scope) DO NOTHING;
@@ -0,0 +1,41 @@
+-- Tìm kiếm yêu cầu cứu hộ không phân biệt dấu (gõ "Nguyen" vẫn ra "Nguyễn")
+-- bằng cột search_text đã chuẩn hóa + chỉ mục trigram (GIN), thay cho ILIKE quét cả bảng.
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- unaccent() là STABLE (phụ thuộc search_path) nên không dùng được trong chỉ mục;
+-- bọc lại với từ điển chỉ định rõ để có hàm IMMUTABLE.
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+-- Chuẩn hóa: bỏ dấu (cả đ -> d), chữ thường
+CREATE OR REPLACE FUNCTION rescue_search_normalize(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$ SELECT lower(f_unaccent(coalesce($1, ''))) $$;
+
+ALTER TABLE rescue_requests
+    ADD COLUMN IF NOT EXISTS search_text TEXT NOT NULL DEFAULT '';
+
+CREATE OR REPLACE FUNCTION rescue_requests_search_text() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.search_text := rescue_search_normalize(concat_ws(' ', NEW.name, NEW.contact_phone, NEW.address));
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_rescue_requests_search_text ON rescue_requests;
+CREATE TRIGGER trg_rescue_requests_search_text
+    BEFORE INSERT OR UPDATE OF name, contact_phone, address ON rescue_requests
+    FOR EACH ROW EXECUTE FUNCTION rescue_requests_search_text();
+
+-- Điền cho dữ liệu cũ (chỉ các dòng chưa có)
+UPDATE rescue_requests
+SET search_text = rescue_search_normalize(concat_ws(' ', name, contact_phone, address))
+WHERE search_text = '';
+
+CREATE INDEX IF NOT EXISTS idx_rescue_requests_search_trgm
+    ON rescue_requests USING gin (search_text gin_trgm_ops);
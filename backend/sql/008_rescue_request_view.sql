@@ -0,0 +1,156 @@
+-- Read model cho bảng danh sách yêu cầu cứu hộ: các cột dẫn xuất (media, nhiệm vụ
+-- đang chạy, tóm tắt số người) được tính sẵn khi ghi, danh sách chỉ JOIN theo khóa chính
+-- thay vì chạy subquery json_agg / JOIN đội cứu hộ cho từng dòng.
+-- Trigger cập nhật trong cùng transaction ghi dữ liệu nên read model không bị lệch.
+
+CREATE TABLE IF NOT EXISTS rescue_request_view (
+    request_id        UUID PRIMARY KEY REFERENCES rescue_requests (id) ON DELETE CASCADE,
+    description_short TEXT  NOT NULL DEFAULT '',
+    people_summary    TEXT  NOT NULL DEFAULT '0',
+    media_urls        JSONB NOT NULL DEFAULT '[]'::jsonb,
+    thumbnail_urls    JSONB NOT NULL DEFAULT '[]'::jsonb,
+    active_assignment JSONB NULL
+);
+
+-- Nguồn duy nhất của các biểu thức dẫn xuất (dùng cho trigger và lần điền ban đầu).
+-- DROP trước: sql/016 thêm cột, CREATE OR REPLACE VIEW không bỏ cột được khi chạy lại
+DROP VIEW IF EXISTS rescue_request_view_source;
+CREATE OR REPLACE VIEW rescue_request_view_source AS
+SELECT
+    r.id AS request_id,
+    LEFT(COALESCE(r.description, ''), 100) AS description_short,
+    CASE
+        WHEN (r.adults + r.children + r.elderly) = 0 THEN '0'
+        ELSE CONCAT(
+            (r.adults + r.children + r.elderly), ' (',
+            CONCAT_WS(', ',
+                NULLIF(CONCAT(r.adults, ' lớn'), '0 lớn'),
+                NULLIF(CONCAT(r.children, ' nhỏ'), '0 nhỏ'),
+                NULLIF(CONCAT(r.elderly, ' già'), '0 già')
+            ), ')'
+        )
+    END AS people_summary,
+    COALESCE(
+        (SELECT jsonb_agg(m.file ORDER BY m.created_at, m.id)
+         FROM media m WHERE m.rescue_request_id = r.id),
+        '[]'::jsonb
+    ) AS media_urls,
+    COALESCE(
+        (SELECT jsonb_agg(COALESCE(m.thumbnail, m.file) ORDER BY m.created_at, m.id)
+         FROM media m WHERE m.rescue_request_id = r.id),
+        '[]'::jsonb
+    ) AS thumbnail_urls,
+    (
+        SELECT jsonb_build_object(
+            'task_id', a.id,
+            'status', a.status,
+            'updated_at', a.updated_at,
+            'team_name', t.name,
+            'team_phone', t.contact_phone,
+            'team_lat', ST_Y(t.location),
+            'team_lng', ST_X(t.location)
+        )
+        FROM rescue_assignments a
+        JOIN rescue_teams t ON a.rescue_team_id = t.id
+        WHERE a.rescue_request_id = r.id
+        AND a.status IN ('Đã điều động', 'Đang di chuyển', 'Đã đến', 'Hoàn thành')
+        ORDER BY a.created_at DESC
+        LIMIT 1
+    ) AS active_assignment
+FROM rescue_requests r;
+
+-- Tính lại read model cho một yêu cầu (chi phí chỉ phụ thuộc media / nhiệm vụ của yêu cầu đó)
+CREATE OR REPLACE FUNCTION rescue_request_view_refresh(p_request_id UUID) RETURNS void
+    LANGUAGE sql
+AS $$
+    INSERT INTO rescue_request_view
+        (request_id, description_short, people_summary, media_urls, thumbnail_urls, active_assignment)
+    SELECT request_id, description_short, people_summary, media_urls, thumbnail_urls, active_assignment
+    FROM rescue_request_view_source
+    WHERE request_id = p_request_id
+    ON CONFLICT (request_id) DO UPDATE SET
+        description_short = EXCLUDED.description_short,
+        people_summary    = EXCLUDED.people_summary,
+        media_urls        = EXCLUDED.media_urls,
+        thumbnail_urls    = EXCLUDED.thumbnail_urls,
+        active_assignment = EXCLUDED.active_assignment
+$$;
+
+-- rescue_requests: tạo dòng mới / đổi số người, mô tả
+CREATE OR REPLACE FUNCTION trg_rescue_request_view_request() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM rescue_request_view_refresh(NEW.id);
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_rescue_request_view_request ON rescue_requests;
+CREATE TRIGGER trg_rescue_request_view_request
+    AFTER INSERT OR UPDATE OF adults, children, elderly, description ON rescue_requests
+    FOR EACH ROW EXECUTE FUNCTION trg_rescue_request_view_request();
+
+-- media / rescue_assignments: tính lại cho yêu cầu cũ và mới (nếu đổi yêu cầu)
+CREATE OR REPLACE FUNCTION trg_rescue_request_view_child() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM rescue_request_view_refresh(OLD.rescue_request_id);
+    END IF;
+    IF TG_OP = 'INSERT'
+       OR (TG_OP = 'UPDATE' AND NEW.rescue_request_id IS DISTINCT FROM OLD.rescue_request_id) THEN
+        PERFORM rescue_request_view_refresh(NEW.rescue_request_id);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_rescue_request_view_media ON media;
+CREATE TRIGGER trg_rescue_request_view_media
+    AFTER INSERT OR UPDATE OR DELETE ON media
+    FOR EACH ROW EXECUTE FUNCTION trg_rescue_request_view_child();
+
+DROP TRIGGER IF EXISTS trg_rescue_request_view_assignment ON rescue_assignments;
+CREATE TRIGGER trg_rescue_request_view_assignment
+    AFTER INSERT OR UPDATE OR DELETE ON rescue_assignments
+    FOR EACH ROW EXECUTE FUNCTION trg_rescue_request_view_child();
+
+-- rescue_teams: tên / SĐT / vị trí đội nằm trong active_assignment của các yêu cầu đang làm.
+-- Nhiệm vụ đã hoàn thành giữ thông tin đội lúc hoàn thành (không tính lại theo mỗi lần
+-- đội cập nhật vị trí, nếu không chi phí tăng theo lịch sử nhiệm vụ của đội).
+CREATE OR REPLACE FUNCTION trg_rescue_request_view_team() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM rescue_request_view_refresh(a.rescue_request_id)
+    FROM (
+        SELECT DISTINCT rescue_request_id
+        FROM rescue_assignments
+        WHERE rescue_team_id = NEW.id
+        AND status IN ('Đã điều động', 'Đang di chuyển', 'Đã đến')
+    ) a;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_rescue_request_view_team ON rescue_teams;
+CREATE TRIGGER trg_rescue_request_view_team
+    AFTER UPDATE OF name, contact_phone, location ON rescue_teams
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name
+          OR OLD.contact_phone IS DISTINCT FROM NEW.contact_phone
+          OR OLD.location IS DISTINCT FROM NEW.location)
+    EXECUTE FUNCTION trg_rescue_request_view_team();
+
+-- Điền cho dữ liệu cũ
+INSERT INTO rescue_request_view
+    (request_id, description_short, people_summary, media_urls, thumbnail_urls, active_assignment)
+SELECT request_id, description_short, people_summary, media_urls, thumbnail_urls, active_assignment
+FROM rescue_request_view_source
+ON CONFLICT (request_id) DO NOTHING;
+
+-- Các subquery nhiệm vụ theo yêu cầu (trigger và đường đọc cũ)
+CREATE INDEX IF NOT EXISTS idx_rescue_assignments_request_created
+    ON rescue_assignments (rescue_request_id, created_at DESC);
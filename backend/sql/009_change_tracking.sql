@@ -0,0 +1,90 @@
+-- Theo dõi thay đổi để client đồng bộ phần chênh lệch (GET /api/requests/changes?since=).
+--
+-- Mỗi dòng lưu change_xid = id transaction (xid8) lần ghi cuối. Không dùng sequence vì
+-- số sequence được cấp trước khi commit: transaction commit muộn có thể mang số nhỏ hơn
+-- số client đã đọc và bị bỏ sót. Với xid: mọi transaction có xid < xmin của snapshot hiện
+-- tại đã kết thúc, nên chỉ trả các dòng có change_xid < xmin là không bao giờ sót.
+-- Cần PostgreSQL 13+ (pg_current_xact_id, xid8).
+
+ALTER TABLE rescue_requests
+    ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+ALTER TABLE rescue_assignments
+    ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+-- updated_at trước đây chỉ được gán lúc tạo (auto_now_add): giờ cập nhật ở mọi lần ghi
+CREATE OR REPLACE FUNCTION trg_touch_change() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    NEW.change_xid := pg_current_xact_id();
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_rescue_requests_touch ON rescue_requests;
+CREATE TRIGGER trg_rescue_requests_touch
+    BEFORE UPDATE ON rescue_requests
+    FOR EACH ROW EXECUTE FUNCTION trg_touch_change();
+
+DROP TRIGGER IF EXISTS trg_rescue_assignments_touch ON rescue_assignments;
+CREATE TRIGGER trg_rescue_assignments_touch
+    BEFORE UPDATE ON rescue_assignments
+    FOR EACH ROW EXECUTE FUNCTION trg_touch_change();
+
+-- Nhiệm vụ / media đổi thì dòng yêu cầu hiển thị cũng đổi: đánh dấu yêu cầu cha
+CREATE OR REPLACE FUNCTION trg_rescue_request_touch_parent() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE rescue_requests SET change_xid = pg_current_xact_id()
+        WHERE id = OLD.rescue_request_id AND change_xid <> pg_current_xact_id();
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE rescue_requests SET change_xid = pg_current_xact_id()
+        WHERE id = NEW.rescue_request_id AND change_xid <> pg_current_xact_id();
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_rescue_assignments_touch_parent ON rescue_assignments;
+CREATE TRIGGER trg_rescue_assignments_touch_parent
+    AFTER INSERT OR UPDATE OR DELETE ON rescue_assignments
+    FOR EACH ROW EXECUTE FUNCTION trg_rescue_request_touch_parent();
+
+DROP TRIGGER IF EXISTS trg_media_touch_parent ON media;
+CREATE TRIGGER trg_media_touch_parent
+    AFTER INSERT OR UPDATE OR DELETE ON media
+    FOR EACH ROW EXECUTE FUNCTION trg_rescue_request_touch_parent();
+
+-- Yêu cầu bị xóa: giữ dấu vết để client xóa khỏi bản sao cục bộ
+CREATE TABLE IF NOT EXISTS rescue_request_tombstones (
+    request_id UUID        NOT NULL,
+    change_xid xid8        NOT NULL DEFAULT pg_current_xact_id(),
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (change_xid, request_id)
+);
+
+CREATE OR REPLACE FUNCTION trg_rescue_requests_tombstone() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO rescue_request_tombstones (request_id) VALUES (OLD.id)
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_rescue_requests_tombstone ON rescue_requests;
+CREATE TRIGGER trg_rescue_requests_tombstone
+    AFTER DELETE ON rescue_requests
+    FOR EACH ROW EXECUTE FUNCTION trg_rescue_requests_tombstone();
+
+CREATE INDEX IF NOT EXISTS idx_rescue_requests_change
+    ON rescue_requests (change_xid, id);
+
+CREATE INDEX IF NOT EXISTS idx_rescue_assignments_change
+    ON rescue_assignments (change_xid, id);
@@ -0,0 +1,162 @@
+-- Pyramid lưới gộp điểm cho /api/requests/map-points ở zoom thấp (< 15).
+--
+-- Mỗi level là lưới tile Web Mercator 2^level x 2^level; bản đồ ở zoom z đọc level
+-- z + 2 (ô rộng 64px trên màn hình, gần bán kính gộp 60px của ST_ClusterWithin cũ).
+-- Mỗi ô lưu số yêu cầu, tổng kinh/vĩ độ (tâm = tổng / số lượng) và số lượng theo trạng thái.
+-- Chi phí đọc tỉ lệ với số ô trong khung nhìn, không phụ thuộc số điểm.
+--
+-- Ghi: trigger chỉ nối thêm một dòng vào map_cluster_deltas (không khóa ô nóng khi
+-- nhiều yêu cầu đổ về cùng khu vực). Đọc: map_cluster_fold() gộp các delta đã commit
+-- vào ô (một process gộp tại một thời điểm, advisory lock), rồi mới truy vấn ô.
+
+CREATE OR REPLACE FUNCTION map_cluster_cell(lng DOUBLE PRECISION, lat DOUBLE PRECISION, level INTEGER,
+                                            OUT cx INTEGER, OUT cy INTEGER)
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT
+        LEAST(GREATEST(floor((lng + 180.0) / 360.0 * (1 << level))::int, 0), (1 << level) - 1),
+        LEAST(GREATEST(floor(
+            (1.0 - ln(tan(radians(c.lat)) + 1.0 / cos(radians(c.lat))) / pi()) / 2.0 * (1 << level)
+        )::int, 0), (1 << level) - 1)
+    FROM (SELECT LEAST(GREATEST(lat, -85.05112878), 85.05112878) AS lat) c
+$$;
+
+CREATE TABLE IF NOT EXISTS map_cluster_cells (
+    level    SMALLINT         NOT NULL,
+    cx       INTEGER          NOT NULL,
+    cy       INTEGER          NOT NULL,
+    total    INTEGER          NOT NULL DEFAULT 0,
+    sum_lng  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_lat  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    statuses JSONB            NOT NULL DEFAULT '{}'::jsonb,
+    PRIMARY KEY (level, cx, cy)
+);
+
+-- Ô rỗng (yêu cầu đã xóa / chuyển đi) được dọn sau mỗi lần gộp
+CREATE INDEX IF NOT EXISTS idx_map_cluster_cells_empty
+    ON map_cluster_cells (level) WHERE total <= 0;
+
+CREATE TABLE IF NOT EXISTS map_cluster_deltas (
+    id     BIGSERIAL        PRIMARY KEY,
+    lng    DOUBLE PRECISION NOT NULL,
+    lat    DOUBLE PRECISION NOT NULL,
+    status VARCHAR(50)      NOT NULL,
+    delta  SMALLINT         NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION trg_map_cluster_delta() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.location IS NOT DISTINCT FROM OLD.location
+       AND NEW.status IS NOT DISTINCT FROM OLD.status THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.location IS NOT NULL THEN
+        INSERT INTO map_cluster_deltas (lng, lat, status, delta)
+        VALUES (ST_X(OLD.location), ST_Y(OLD.location), COALESCE(OLD.status, ''), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.location IS NOT NULL THEN
+        INSERT INTO map_cluster_deltas (lng, lat, status, delta)
+        VALUES (ST_X(NEW.location), ST_Y(NEW.location), COALESCE(NEW.status, ''), 1);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_rescue_requests_map_cluster ON rescue_requests;
+CREATE TRIGGER trg_rescue_requests_map_cluster
+    AFTER INSERT OR DELETE OR UPDATE OF location, status ON rescue_requests
+    FOR EACH ROW EXECUTE FUNCTION trg_map_cluster_delta();
+
+-- Cộng hai bảng đếm {trạng thái: số lượng}, bỏ trạng thái về 0
+CREATE OR REPLACE FUNCTION map_cluster_add_counts(a JSONB, b JSONB) RETURNS JSONB
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT COALESCE(jsonb_object_agg(key, n), '{}'::jsonb)
+    FROM (
+        SELECT key, SUM(value::int) AS n
+        FROM (
+            SELECT * FROM jsonb_each_text(a)
+            UNION ALL
+            SELECT * FROM jsonb_each_text(b)
+        ) kv
+        GROUP BY key
+    ) s
+    WHERE n <> 0
+$$;
+
+-- Gộp delta vào ô, trả về số ô đã cập nhật. Không có delta thì không lấy khóa.
+-- sql/013 thay bằng map_cluster_fold(wait BOOLEAN DEFAULT false): bỏ bản đó khi chạy lại
+-- script này để lời gọi map_cluster_fold() không bao giờ mơ hồ giữa hai chữ ký
+DROP FUNCTION IF EXISTS map_cluster_fold(BOOLEAN);
+CREATE OR REPLACE FUNCTION map_cluster_fold() RETURNS INTEGER
+    LANGUAGE plpgsql
+AS $$
+DECLARE
+    folded INTEGER;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM map_cluster_deltas) THEN
+        RETURN 0;
+    END IF;
+
+    -- Process gộp sau chờ process trước commit rồi mới đọc delta (snapshot mới mỗi câu lệnh)
+    PERFORM pg_advisory_xact_lock(hashtext('map_cluster_fold'));
+
+    WITH moved AS (
+        DELETE FROM map_cluster_deltas
+        RETURNING lng, lat, status, delta
+    ), by_status AS (
+        SELECT l.level, c.cx, c.cy, m.status,
+               SUM(m.delta)         AS delta,
+               SUM(m.delta * m.lng) AS sum_lng,
+               SUM(m.delta * m.lat) AS sum_lat
+        FROM moved m
+        CROSS JOIN generate_series(2, 16) AS l(level)
+        CROSS JOIN LATERAL map_cluster_cell(m.lng, m.lat, l.level) c
+        GROUP BY l.level, c.cx, c.cy, m.status
+    ), by_cell AS (
+        SELECT level, cx, cy,
+               SUM(delta)::int AS total,
+               SUM(sum_lng)    AS sum_lng,
+               SUM(sum_lat)    AS sum_lat,
+               COALESCE(jsonb_object_agg(status, delta) FILTER (WHERE delta <> 0), '{}'::jsonb) AS statuses
+        FROM by_status
+        GROUP BY level, cx, cy
+    )
+    INSERT INTO map_cluster_cells AS t (level, cx, cy, total, sum_lng, sum_lat, statuses)
+    SELECT level, cx, cy, total, sum_lng, sum_lat, statuses
+    FROM by_cell
+    ON CONFLICT (level, cx, cy) DO UPDATE SET
+        total    = t.total + EXCLUDED.total,
+        sum_lng  = t.sum_lng + EXCLUDED.sum_lng,
+        sum_lat  = t.sum_lat + EXCLUDED.sum_lat,
+        statuses = map_cluster_add_counts(t.statuses, EXCLUDED.statuses);
+    GET DIAGNOSTICS folded = ROW_COUNT;
+
+    DELETE FROM map_cluster_cells WHERE total <= 0;
+    RETURN folded;
+END
+$$;
+
+-- Dựng lại toàn bộ (lần đầu, hoặc khi nghi ngờ lệch). Chặn ghi rescue_requests trong lúc dựng.
+CREATE OR REPLACE FUNCTION map_cluster_rebuild() RETURNS INTEGER
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('map_cluster_fold'));
+    LOCK TABLE rescue_requests IN SHARE MODE;
+
+    DELETE FROM map_cluster_deltas;
+    DELETE FROM map_cluster_cells;
+    INSERT INTO map_cluster_deltas (lng, lat, status, delta)
+    SELECT ST_X(location), ST_Y(location), COALESCE(status, ''), 1
+    FROM rescue_requests
+    WHERE location IS NOT NULL;
+
+    RETURN map_cluster_fold();
+END
+$$;
+
+SELECT map_cluster_rebuild();
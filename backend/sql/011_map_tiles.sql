@@ -0,0 +1,47 @@
+-- Vector tile /api/requests/tiles/{z}/{x}/{y}.pbf (ST_TileEnvelope: PostGIS 3.0+).
+--
+-- Tile được cache theo từng ô (z, x, y). Mỗi lần một điểm đổi (tạo, xóa, đổi vị trí /
+-- trạng thái) ghi vị trí cũ + mới vào map_tile_changes; server đọc nhật ký này và chỉ
+-- hủy cache các tile chứa những vị trí đó (xem services/map_tiles.py).
+
+CREATE TABLE IF NOT EXISTS map_tile_changes (
+    change_xid xid8             NOT NULL DEFAULT pg_current_xact_id(),
+    lng        DOUBLE PRECISION NOT NULL,
+    lat        DOUBLE PRECISION NOT NULL,
+    changed_at TIMESTAMPTZ      NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_map_tile_changes_xid
+    ON map_tile_changes (change_xid);
+
+CREATE INDEX IF NOT EXISTS idx_map_tile_changes_changed_at
+    ON map_tile_changes (changed_at);
+
+-- Thay hàm trigger của sql/010: vẫn ghi delta cho pyramid, thêm nhật ký đổi tile
+CREATE OR REPLACE FUNCTION trg_map_cluster_delta() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.location IS NOT DISTINCT FROM OLD.location
+       AND NEW.status IS NOT DISTINCT FROM OLD.status THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.location IS NOT NULL THEN
+        INSERT INTO map_cluster_deltas (lng, lat, status, delta)
+        VALUES (ST_X(OLD.location), ST_Y(OLD.location), COALESCE(OLD.status, ''), -1);
+        INSERT INTO map_tile_changes (lng, lat)
+        VALUES (ST_X(OLD.location), ST_Y(OLD.location));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.location IS NOT NULL THEN
+        INSERT INTO map_cluster_deltas (lng, lat, status, delta)
+        VALUES (ST_X(NEW.location), ST_Y(NEW.location), COALESCE(NEW.status, ''), 1);
+        -- Đổi trạng thái tại chỗ: vị trí cũ = vị trí mới, ghi một lần là đủ
+        IF TG_OP = 'INSERT' OR NEW.location IS DISTINCT FROM OLD.location THEN
+            INSERT INTO map_tile_changes (lng, lat)
+            VALUES (ST_X(NEW.location), ST_Y(NEW.location));
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$;
@@ -0,0 +1,13 @@
+-- Bản đồ điều phối thường chỉ xem yêu cầu còn mở (map-points?status=PENDING,ASSIGNED,IN_PROGRESS).
+-- Chỉ mục GIST một phần chỉ chứa các yêu cầu này nên không phình theo lịch sử yêu cầu đã
+-- hoàn thành / an toàn. Planner dùng được khi điều kiện status = ANY(...) là tập con
+-- của điều kiện chỉ mục (giá trị hằng, xem RescueRequestService.get_map_points).
+
+CREATE INDEX IF NOT EXISTS idx_rescue_requests_location_open
+    ON rescue_requests USING GIST (location)
+    WHERE status IN ('Chờ xử lý', 'Đã phân công', 'Đang thực hiện');
+
+-- Trường hợp hay gặp nhất: chỉ yêu cầu chưa có đội nhận
+CREATE INDEX IF NOT EXISTS idx_rescue_requests_location_pending
+    ON rescue_requests USING GIST (location)
+    WHERE status = 'Chờ xử lý';
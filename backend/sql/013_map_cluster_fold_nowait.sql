@@ -0,0 +1,91 @@
+-- map_cluster_fold() của sql/010 chờ advisory lock: khi ghi dồn dập, mọi request đọc
+-- map-points / tile zoom thấp xếp hàng sau một lần gộp và giữ connection trong lúc chờ.
+--
+-- Bản mới mặc định không chờ: process khác đang gộp thì trả NULL ngay và người đọc dùng
+-- ô hiện có (trễ tối đa một lần gộp). map_cluster_rebuild() vẫn gộp có chờ.
+--
+-- Mỗi lần gộp tăng phiên bản scope "map_clusters" (data_versions, sql/006) trong cùng
+-- transaction. ETag của map-points gồm phiên bản này: người đọc bỏ qua lần gộp đang chạy
+-- nhận dữ liệu thiếu delta, nhưng ETag của nó hết hiệu lực ngay khi lần gộp kia commit.
+
+-- Đổi chữ ký (thêm tham số mặc định): bỏ bản cũ để lời gọi map_cluster_fold() không mơ hồ.
+-- sql/010 làm ngược lại khi chạy lại, nên chạy lại các script theo thứ tự vẫn chỉ còn một bản
+DROP FUNCTION IF EXISTS map_cluster_fold();
+
+-- Gộp delta vào ô, trả về số ô đã cập nhật; NULL nếu bỏ qua vì process khác đang gộp.
+-- Không có delta thì không lấy khóa.
+CREATE OR REPLACE FUNCTION map_cluster_fold(wait BOOLEAN DEFAULT false) RETURNS INTEGER
+    LANGUAGE plpgsql
+AS $$
+DECLARE
+    folded INTEGER;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM map_cluster_deltas) THEN
+        RETURN 0;
+    END IF;
+
+    IF wait THEN
+        -- Process gộp sau chờ process trước commit rồi mới đọc delta (snapshot mới mỗi câu lệnh)
+        PERFORM pg_advisory_xact_lock(hashtext('map_cluster_fold'));
+    ELSIF NOT pg_try_advisory_xact_lock(hashtext('map_cluster_fold')) THEN
+        -- Process khác đang gộp: đọc ô hiện có, không xếp hàng chờ sau nó
+        RETURN NULL;
+    END IF;
+
+    WITH moved AS (
+        DELETE FROM map_cluster_deltas
+        RETURNING lng, lat, status, delta
+    ), by_status AS (
+        SELECT l.level, c.cx, c.cy, m.status,
+               SUM(m.delta)         AS delta,
+               SUM(m.delta * m.lng) AS sum_lng,
+               SUM(m.delta * m.lat) AS sum_lat
+        FROM moved m
+        CROSS JOIN generate_series(2, 16) AS l(level)
+        CROSS JOIN LATERAL map_cluster_cell(m.lng, m.lat, l.level) c
+        GROUP BY l.level, c.cx, c.cy, m.status
+    ), by_cell AS (
+        SELECT level, cx, cy,
+               SUM(delta)::int AS total,
+               SUM(sum_lng)    AS sum_lng,
+               SUM(sum_lat)    AS sum_lat,
+               COALESCE(jsonb_object_agg(status, delta) FILTER (WHERE delta <> 0), '{}'::jsonb) AS statuses
+        FROM by_status
+        GROUP BY level, cx, cy
+    )
+    INSERT INTO map_cluster_cells AS t (level, cx, cy, total, sum_lng, sum_lat, statuses)
+    SELECT level, cx, cy, total, sum_lng, sum_lat, statuses
+    FROM by_cell
+    ON CONFLICT (level, cx, cy) DO UPDATE SET
+        total    = t.total + EXCLUDED.total,
+        sum_lng  = t.sum_lng + EXCLUDED.sum_lng,
+        sum_lat  = t.sum_lat + EXCLUDED.sum_lat,
+        statuses = map_cluster_add_counts(t.statuses, EXCLUDED.statuses);
+    GET DIAGNOSTICS folded = ROW_COUNT;
+
+    INSERT INTO data_versions (scope, version)
+    VALUES ('map_clusters', 1)
+    ON CONFLICT (scope) DO UPDATE SET version = data_versions.version + 1;
+
+    DELETE FROM map_cluster_cells WHERE total <= 0;
+    RETURN folded;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION map_cluster_rebuild() RETURNS INTEGER
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('map_cluster_fold'));
+    LOCK TABLE rescue_requests IN SHARE MODE;
+
+    DELETE FROM map_cluster_deltas;
+    DELETE FROM map_cluster_cells;
+    INSERT INTO map_cluster_deltas (lng, lat, status, delta)
+    SELECT ST_X(location), ST_Y(location), COALESCE(status, ''), 1
+    FROM rescue_requests
+    WHERE location IS NOT NULL;
+
+    RETURN map_cluster_fold(true);
+END
+$$;
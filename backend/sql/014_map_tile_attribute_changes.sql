@@ -0,0 +1,49 @@
+-- Layer "requests" của vector tile (zoom >= 15) mang cả mã, tên, SĐT và số người của yêu
+-- cầu, nhưng trigger của sql/010 chỉ chạy khi đổi location / status: gộp yêu cầu trùng
+-- (cộng số người), sửa tên / SĐT... để tile cũ trong cache tới hết TTL.
+--
+-- Trigger chạy thêm khi đổi các cột đó. Chỉ đổi thuộc tính thì ghi map_tile_changes tại
+-- vị trí hiện tại để hủy tile, không ghi delta cho pyramid (số lượng / vị trí không đổi).
+
+CREATE OR REPLACE FUNCTION trg_map_cluster_delta() RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.location IS NOT DISTINCT FROM OLD.location
+       AND NEW.status IS NOT DISTINCT FROM OLD.status THEN
+        -- UPDATE OF chạy cả khi SET lại giá trị cũ
+        IF NEW.location IS NOT NULL
+           AND (NEW.code, NEW.name, NEW.contact_phone, NEW.adults, NEW.children, NEW.elderly)
+               IS DISTINCT FROM (OLD.code, OLD.name, OLD.contact_phone, OLD.adults, OLD.children, OLD.elderly) THEN
+            INSERT INTO map_tile_changes (lng, lat)
+            VALUES (ST_X(NEW.location), ST_Y(NEW.location));
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.location IS NOT NULL THEN
+        INSERT INTO map_cluster_deltas (lng, lat, status, delta)
+        VALUES (ST_X(OLD.location), ST_Y(OLD.location), COALESCE(OLD.status, ''), -1);
+        INSERT INTO map_tile_changes (lng, lat)
+        VALUES (ST_X(OLD.location), ST_Y(OLD.location));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.location IS NOT NULL THEN
+        INSERT INTO map_cluster_deltas (lng, lat, status, delta)
+        VALUES (ST_X(NEW.location), ST_Y(NEW.location), COALESCE(NEW.status, ''), 1);
+        -- Đổi trạng thái tại chỗ: vị trí cũ = vị trí mới, ghi một lần là đủ
+        IF TG_OP = 'INSERT' OR NEW.location IS DISTINCT FROM OLD.location THEN
+            INSERT INTO map_tile_changes (lng, lat)
+            VALUES (ST_X(NEW.location), ST_Y(NEW.location));
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- Cùng danh sách cột với SELECT của layer "requests" (MapTileService._render)
+DROP TRIGGER IF EXISTS trg_rescue_requests_map_cluster ON rescue_requests;
+CREATE TRIGGER trg_rescue_requests_map_cluster
+    AFTER INSERT OR DELETE
+       OR UPDATE OF location, status, code, name, contact_phone, adults, children, elderly
+    ON rescue_requests
+    FOR EACH ROW EXECUTE FUNCTION trg_map_cluster_delta();
@@ -0,0 +1,12 @@
+-- Yêu cầu nhận qua nhật ký (surge mode) đã trả id cho người dân trước khi vào DB. Lúc drain,
+-- nếu trùng với yêu cầu có sẵn thì được gộp vào đó và id tạm không bao giờ có dòng riêng:
+-- bảng này ghi id tạm -> id yêu cầu đã gộp để upload media theo id cũ vẫn tìm được.
+
+CREATE TABLE IF NOT EXISTS rescue_request_aliases (
+    alias_id   UUID        PRIMARY KEY,
+    request_id UUID        NOT NULL REFERENCES rescue_requests (id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_rescue_request_aliases_request
+    ON rescue_request_aliases (request_id);
@@ -0,0 +1,84 @@
+-- Ảnh xem trước (preview) của media được tạo nhưng chưa trả ra API; video không có ảnh
+-- thu nhỏ nên thumbnail_urls trả luôn URL file video.
+--
+-- - Thêm preview_urls vào read model (cùng thứ tự với media_urls).
+-- - thumbnail_urls / preview_urls: ảnh chưa tạo xong dùng tạm ảnh gốc như cũ, video chưa
+--   có ảnh poster (MediaPipeline, cần ffmpeg) trả null thay vì URL video.
+
+ALTER TABLE rescue_request_view
+    ADD COLUMN IF NOT EXISTS preview_urls JSONB NOT NULL DEFAULT '[]'::jsonb;
+
+DROP VIEW IF EXISTS rescue_request_view_source;
+CREATE OR REPLACE VIEW rescue_request_view_source AS
+SELECT
+    r.id AS request_id,
+    LEFT(COALESCE(r.description, ''), 100) AS description_short,
+    CASE
+        WHEN (r.adults + r.children + r.elderly) = 0 THEN '0'
+        ELSE CONCAT(
+            (r.adults + r.children + r.elderly), ' (',
+            CONCAT_WS(', ',
+                NULLIF(CONCAT(r.adults, ' lớn'), '0 lớn'),
+                NULLIF(CONCAT(r.children, ' nhỏ'), '0 nhỏ'),
+                NULLIF(CONCAT(r.elderly, ' già'), '0 già')
+            ), ')'
+        )
+    END AS people_summary,
+    COALESCE(
+        (SELECT jsonb_agg(m.file ORDER BY m.created_at, m.id)
+         FROM media m WHERE m.rescue_request_id = r.id),
+        '[]'::jsonb
+    ) AS media_urls,
+    COALESCE(
+        (SELECT jsonb_agg(COALESCE(m.thumbnail, CASE WHEN m.file_type = 'IMAGE' THEN m.file END)
+                          ORDER BY m.created_at, m.id)
+         FROM media m WHERE m.rescue_request_id = r.id),
+        '[]'::jsonb
+    ) AS thumbnail_urls,
+    (
+        SELECT jsonb_build_object(
+            'task_id', a.id,
+            'status', a.status,
+            'updated_at', a.updated_at,
+            'team_name', t.name,
+            'team_phone', t.contact_phone,
+            'team_lat', ST_Y(t.location),
+            'team_lng', ST_X(t.location)
+        )
+        FROM rescue_assignments a
+        JOIN rescue_teams t ON a.rescue_team_id = t.id
+        WHERE a.rescue_request_id = r.id
+        AND a.status IN ('Đã điều động', 'Đang di chuyển', 'Đã đến', 'Hoàn thành')
+        ORDER BY a.created_at DESC
+        LIMIT 1
+    ) AS active_assignment,
+    -- Cột mới thêm cuối cùng (CREATE OR REPLACE VIEW không cho đổi thứ tự cột cũ)
+    COALESCE(
+        (SELECT jsonb_agg(COALESCE(m.preview, CASE WHEN m.file_type = 'IMAGE' THEN m.file END)
+                          ORDER BY m.created_at, m.id)
+         FROM media m WHERE m.rescue_request_id = r.id),
+        '[]'::jsonb
+    ) AS preview_urls
+FROM rescue_requests r;
+
+CREATE OR REPLACE FUNCTION rescue_request_view_refresh(p_request_id UUID) RETURNS void
+    LANGUAGE sql
+AS $$
+    INSERT INTO rescue_request_view
+        (request_id, description_short, people_summary, media_urls, thumbnail_urls, preview_urls, active_assignment)
+    SELECT request_id, description_short, people_summary, media_urls, thumbnail_urls, preview_urls, active_assignment
+    FROM rescue_request_view_source
+    WHERE request_id = p_request_id
+    ON CONFLICT (request_id) DO UPDATE SET
+        description_short = EXCLUDED.description_short,
+        people_summary    = EXCLUDED.people_summary,
+        media_urls        = EXCLUDED.media_urls,
+        thumbnail_urls    = EXCLUDED.thumbnail_urls,
+        preview_urls      = EXCLUDED.preview_urls,
+        active_assignment = EXCLUDED.active_assignment
+$$;
+
+-- Tính lại các yêu cầu có media (yêu cầu không có media: giá trị mặc định đã đúng)
+SELECT rescue_request_view_refresh(r.id)
+FROM rescue_requests r
+WHERE EXISTS (SELECT 1 FROM media m WHERE m.rescue_request_id = r.id);